@@ -0,0 +1,182 @@
+"""Turn latency, API calls per turn and tool-dispatch overhead of AIAssistant, offline.
+
+AIAssistant talks to the fake Assistants API in fake_assistants_server.py, with scripted
+latencies, so results are repeatable and need no OpenAI account. HOME points to a scratch
+directory while it runs, so the file tools and the file index only see a few sample files.
+
+Scenarios:
+    chat   a plain streamed reply
+    tools  one requires_action step with two tool calls run side by side
+    chain  two requires_action steps in a row
+
+Reported per scenario: the wall time of a turn, the overhead (wall time minus the delays the
+fake server was scripted to add), API calls per turn, and the tool-dispatch overhead (time
+of a tool step beyond its slowest tool). Setup is measured cold (assistant created) and warm
+(found in the registry).
+
+    python benchmarks/assistant_benchmark.py --save-baseline benchmarks/baselines/assistant.json
+    python benchmarks/assistant_benchmark.py --baseline benchmarks/baselines/assistant.json
+
+With --baseline the exit status is 1 when a metric got worse than the baseline by more than
+--tolerance. Time baselines are only comparable on the same machine.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_assistants_server import FakeAssistantsServer  # noqa: E402
+
+LATENCY = {"default": 0.02, "threads.create": 0.05, "runs.create": 0.05, "runs.submit_tool_outputs": 0.05,
+           "assistants.create": 0.1, "assistants.update": 0.1}
+TEXT = "Sure. Here is a reply that is long enough to arrive as a couple of dozen streamed tokens, like a short spoken answer."
+
+
+def scenarios(home):
+    notes = os.path.join(home, "notes.txt")
+    read = {"name": "read_file", "arguments": {"filepath": notes}}
+    search = {"name": "search_files", "arguments": {"pattern": "*.txt"}}
+    create = {"name": "create_file", "arguments": {"filepath": os.path.join(home, "out", "new.txt")}}
+    return {
+        "chat": {"runs": [{"tool_rounds": [], "text": TEXT}]},
+        "tools": {"runs": [{"tool_rounds": [[read, search]], "text": TEXT}]},
+        "chain": {"runs": [{"tool_rounds": [[search], [read, create]], "text": TEXT}]},
+    }
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+
+def tool_dispatch_overheads(spans):
+    """Per tool step: the ai.tools span minus the slowest tool span that ran inside it."""
+    overheads = []
+    for step in (s for s in spans if s["name"] == "ai.tools"):
+        start, end = step["start"], step["start"] + step["duration_ms"] / 1000
+        tools = [s["duration_ms"] for s in spans
+                 if s["name"].startswith("tool.") and s["start"] >= start and s["start"] <= end]
+        overheads.append(step["duration_ms"] - max(tools, default=0.0))
+    return overheads
+
+
+def run_scenario(assistant, server, tracer, script, turns):
+    server.load(dict(script, latency=LATENCY, first_token=0.1, token_interval=0.002))
+    totals, overheads, calls, dispatch = [], [], [], []
+    for i in range(turns + 1):
+        turn = tracer.begin_turn()
+        before_calls, before_scripted, _ = server.snapshot()
+        started = time.perf_counter()
+        response = assistant.get_ai_response(f"Request number {i}")
+        elapsed = time.perf_counter() - started
+        after_calls, after_scripted, _ = server.snapshot()
+        if response.startswith("Error"):
+            sys.exit(f"Turn failed: {response}")
+        if i == 0:
+            continue  # The first turn also creates the conversation thread
+        totals.append(elapsed * 1000)
+        overheads.append((elapsed - (after_scripted - before_scripted)) * 1000)
+        calls.append(sum((after_calls - before_calls).values()))
+        dispatch += tool_dispatch_overheads(tracer.to_json(turn)["spans"])
+    result = {
+        "turn_ms_p50": percentile(totals, 50),
+        "turn_ms_p95": percentile(totals, 95),
+        "overhead_ms_p50": percentile(overheads, 50),
+        "overhead_ms_p95": percentile(overheads, 95),
+        "api_calls_per_turn": sum(calls) / len(calls),
+    }
+    if dispatch:
+        result["tool_dispatch_ms_p50"] = percentile(dispatch, 50)
+        result["tool_dispatch_ms_p95"] = percentile(dispatch, 95)
+    return result
+
+
+def measure_setup(assistant, server):
+    before_calls, before_scripted, _ = server.snapshot()
+    started = time.perf_counter()
+    assistant.setup_assistant()
+    elapsed = time.perf_counter() - started
+    after_calls, after_scripted, _ = server.snapshot()
+    return {
+        "ms": elapsed * 1000,
+        "overhead_ms": (elapsed - (after_scripted - before_scripted)) * 1000,
+        "api_calls": sum((after_calls - before_calls).values()),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Prints every metric next to its baseline and returns the names of the regressions."""
+    regressions = []
+    print(f"\n{'metric':<36} {'baseline':>10} {'now':>10} {'change':>8}")
+    for group, metrics in results.items():
+        for name, value in metrics.items():
+            base = baseline.get(group, {}).get(name)
+            if base is None:
+                continue
+            change = (value - base) / base if base else 0.0
+            # Times get 1 ms of slack, so sub-millisecond noise is never a regression
+            worse = value > base * (1 + tolerance) + (1.0 if "ms" in name else 0.0)
+            flag = "  worse" if worse else ""
+            print(f"{group + '.' + name:<36} {base:>10.2f} {value:>10.2f} {change:>+8.1%}{flag}")
+            if worse:
+                regressions.append(f"{group}.{name}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", action="append", help="chat, tools or chain (repeatable, default all)")
+    parser.add_argument("--turns", type=int, default=20, help="measured turns per scenario (default 20)")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--save-baseline", help="write the results to this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown against the baseline (default 0.2)")
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix="ava-benchmark-")
+    with open(os.path.join(home, "notes.txt"), "w", encoding="utf-8") as f:
+        f.write("Buy milk.\nCall the garage about the car.\n" * 20)
+    server = FakeAssistantsServer().start()
+    os.environ.update(HOME=home, OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="fake", OPENAI_MODEL="fake-model",
+                      AVA_LOG_FILE="0", AVA_LOG_LEVEL="WARNING")
+
+    import ai
+    from modules.tracing import tracer
+    ai.ASSISTANT_REGISTRY_PATH = os.path.join(home, "assistants.json")
+    ai.FILE_INDEX_PATH = os.path.join(home, "file_index.db")
+    # Stale-assistant collection runs on a background thread and would add its calls to whatever it overlaps
+    ai.ASSISTANT_GC_INTERVAL = float("inf")
+    assistant = ai.AIAssistant()
+    server.load({"latency": LATENCY})
+
+    results = {"setup_cold": measure_setup(assistant, server), "setup_warm": measure_setup(assistant, server)}
+    available = scenarios(home)
+    for name in args.scenario or list(available):
+        if name not in available:
+            sys.exit(f"Unknown scenario: {name}")
+        results[name] = run_scenario(assistant, server, tracer, available[name], args.turns)
+    assistant.close()
+    server.stop()
+
+    for group, metrics in results.items():
+        print(f"{group:<12} " + "  ".join(f"{key}={value:.2f}" for key, value in metrics.items()))
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nWorse than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""Local stand-in for the parts of the OpenAI Assistants API that AIAssistant uses.
+
+Serves assistants, threads, messages and streamed runs (with tool calls and tool output
+submission), run cancel and retrieve, and a plain chat completion for the vision tool. The
+latency of every endpoint, the delay before the first token, the pace of the tokens and
+the tool calls each run asks for all come from a script:
+
+    {
+        "latency": {"default": 0.02, "runs.create": 0.15, "assistants.create": 0.3},
+        "first_token": 0.4,
+        "token_interval": 0.02,
+        "runs": [
+            {"tool_rounds": [[{"name": "read_file", "arguments": {"filepath": "/tmp/notes.txt"}}]],
+             "text": "The file says hello."}
+        ]
+    }
+
+Runs use the entries of "runs" in turn, and the last one repeats. Each tool round is one
+requires_action step whose calls are answered together. Standalone, it lets the app run
+without an OpenAI account:
+
+    python benchmarks/fake_assistants_server.py --port 8765 --script script.json
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake OPENAI_MODEL=fake python src/main.py
+"""
+import argparse
+import collections
+import itertools
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_SCRIPT = {
+    "latency": {"default": 0.02},
+    "first_token": 0.2,
+    "token_interval": 0.01,
+    "runs": [{"tool_rounds": [], "text": "This is a scripted reply."}],
+}
+
+ROUTES = [
+    ("POST", r"/v1/assistants", "assistants.create"),
+    ("GET", r"/v1/assistants", "assistants.list"),
+    ("GET", r"/v1/assistants/(?P<assistant>[^/]+)", "assistants.retrieve"),
+    ("POST", r"/v1/assistants/(?P<assistant>[^/]+)", "assistants.update"),
+    ("DELETE", r"/v1/assistants/(?P<assistant>[^/]+)", "assistants.delete"),
+    ("POST", r"/v1/threads", "threads.create"),
+    ("POST", r"/v1/threads/(?P<thread>[^/]+)/messages", "messages.create"),
+    ("POST", r"/v1/threads/(?P<thread>[^/]+)/runs", "runs.create"),
+    ("GET", r"/v1/threads/(?P<thread>[^/]+)/runs", "runs.list"),
+    ("GET", r"/v1/threads/(?P<thread>[^/]+)/runs/(?P<run>[^/]+)", "runs.retrieve"),
+    ("POST", r"/v1/threads/(?P<thread>[^/]+)/runs/(?P<run>[^/]+)/cancel", "runs.cancel"),
+    ("POST", r"/v1/threads/(?P<thread>[^/]+)/runs/(?P<run>[^/]+)/submit_tool_outputs", "runs.submit_tool_outputs"),
+    ("POST", r"/v1/chat/completions", "chat.completions.create"),
+]
+
+
+class NotFound(Exception):
+    pass
+
+
+class FakeAssistantsServer(ThreadingHTTPServer):
+    """Threaded HTTP server holding the fake API state and the call statistics.
+
+    calls counts requests per endpoint. scripted_seconds adds up every delay the script
+    imposed, so a client can subtract it from what it measured to get its own overhead.
+    tool_waits holds, per tool round, the seconds from sending requires_action until the
+    tool outputs arrived.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), script=None):
+        super().__init__(address, FakeAssistantsHandler)
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.load(script or DEFAULT_SCRIPT)
+        self.assistants = {}
+        self.threads = {}
+        self.runs = {}
+        self.calls = collections.Counter()
+        self.scripted_seconds = 0.0
+        self.tool_waits = []
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+    def load(self, script):
+        """Replaces the script. Runs already started keep the entry they were given."""
+        with self.lock:
+            self.script = dict(DEFAULT_SCRIPT, **script)
+            self.run_scripts = iter(())
+            self.last_run_script = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True, name="fake-assistants")
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def snapshot(self):
+        """(calls, scripted_seconds, tool_waits count), for measuring the difference over a turn."""
+        with self.lock:
+            return collections.Counter(self.calls), self.scripted_seconds, len(self.tool_waits)
+
+    def new_id(self, prefix):
+        return f"{prefix}_{next(self.ids):06d}"
+
+    def delay(self, seconds):
+        if seconds > 0:
+            with self.lock:
+                self.scripted_seconds += seconds
+            time.sleep(seconds)
+
+    def latency(self, endpoint):
+        latency = self.script["latency"]
+        return latency.get(endpoint, latency.get("default", 0))
+
+    def next_run_script(self):
+        with self.lock:
+            if self.last_run_script is None:
+                self.run_scripts = iter(self.script["runs"])
+            self.last_run_script = next(self.run_scripts, self.last_run_script)
+            return self.last_run_script
+
+
+class FakeAssistantsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method):
+        path = self.path.split("?", 1)[0]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = json.loads(self.rfile.read(length) or b"{}") if length else {}
+        for route_method, pattern, endpoint in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self._send_json({"error": {"message": f"No route for {method} {path}", "type": "invalid_request_error"}}, 404)
+
+        with self.server.lock:
+            self.server.calls[endpoint] += 1
+        self.server.delay(self.server.latency(endpoint))
+        handler = getattr(self, "_" + endpoint.replace(".", "_"))
+        try:
+            handler(body, **match.groupdict())
+        except NotFound as e:
+            self._send_json({"error": {"message": f"No such object: {e}", "type": "invalid_request_error"}}, 404)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client closed a stream early, e.g. when it cancelled the run
+
+    def _send_json(self, data, status=200):
+        payload = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    # Assistants
+
+    def _assistants_create(self, body):
+        assistant = dict(body, id=self.server.new_id("asst"), object="assistant", created_at=int(time.time()))
+        with self.server.lock:
+            self.server.assistants[assistant["id"]] = assistant
+        self._send_json(assistant)
+
+    def _assistants_list(self, body):
+        with self.server.lock:
+            data = list(self.server.assistants.values())
+        self._send_json({"object": "list", "data": data, "first_id": None, "last_id": None, "has_more": False})
+
+    def _assistant(self, assistant):
+        with self.server.lock:
+            if assistant not in self.server.assistants:
+                raise NotFound(assistant)
+            return self.server.assistants[assistant]
+
+    def _assistants_retrieve(self, body, assistant):
+        self._send_json(self._assistant(assistant))
+
+    def _assistants_update(self, body, assistant):
+        updated = self._assistant(assistant)
+        updated.update(body)
+        self._send_json(updated)
+
+    def _assistants_delete(self, body, assistant):
+        self._assistant(assistant)
+        with self.server.lock:
+            del self.server.assistants[assistant]
+        self._send_json({"id": assistant, "object": "assistant.deleted", "deleted": True})
+
+    # Threads and messages
+
+    def _thread(self, thread):
+        with self.server.lock:
+            if thread not in self.server.threads:
+                raise NotFound(thread)
+            return self.server.threads[thread]
+
+    def _threads_create(self, body):
+        thread = self.server.new_id("thread")
+        with self.server.lock:
+            self.server.threads[thread] = []
+        self._send_json({"id": thread, "object": "thread", "created_at": int(time.time()), "metadata": {}})
+
+    def _messages_create(self, body, thread):
+        message = {
+            "id": self.server.new_id("msg"), "object": "thread.message", "thread_id": thread,
+            "role": body.get("role", "user"), "created_at": int(time.time()),
+            "content": [{"type": "text", "text": {"value": body.get("content", ""), "annotations": []}}],
+        }
+        self._thread(thread).append(message)
+        self._send_json(message)
+
+    # Runs
+
+    def _run(self, thread, run):
+        with self.server.lock:
+            if run not in self.server.runs or self.server.runs[run]["thread_id"] != thread:
+                raise NotFound(run)
+            return self.server.runs[run]
+
+    def _public(self, run):
+        return {key: value for key, value in run.items() if not key.startswith("_")}
+
+    def _runs_create(self, body, thread):
+        self._thread(thread)
+        run = {
+            "id": self.server.new_id("run"), "object": "thread.run", "thread_id": thread,
+            "assistant_id": body.get("assistant_id"), "status": "queued", "created_at": int(time.time()),
+            "required_action": None, "last_error": None,
+            "_script": self.server.next_run_script(), "_round": 0, "_waiting_since": None,
+        }
+        with self.server.lock:
+            self.server.runs[run["id"]] = run
+        if not body.get("stream"):
+            # Only streamed runs are scripted; a plain create completes at once
+            run["status"] = "completed"
+            return self._send_json(self._public(run))
+        self._stream_run(run, [("thread.run.created", self._public(run))])
+
+    def _runs_submit_tool_outputs(self, body, thread, run):
+        run = self._run(thread, run)
+        if run["status"] != "requires_action":
+            return self._send_json({"error": {"message": f"Run is {run['status']}", "type": "invalid_request_error"}}, 400)
+        with self.server.lock:
+            self.server.tool_waits.append(time.perf_counter() - run["_waiting_since"])
+        run["_round"] += 1
+        run["required_action"] = None
+        run["status"] = "queued"
+        self._stream_run(run, [])
+
+    def _runs_list(self, body, thread):
+        self._thread(thread)
+        with self.server.lock:
+            runs = [self._public(run) for run in self.server.runs.values() if run["thread_id"] == thread]
+        runs.reverse()  # Newest first, like the API
+        self._send_json({"object": "list", "data": runs, "first_id": None, "last_id": None, "has_more": False})
+
+    def _runs_retrieve(self, body, thread, run):
+        self._send_json(self._public(self._run(thread, run)))
+
+    def _runs_cancel(self, body, thread, run):
+        run = self._run(thread, run)
+        if run["status"] in ("queued", "in_progress", "requires_action"):
+            run["status"] = "cancelled"
+        self._send_json(self._public(run))
+
+    def _stream_run(self, run, events):
+        """Streams the run from its current tool round: either the next requires_action step or the reply."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event, data in events:
+            self._send_event(event, data)
+
+        script = run["_script"]
+        run["status"] = "in_progress"
+        self._send_event("thread.run.in_progress", self._public(run))
+        self.server.delay(self.server.script["first_token"])
+        rounds = script.get("tool_rounds", [])
+        if run["status"] == "cancelled":
+            self._send_event("thread.run.cancelled", self._public(run))
+        elif run["_round"] < len(rounds):
+            run["status"] = "requires_action"
+            run["required_action"] = {"type": "submit_tool_outputs", "submit_tool_outputs": {"tool_calls": [
+                {"id": self.server.new_id("call"), "type": "function",
+                 "function": {"name": call["name"], "arguments": json.dumps(call.get("arguments", {}))}}
+                for call in rounds[run["_round"]]
+            ]}}
+            run["_waiting_since"] = time.perf_counter()
+            self._send_event("thread.run.requires_action", self._public(run))
+        else:
+            self._stream_reply(run, script.get("text", ""))
+        self._write_chunk(b"event: done\ndata: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _stream_reply(self, run, text):
+        message = {"id": self.server.new_id("msg"), "object": "thread.message", "thread_id": run["thread_id"],
+                   "run_id": run["id"], "role": "assistant", "status": "in_progress", "content": []}
+        self._send_event("thread.message.created", message)
+        for i, token in enumerate(re.findall(r"\S+\s*", text)):
+            if i:
+                self.server.delay(self.server.script["token_interval"])
+            if run["status"] == "cancelled":
+                self._send_event("thread.run.cancelled", self._public(run))
+                return
+            self._send_event("thread.message.delta", {"id": message["id"], "object": "thread.message.delta", "delta": {
+                "content": [{"index": 0, "type": "text", "text": {"value": token, "annotations": []}}]}})
+        message.update(status="completed", content=[{"type": "text", "text": {"value": text, "annotations": []}}])
+        self._thread(run["thread_id"]).append(message)
+        self._send_event("thread.message.completed", message)
+        run["status"] = "completed"
+        self._send_event("thread.run.completed", self._public(run))
+
+    def _send_event(self, event, data):
+        self._write_chunk(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    # Vision
+
+    def _chat_completions_create(self, body):
+        self._send_json({
+            "id": self.server.new_id("chatcmpl"), "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": "A scripted description of the screen."}}],
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--script", help="JSON script file (default: a plain scripted reply)")
+    args = parser.parse_args()
+
+    script = None
+    if args.script:
+        with open(args.script, "r", encoding="utf-8") as f:
+            script = json.load(f)
+    server = FakeAssistantsServer((args.host, args.port), script)
+    print(f"Fake Assistants API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Calls: " + ", ".join(f"{name}={count}" for name, count in sorted(server.calls.items())))
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Throughput and behaviour of SpeechRecognizer's listen loop on a recorded session.
+
+The session (a WAV file, a directory of WAV files, e.g. ones recorded with AVA_AUDIO_RECORD)
+is replayed through WavReplaySource. At the default --speed 0 it runs as fast as the loop
+consumes it, so the wake word, VAD and state machine are measured without waiting for
+real time. Deadlines run on the audio clock, so the events are the same at any speed.
+
+    python benchmarks/listen_loop_benchmark.py session.wav --backend none --repeat 3
+
+--backend none segments phrases without transcribing them, which times the loop itself.
+With google, vosk or whisper the phrases are recognized as in the application (configured
+by the usual AVA_* variables). The wake-word engine follows AVA_WAKE_WORD_ENGINE.
+"""
+import argparse
+import collections
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import speech_recognition as sr  # noqa: E402
+
+from modules.audio_source import WavReplaySource  # noqa: E402
+from modules.speech_recognizer import SpeechRecognizer  # noqa: E402
+from modules.stt_backends import RecognitionSession, SpeechBackend, create_stt_backend  # noqa: E402
+from modules.tracing import tracer  # noqa: E402
+
+
+class _SegmentSession(RecognitionSession):
+    def finish(self):
+        raise sr.UnknownValueError()
+
+
+class SegmentOnlyBackend(SpeechBackend):
+    """Collects each phrase and recognizes nothing."""
+
+    name = "none"
+
+    def start_session(self, sample_rate):
+        return _SegmentSession(sample_rate)
+
+
+def run_session(paths, speed, backend, verbose):
+    """Replays the session once. Returns (wall seconds, audio seconds, events, recognizer)."""
+    source = WavReplaySource(paths, speed=speed)
+    recognizer = SpeechRecognizer(audio_source=source)
+    if backend == "none":
+        recognizer.stt_backend = SegmentOnlyBackend()
+    elif backend:
+        recognizer.stt_backend = create_stt_backend(backend, recognizer.recognizer)
+    events = []
+    recognizer.set_callback(lambda event, text: events.append(
+        (recognizer.cursor / recognizer.bytes_per_second, event, text)))
+
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+    with output:
+        started = time.perf_counter()
+        recognizer.listen_in_background()
+        recognizer.listening_thread.join()
+        elapsed = time.perf_counter() - started
+    recognizer.recognition_worker.shutdown()
+    return elapsed, source.duration, events, recognizer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("session", help="WAV file or directory of WAV files")
+    parser.add_argument("--speed", type=float, default=0, help="replay speed, 1 for real time (default 0: unpaced)")
+    parser.add_argument("--backend", default="none", help="none, google, vosk or whisper (default none)")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true", help="show the recognizer's output and every event")
+    args = parser.parse_args()
+
+    runs = []
+    for _ in range(args.repeat):
+        runs.append(run_session(args.session, args.speed, args.backend, args.verbose))
+
+    elapsed, audio_seconds, events, recognizer = runs[-1]
+    print(f"Session: {audio_seconds:.1f} s of audio at {recognizer.bytes_per_second // 2} Hz, "
+          f"{len(runs)} run(s), backend {args.backend}\n")
+    print(f"{'run':>4} {'wall s':>8} {'x real time':>12} {'events':>7} {'overruns':>9}")
+    for i, (run_elapsed, _, run_events, run_recognizer) in enumerate(runs, 1):
+        print(f"{i:>4} {run_elapsed:>8.2f} {audio_seconds / run_elapsed:>12.1f} {len(run_events):>7} "
+              f"{run_recognizer.audio_buffer.overruns:>9}")
+
+    print("\nEvents (last run):")
+    for name, count in sorted(collections.Counter(event for _, event, _ in events).items()):
+        print(f"  {name:<24} {count}")
+    print("Transitions (last run):")
+    for (state, event, target), count in sorted(recognizer.transition_counts.items()):
+        print(f"  {state} -> {target} on {event}: {count}")
+    if args.verbose:
+        for at, event, text in events:
+            print(f"  {at:8.2f}s {event}" + (f": {text}" if text else ""))
+
+    # Per-phrase VAD cost comes from the capture spans of every run
+    vad_ms = [span['attrs']['vad_ms'] for span in tracer.to_json()['spans'] if span['name'] == 'speech.capture']
+    print("\nStage latency (all runs):")
+    print(tracer.summary())
+    if vad_ms:
+        print(f"\nVAD time per phrase: mean {sum(vad_ms) / len(vad_ms):.2f} ms, max {max(vad_ms):.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
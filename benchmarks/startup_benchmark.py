@@ -0,0 +1,144 @@
+"""Cold start of the application: import-time profile and time to an interactive window.
+
+The import profile runs `python -X importtime` on what main.py imports before it opens the
+window, and on the modules loaded later in the background, and lists the slowest ones.
+Then main.py is launched --runs times against the fake Assistants API
+(fake_assistants_server.py), with a scratch HOME, registry and file index. Each run exits
+once startup is done (AVA_EXIT_AFTER_STARTUP=1) and reports when each stage finished:
+
+    window     the window is up and takes typed input
+    audio      the speech recognizer and text-to-speech engine are ready
+    assistant  the AI assistant is created and set up
+
+    python benchmarks/startup_benchmark.py --runs 5 --max-window 1.0 --max-import-ms 400
+
+Launching the app needs a display (use xvfb-run on a headless machine). The exit status is 1
+when a launch fails, including a failed startup stage, and with --max-window or
+--max-import-ms when the median window time or the import time before the window goes over
+budget.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_assistants_server import FakeAssistantsServer  # noqa: E402
+
+SRC = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src'))
+STARTUP_IMPORTS = ["ttkthemes", "gui"]  # Imported by main.py before the window opens
+BACKGROUND_IMPORTS = ["ai", "modules.speech_recognizer"]  # Imported on background threads
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_profile(modules):
+    """Runs -X importtime on importing modules in a fresh interpreter.
+
+    Returns (microseconds per top-level module, [(self microseconds, module)]), or raises
+    RuntimeError with the interpreter's error output.
+    """
+    code = "; ".join(f"import {module}" for module in modules)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=SRC,
+                            capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    totals, entries = {}, []
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, name = int(match[1]), int(match[2]), len(match[3]), match[4]
+        entries.append((own, name))
+        if indent == 1:
+            totals[name] = cumulative
+    return totals, sorted(entries, reverse=True)
+
+
+def print_profile(title, modules, top):
+    try:
+        totals, entries = import_profile(modules)
+    except RuntimeError as e:
+        print(f"{title}: import failed: {e}")
+        return None
+    total = sum(totals.get(module, 0) for module in modules) / 1000
+    print(f"{title}: {total:.0f} ms ({', '.join(f'{m} {totals.get(m, 0) / 1000:.0f} ms' for m in modules)})")
+    for own, name in entries[:top]:
+        print(f"  {own / 1000:8.1f} ms  {name}")
+    return total
+
+
+def launch(env, timeout):
+    """Starts main.py once and returns (stage times, seconds until the process exited).
+
+    Raises RuntimeError if a startup stage failed or the stages were never reported.
+    """
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "main.py"], cwd=SRC, env=env, capture_output=True,
+                            text=True, timeout=timeout)
+    elapsed = time.perf_counter() - started
+    for line in result.stdout.splitlines():
+        if line.startswith("Startup failures: "):
+            failures = json.loads(line.split(": ", 1)[1])
+            raise RuntimeError("; ".join(f"{stage}: {error}" for stage, error in failures.items()))
+        if line.startswith("Startup stages (s): "):
+            return json.loads(line.split(": ", 1)[1]), elapsed
+    output = (result.stderr or result.stdout).strip().splitlines()
+    raise RuntimeError(output[-1] if output else f"main.py exited with status {result.returncode}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="application launches (default 3, 0 for the profile only)")
+    parser.add_argument("--top", type=int, default=10, help="slowest modules listed per profile (default 10)")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for one launch")
+    parser.add_argument("--max-window", type=float, help="budget for the median time to the window, in seconds")
+    parser.add_argument("--max-import-ms", type=float, help="budget for the imports before the window, in ms")
+    args = parser.parse_args()
+
+    problems = []
+    startup_ms = print_profile("Imports before the window", STARTUP_IMPORTS, args.top)
+    print()
+    print_profile("Imports in the background", BACKGROUND_IMPORTS, args.top)
+    if args.max_import_ms is not None and (startup_ms is None or startup_ms > args.max_import_ms):
+        problems.append("imports before the window")
+
+    if args.runs:
+        home = tempfile.mkdtemp(prefix="ava-startup-")
+        server = FakeAssistantsServer().start()
+        env = dict(os.environ, HOME=home, OPENAI_BASE_URL=server.base_url, OPENAI_API_KEY="fake",
+                   OPENAI_MODEL="fake-model", AVA_EXIT_AFTER_STARTUP="1", AVA_LOG_FILE="0",
+                   AVA_ASSISTANT_REGISTRY=os.path.join(home, "assistants.json"),
+                   AVA_FILE_INDEX=os.path.join(home, "file_index.db"))
+        print(f"\n{'run':>4} {'window s':>9} {'audio s':>8} {'assistant s':>12} {'process s':>10}")
+        windows = []
+        failed = 0
+        for i in range(1, args.runs + 1):
+            try:
+                stages, elapsed = launch(env, args.timeout)
+            except (RuntimeError, subprocess.TimeoutExpired) as e:
+                print(f"{i:>4} launch failed: {e}")
+                failed += 1
+                continue
+            windows.append(stages["window"])
+            print(f"{i:>4} {stages['window']:>9.2f} {stages['audio']:>8.2f} {stages['assistant']:>12.2f} {elapsed:>10.2f}")
+        server.stop()
+        if windows:
+            print(f"\nMedian time to the window: {statistics.median(windows):.2f} s")
+        if failed:
+            problems.append(f"{failed} failed launch(es)")
+        if args.max_window is not None and (not windows or statistics.median(windows) > args.max_window):
+            problems.append("time to the window")
+
+    if problems:
+        print(f"\nFailed: {', '.join(problems)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
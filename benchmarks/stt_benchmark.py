@@ -0,0 +1,113 @@
+"""Real-time factor and word error rate of the speech-to-text backends on a WAV corpus.
+
+The corpus is a directory of WAV files, each with a reference transcript in a .txt file of
+the same name. Every clip is streamed to the backend in microphone-sized chunks, the way
+SpeechRecognizer feeds it, so streaming backends are measured with their partials on.
+
+    python benchmarks/stt_benchmark.py path/to/corpus --backend vosk --backend whisper
+
+Backends are configured with the same AVA_* variables as the application (AVA_VOSK_MODEL,
+AVA_WHISPER_MODEL, ...). The google backend needs network access.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import speech_recognition as sr  # noqa: E402
+
+from modules.audio_utils import read_wav  # noqa: E402
+from modules.stt_backends import create_stt_backend  # noqa: E402
+
+
+def words(text):
+    return re.sub(r"[^\w' ]+", " ", text.lower()).split()
+
+
+def edit_distance(reference, hypothesis):
+    """Word-level Levenshtein distance."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word)))
+        previous = current
+    return previous[-1]
+
+
+def run_clip(backend, pcm, rate, chunk):
+    """Streams one clip through a session. Returns (text, seconds, seconds to first partial)."""
+    started = time.perf_counter()
+    first_partial = None
+    session = backend.start_session(rate)
+    for offset in range(0, len(pcm), chunk * 2):
+        if session.feed(pcm[offset:offset + chunk * 2]) and first_partial is None:
+            first_partial = time.perf_counter() - started
+    try:
+        text = session.finish()
+    except sr.UnknownValueError:
+        text = ""
+    return text, time.perf_counter() - started, first_partial
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus")
+    parser.add_argument("--backend", action="append", help="google, vosk or whisper (repeatable)")
+    parser.add_argument("--chunk", type=int, default=1024, help="samples per chunk (default 1024, as sr.Microphone)")
+    parser.add_argument("--verbose", action="store_true", help="print every transcript")
+    args = parser.parse_args()
+
+    clips = []
+    for path in sorted(glob.glob(os.path.join(args.corpus, '*.wav'))):
+        reference = os.path.splitext(path)[0] + '.txt'
+        if os.path.exists(reference):
+            pcm, rate = read_wav(path)
+            with open(reference, encoding='utf-8') as f:
+                clips.append((os.path.basename(path), pcm, rate, words(f.read())))
+    if not clips:
+        sys.exit(f"No WAV files with .txt transcripts in {args.corpus}")
+    audio_seconds = sum(len(pcm) / 2 / rate for _, pcm, rate, _ in clips)
+    print(f"Corpus: {len(clips)} clips, {audio_seconds:.1f} s of audio\n")
+
+    print(f"{'backend':<10} {'load s':>7} {'RTF':>7} {'WER':>7} {'1st partial s':>14}")
+    for name in args.backend or ['google']:
+        started = time.perf_counter()
+        backend = create_stt_backend(name)
+        load_seconds = time.perf_counter() - started
+        if backend.name != name:
+            print(f"{name:<10} unavailable")
+            continue
+
+        errors = reference_words = 0
+        decode_seconds = decoded_seconds = 0.0
+        partial_latencies = []
+        for clip_name, pcm, rate, reference in clips:
+            try:
+                text, seconds, first_partial = run_clip(backend, pcm, rate, args.chunk)
+            except sr.RequestError as e:
+                print(f"{name:<10} {clip_name}: {e}")
+                continue
+            hypothesis = words(text)
+            errors += edit_distance(reference, hypothesis)
+            reference_words += len(reference)
+            decode_seconds += seconds
+            decoded_seconds += len(pcm) / 2 / rate
+            if first_partial is not None:
+                partial_latencies.append(first_partial)
+            if args.verbose:
+                print(f"  {clip_name}: {' '.join(hypothesis)}")
+
+        if not decoded_seconds:
+            continue
+        wer = errors / reference_words if reference_words else 0.0
+        partial = f"{sum(partial_latencies) / len(partial_latencies):.3f}" if partial_latencies else "-"
+        print(f"{name:<10} {load_seconds:>7.2f} {decode_seconds / decoded_seconds:>7.3f} {wer:>7.1%} {partial:>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Detection latency and false-accept benchmark for the local wake-word engines.
+
+Fixture layout (all WAV, any sample rate):
+
+    fixtures/
+        templates/   recordings of the wake word used to build the template engine
+                     (src/enroll_wake_word.py --dir .../templates records them)
+        positive/    clips that each contain the wake word once
+        negative/    clips without the wake word (speech, music, room noise)
+
+A positive clip may have a sidecar <name>.txt holding the time in seconds at which the
+wake word ends; latency is then measured from that point, otherwise from the clip start.
+
+    python benchmarks/wake_word_benchmark.py path/to/fixtures [--engine template] [--chunk-ms 30]
+"""
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from modules.audio_utils import read_wav  # noqa: E402
+from modules.wake_word import create_wake_word_engine  # noqa: E402
+
+
+def stream_clip(engine, path, chunk_ms):
+    """Feeds a clip chunk by chunk. Returns (detection times in seconds, clip length, CPU seconds)."""
+    pcm, rate = read_wav(path)
+    chunk_bytes = int(rate * chunk_ms / 1000) * 2
+    engine.reset()
+    detections = []
+    started = time.perf_counter()
+    for offset in range(0, len(pcm), chunk_bytes):
+        if engine.process(pcm[offset:offset + chunk_bytes], rate):
+            detections.append((offset + chunk_bytes) / 2 / rate)
+    return detections, len(pcm) / 2 / rate, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures")
+    parser.add_argument("--engine", default="template")
+    parser.add_argument("--chunk-ms", type=int, default=30)
+    args = parser.parse_args()
+
+    engine = create_wake_word_engine(args.engine, os.path.join(args.fixtures, 'templates'))
+    if engine is None:
+        sys.exit(f"Could not create the '{args.engine}' wake-word engine")
+
+    latencies, missed, audio_seconds, cpu_seconds = [], [], 0.0, 0.0
+    positives = sorted(glob.glob(os.path.join(args.fixtures, 'positive', '*.wav')))
+    for path in positives:
+        detections, length, cpu = stream_clip(engine, path, args.chunk_ms)
+        audio_seconds += length
+        cpu_seconds += cpu
+        if not detections:
+            missed.append(os.path.basename(path))
+            continue
+        marker = os.path.splitext(path)[0] + '.txt'
+        wake_word_end = 0.0
+        if os.path.exists(marker):
+            with open(marker) as f:
+                wake_word_end = float(f.read().strip())
+        latencies.append(detections[0] - wake_word_end)
+
+    false_accepts, negative_seconds = 0, 0.0
+    negatives = sorted(glob.glob(os.path.join(args.fixtures, 'negative', '*.wav')))
+    for path in negatives:
+        detections, length, cpu = stream_clip(engine, path, args.chunk_ms)
+        false_accepts += len(detections)
+        negative_seconds += length
+        audio_seconds += length
+        cpu_seconds += cpu
+
+    print(f"Engine:            {args.engine} ({type(engine).__name__})")
+    if positives:
+        print(f"Detected:          {len(latencies)}/{len(positives)} positive clips")
+    if latencies:
+        print(f"Latency (s):       mean {statistics.mean(latencies):.3f}  median {statistics.median(latencies):.3f}  max {max(latencies):.3f}")
+    if missed:
+        print(f"Missed:            {', '.join(missed)}")
+    if negatives:
+        per_hour = false_accepts / negative_seconds * 3600 if negative_seconds else 0.0
+        print(f"False accepts:     {false_accepts} in {negative_seconds:.1f} s of negative audio ({per_hour:.2f}/hour)")
+    if audio_seconds:
+        print(f"Real-time factor:  {cpu_seconds / audio_seconds:.4f} (CPU seconds per second of audio)")
+
+
+if __name__ == "__main__":
+    main()
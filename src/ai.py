@@ -1,30 +1,245 @@
+import asyncio
+import concurrent.futures
 import json
+import logging
 import os
 import platform
-import psutil
 import openai
 from dotenv import load_dotenv
 import glob
+import itertools
 import re
 import tempfile
 import webbrowser
 import time
 import threading
-import subprocess
 from functools import lru_cache
 from typing import Dict, Any, List
-import pyautogui
-import base64
-import io
-
-# Use Matplotlib's 'agg' backend to avoid GUI issues
-import matplotlib
-matplotlib.use('agg')
-import matplotlib.pyplot as plt
+from modules.app_logging import CallbackHandler, configure_logging, get_logger
+from modules.assistant_registry import AssistantRegistry
+from modules.async_loop import AsyncLoop
+from modules.file_index import FileIndex
+from modules.job_manager import JobManager
+from modules import file_tools
+from modules import screen_capture
+from modules.tool_dispatcher import ToolDispatcher
+from modules.tracing import tracer
 
 # Load environment variables
 load_dotenv(os.path.join(os.path.dirname(__file__), '..', 'config', '.env'))
 
+ASSISTANT_NAME = "Ava"
+ASSISTANT_REGISTRY_PATH = os.getenv('AVA_ASSISTANT_REGISTRY', os.path.join(os.path.dirname(__file__), '..', 'config', 'assistants.json'))
+ASSISTANT_MAX_AGE = 30 * 24 * 60 * 60  # Unused registry entries are deleted after 30 days
+ASSISTANT_GC_INTERVAL = 24 * 60 * 60  # Stale assistants are looked for at most once a day
+RUN_CANCEL_TIMEOUT = 10  # Seconds to wait for a cancelled run to stop before moving on
+ACTIVE_RUN_STATUSES = ("queued", "in_progress", "requires_action")  # A run in these blocks new messages
+
+# Screenshots are shrunk and compressed before they are sent to the vision model
+VISION_MODEL = os.getenv('OPENAI_VISION_MODEL', 'gpt-4o-mini')
+VISION_MAX_SIZE = int(os.getenv('AVA_VISION_MAX_SIZE', '1280'))  # Longest side in pixels
+VISION_FORMAT = os.getenv('AVA_VISION_FORMAT', 'jpeg')  # jpeg, webp or png
+VISION_QUALITY = int(os.getenv('AVA_VISION_QUALITY', '70'))
+VISION_DETAIL = os.getenv('AVA_VISION_DETAIL', 'auto')  # low, high or auto
+
+FILE_INDEX_PATH = os.getenv('AVA_FILE_INDEX', os.path.join(os.path.dirname(__file__), '..', 'config', 'file_index.db'))
+
+# Tool calls from one run step are executed in parallel. These bound how long each tool may
+# take (in seconds) and how many calls of a tool may run at once; pyplot and the clipboard
+# are process-wide state, and screen captures are expensive enough to serialize.
+TOOL_WORKERS = 4
+TOOL_DEFAULT_TIMEOUT = 60
+TOOL_TIMEOUTS = {
+    "vision": 90,
+    "search_and_replace_in_files": 120,
+}
+TOOL_CONCURRENCY = {
+    "vision": 1,
+    "generate_chart": 1,
+    "read_highlighted_text": 1,
+}
+
+# Terminal commands run as jobs on the AI loop. One that is still running after JOB_WAIT
+# seconds is left in the background, and its result is sent along with the next user message.
+JOB_WAIT = float(os.getenv('AVA_JOB_WAIT', '10'))
+JOB_TIMEOUT = float(os.getenv('AVA_JOB_TIMEOUT', '600'))  # Seconds before a job is killed
+JOB_OUTPUT_CHARS = int(os.getenv('AVA_JOB_OUTPUT_CHARS', '20000'))  # Output kept per job
+JOB_TAIL_LINES = 40  # Output lines shown to the model
+JOB_CPU_SECONDS = int(os.getenv('AVA_JOB_CPU_SECONDS', '0'))  # CPU time limit per job (POSIX), 0 for none
+JOB_MEMORY_MB = int(os.getenv('AVA_JOB_MEMORY_MB', '0'))  # Address space limit per job (POSIX), 0 for none
+JOB_MAX_RUNNING = int(os.getenv('AVA_JOB_MAX_RUNNING', '8'))
+
+ASSISTANT_TOOLS = [
+    {"type": "function", "function": {
+        "name": "vision",
+        "description": "Captures the screen and analyzes it using the OpenAI Vision API. Can answer queries about specific elements or provide a general description.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "query": {"type": "string", "description": "The question or task for analyzing the screen"},
+                "area": {"type": "string", "enum": ["screen", "active_window"],
+                         "description": "Optional: capture the whole screen (default) or only the active window"},
+                "region": {"type": "object", "description": "Optional: capture only this screen rectangle, in pixels",
+                           "properties": {
+                               "x": {"type": "integer"}, "y": {"type": "integer"},
+                               "width": {"type": "integer"}, "height": {"type": "integer"}
+                           },
+                           "required": ["x", "y", "width", "height"]}
+            },
+            "required": ["query"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "create_file",
+        "description": "Creates a new file on the local machine",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filepath": {"type": "string", "description": "The full path of the file to create"}
+            },
+            "required": ["filepath"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "edit_file",
+        "description": "Edits the contents of an existing file",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filepath": {"type": "string", "description": "The full path of the file to edit"},
+                "content": {"type": "string", "description": "The new content to write to the file"}
+            },
+            "required": ["filepath", "content"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "search_files",
+        "description": "Searches for files in the user's home directory",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "pattern": {"type": "string", "description": "The search pattern (e.g., '*.txt' for all text files)"},
+                "match": {"type": "string", "enum": ["glob", "prefix", "substring"],
+                          "description": "How to match the pattern against file names (default: glob)"},
+                "max_results": {"type": "integer", "description": "Maximum number of results to return"}
+            },
+            "required": ["pattern"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "search_and_replace_in_files",
+        "description": "Searches for a pattern and replaces it in specified files",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "file_pattern": {"type": "string", "description": "The pattern to match files (e.g., '*.txt')"},
+                "search_pattern": {"type": "string", "description": "The pattern to search for in the files"},
+                "replacement": {"type": "string", "description": "The text to replace the matched pattern"},
+                "line_numbers": {"type": "array", "items": {"type": "integer"},
+                                 "description": "Optional: Specific line numbers to perform the replacement (empty for all lines)"}
+            },
+            "required": ["file_pattern", "search_pattern", "replacement"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "generate_chart",
+        "description": "Generates a chart or graph based on provided data",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "chart_type": {"type": "string", "enum": ["line", "bar", "scatter", "pie"],
+                               "description": "The type of chart to generate"},
+                "data": {"type": "object", "description": "The data for the chart (format depends on chart type)"},
+                "title": {"type": "string", "description": "The title of the chart"}
+            },
+            "required": ["chart_type", "data", "title"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "delete_file",
+        "description": "Deletes a file from the local machine",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filepath": {"type": "string", "description": "The full path of the file to delete"}
+            },
+            "required": ["filepath"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "execute_terminal_command",
+        "description": "Executes a terminal command on the local machine. Returns its exit code and output if it finishes within a few seconds; otherwise it keeps running as a background job, and its result is included with the user's next message",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "command": {"type": "string", "description": "The terminal command to execute"},
+                "timeout": {"type": "integer", "description": "Optional: seconds after which the command is killed"}
+            },
+            "required": ["command"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "get_job_status",
+        "description": "Gets the state, exit code and latest output of a terminal command job",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "integer", "description": "The ID of the job"},
+                "tail_lines": {"type": "integer", "description": "Optional: number of output lines to return"}
+            },
+            "required": ["job_id"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "kill_job",
+        "description": "Stops a running terminal command job",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "job_id": {"type": "integer", "description": "The ID of the job"}
+            },
+            "required": ["job_id"]
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "list_jobs",
+        "description": "Lists the recent terminal command jobs and their state",
+        "parameters": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "read_highlighted_text",
+        "description": "Reads the text currently highlighted by the user",
+        "parameters": {
+            "type": "object",
+            "properties": {},
+            "required": []
+        }
+    }},
+    {"type": "function", "function": {
+        "name": "read_file",
+        "description": "Reads the contents of a file on the local machine. Large files are summarized unless a range, head/tail or pattern is given",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "filepath": {"type": "string", "description": "The full path of the file to read"},
+                "start_line": {"type": "integer", "description": "Optional: first line to read (1-based)"},
+                "end_line": {"type": "integer", "description": "Optional: last line to read (inclusive)"},
+                "start_byte": {"type": "integer", "description": "Optional: byte offset to start reading at"},
+                "end_byte": {"type": "integer", "description": "Optional: byte offset to stop reading at"},
+                "head": {"type": "integer", "description": "Optional: read only the first N lines"},
+                "tail": {"type": "integer", "description": "Optional: read only the last N lines"},
+                "pattern": {"type": "string", "description": "Optional: regular expression; only matching lines are returned with their line numbers"}
+            },
+            "required": ["filepath"]
+        }
+    }}
+]
+
+
 class AIAssistant:
     def __init__(self, log_callback=None):
         self.api_key = os.getenv('OPENAI_API_KEY')
@@ -36,23 +251,64 @@ class AIAssistant:
         
         openai.api_key = self.api_key
         self.client = openai.OpenAI()
+        # Turns, API calls and tool dispatch run on one event loop thread sharing one
+        # async client (and with it one connection pool)
+        self.loop = AsyncLoop()
+        self.async_client = openai.AsyncOpenAI()
+        self.thread_lock = asyncio.Lock()
+        self.turn_lock = threading.Lock()
+        self.active_turn: concurrent.futures.Future = None
         self.assistant_id: str = None
+        self.assistant_registry = AssistantRegistry(os.path.abspath(ASSISTANT_REGISTRY_PATH))
         self.thread_id: str = None
         self.current_run_id: str = None
-        self.log_messages: List[str] = []
-        self.system_info = self.get_system_info()
+        self.log_ring = configure_logging()  # Latest records, queried by get_logs
+        self.logger = get_logger()
         self.log_callback = log_callback  # Callback to send logs to GUI
+        # Terminal output goes through the same pipeline, so it is kept and filed like any other log
+        self.terminal_logger = get_logger('terminal')
+        if log_callback:
+            self.terminal_handler = CallbackHandler(log_callback)
+        else:
+            self.terminal_handler = logging.StreamHandler()
+            self.terminal_handler.setFormatter(logging.Formatter("Log (no callback): %(message)s"))
+        self.terminal_logger.addHandler(self.terminal_handler)
+        self.system_info = self.get_system_info()
+        excludes = os.getenv('AVA_INDEX_EXCLUDE')  # Comma-separated name patterns, replaces the defaults
+        self.file_index = FileIndex(
+            os.path.abspath(FILE_INDEX_PATH),
+            self.system_info.get('home_dir', os.path.expanduser("~")),
+            excludes=[e.strip() for e in excludes.split(',') if e.strip()] if excludes is not None else None
+        )
+        self.file_index.start()
+        self.vision_cache = screen_capture.VisionCache()
+        self.tool_dispatcher = ToolDispatcher(
+            self.execute_tool,
+            max_workers=TOOL_WORKERS,
+            timeouts=TOOL_TIMEOUTS,
+            concurrency=TOOL_CONCURRENCY,
+            default_timeout=TOOL_DEFAULT_TIMEOUT
+        )
+        self.job_manager = JobManager(
+            self.loop,
+            on_line=self.on_job_line,
+            on_finished=self.on_job_finished,
+            default_timeout=JOB_TIMEOUT,
+            max_output=JOB_OUTPUT_CHARS,
+            cpu_seconds=JOB_CPU_SECONDS,
+            memory_mb=JOB_MEMORY_MB,
+            max_jobs=JOB_MAX_RUNNING
+        )
+        self.finished_jobs: List = []  # Background jobs whose results go out with the next user message
     
     def log_to_terminal(self, message: str) -> None:
         """Send a message to the terminal via callback."""
-        if self.log_callback:
-            self.log_callback(message)
-        else:
-            self.log(f"Log (no callback): {message}")
+        self.terminal_logger.info(message)
 
     @lru_cache(maxsize=1)
     def get_system_info(self) -> Dict[str, Any]:
         try:
+            import psutil
             info = {
                 "os": platform.system(),
                 "processor": platform.processor(),
@@ -62,151 +318,96 @@ class AIAssistant:
                 "available_memory": psutil.virtual_memory().available,
                 "disk_usage": psutil.disk_usage('/'),
             }
-            self.log(f"System information gathered: {json.dumps(info, indent=2)}")
+            self.log("System information gathered: %s", info)
             return info
         except Exception as e:
-            self.log(f"Error gathering system information: {str(e)}")
+            self.log(f"Error gathering system information: {str(e)}", level=logging.ERROR)
             return {}
 
-    def setup_assistant(self) -> None:
-        try:
-            system_info_str = json.dumps(self.system_info, indent=2)
-            assistant = self.client.beta.assistants.create(
-                name="Ava",
-                instructions=f"""You are a voice-controlled AI assistant capable of performing actions on the local machine your name is Ava. 
+    def build_instructions(self) -> str:
+        # Values that change between launches are left out so the configuration hash,
+        # and with it the registered assistant, stays the same from one start to the next
+        stable_info = {k: v for k, v in self.system_info.items() if k not in ("available_memory", "disk_usage")}
+        system_info_str = json.dumps(stable_info, indent=2)
+        return f"""You are a voice-controlled AI assistant capable of performing actions on the local machine your name is Ava. 
                 Provide concise and natural-sounding responses suitable for conversations. Do not include any formatting like the use of * in your response. You have access to the following system information:
                 {system_info_str}
-                Use this information to make informed decisions about file paths and system capabilities.""",
-                model=self.model,
-                tools=[
-                    {"type": "function", "function": {
-                    "name": "vision",
-                    "description": "Captures the screen and analyzes it using the OpenAI Vision API. Can answer queries about specific elements or provide a general description.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "query": {"type": "string", "description": "The question or task for analyzing the screen"}
-                        },
-                        "required": ["query"]
-                    }
-                }},
-                    {"type": "function", "function": {
-                        "name": "create_file",
-                        "description": "Creates a new file on the local machine",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "filepath": {"type": "string", "description": "The full path of the file to create"}
-                            },
-                            "required": ["filepath"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "edit_file",
-                        "description": "Edits the contents of an existing file",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "filepath": {"type": "string", "description": "The full path of the file to edit"},
-                                "content": {"type": "string", "description": "The new content to write to the file"}
-                            },
-                            "required": ["filepath", "content"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "search_files",
-                        "description": "Searches for files in the user's home directory",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "pattern": {"type": "string", "description": "The search pattern (e.g., '*.txt' for all text files)"},
-                                "max_results": {"type": "integer", "description": "Maximum number of results to return"}
-                            },
-                            "required": ["pattern"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "search_and_replace_in_files",
-                        "description": "Searches for a pattern and replaces it in specified files",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "file_pattern": {"type": "string", "description": "The pattern to match files (e.g., '*.txt')"},
-                                "search_pattern": {"type": "string", "description": "The pattern to search for in the files"},
-                                "replacement": {"type": "string", "description": "The text to replace the matched pattern"},
-                                "line_numbers": {"type": "array", "items": {"type": "integer"},
-                                                 "description": "Optional: Specific line numbers to perform the replacement (empty for all lines)"}
-                            },
-                            "required": ["file_pattern", "search_pattern", "replacement"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "generate_chart",
-                        "description": "Generates a chart or graph based on provided data",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "chart_type": {"type": "string", "enum": ["line", "bar", "scatter", "pie"],
-                                               "description": "The type of chart to generate"},
-                                "data": {"type": "object", "description": "The data for the chart (format depends on chart type)"},
-                                "title": {"type": "string", "description": "The title of the chart"}
-                            },
-                            "required": ["chart_type", "data", "title"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "delete_file",
-                        "description": "Deletes a file from the local machine",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "filepath": {"type": "string", "description": "The full path of the file to delete"}
-                            },
-                            "required": ["filepath"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "execute_terminal_command",
-                        "description": "Executes a terminal command on the local machine",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "command": {"type": "string", "description": "The terminal command to execute"}
-                            },
-                            "required": ["command"]
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "read_highlighted_text",
-                        "description": "Reads the text currently highlighted by the user",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {},
-                            "required": []
-                        }
-                    }},
-                    {"type": "function", "function": {
-                        "name": "read_file",
-                        "description": "Reads the contents of a file on the local machine",
-                        "parameters": {
-                            "type": "object",
-                            "properties": {
-                                "filepath": {"type": "string", "description": "The full path of the file to read"}
-                            },
-                            "required": ["filepath"]
-                        }
-                    }}
-                ]
-            )
-            self.assistant_id = assistant.id
-            self.log(f"Voice-enabled Assistant created with ID: {self.assistant_id}")
+                Use this information to make informed decisions about file paths and system capabilities."""
+
+    def setup_assistant(self, force_create: bool = False) -> None:
+        """Reuses the registered assistant for the current configuration, updating or creating one only when needed."""
+        try:
+            instructions = self.build_instructions()
+            config_hash = AssistantRegistry.config_hash(self.model, instructions, ASSISTANT_TOOLS)
+            assistant_config = {
+                "name": ASSISTANT_NAME,
+                "instructions": instructions,
+                "model": self.model,
+                "tools": ASSISTANT_TOOLS,
+                "metadata": {"app": "ava", "host": platform.node()[:64], "config_hash": config_hash[:64]},
+            }
+
+            assistant_id = None if force_create else self.assistant_registry.lookup(config_hash)
+            if assistant_id:
+                self.assistant_id = assistant_id
+                self.log(f"Reusing voice-enabled Assistant with ID: {self.assistant_id}")
+            else:
+                previous_hash, previous_id = self.assistant_registry.current()
+                assistant = None
+                if previous_id and not force_create:
+                    try:
+                        assistant = self.client.beta.assistants.update(previous_id, **assistant_config)
+                        self.log(f"Configuration changed, updated Assistant with ID: {assistant.id}")
+                    except openai.NotFoundError:
+                        self.log(f"Registered Assistant {previous_id} no longer exists")
+                if assistant is None:
+                    assistant = self.client.beta.assistants.create(**assistant_config)
+                    self.log(f"Voice-enabled Assistant created with ID: {assistant.id}")
+                self.assistant_id = assistant.id
+                self.assistant_registry.record(config_hash, self.assistant_id, replaces=previous_hash)
+
+            if self.assistant_registry.collection_due(ASSISTANT_GC_INTERVAL):
+                threading.Thread(target=self.collect_stale_assistants, daemon=True).start()
         except Exception as e:
-            self.log(f"Error creating voice-enabled assistant: {str(e)}")
+            self.log(f"Error creating voice-enabled assistant: {str(e)}", level=logging.ERROR)
             raise
 
-    def log(self, message: str) -> None:
-        self.log_messages.append(message)
-        print(message)
+    def collect_stale_assistants(self) -> None:
+        """Deletes assistants left behind by earlier launches on this machine.
+
+        Registry entries unused for ASSISTANT_MAX_AGE are removed, as are account assistants
+        that this app created on this host (by their metadata) but that are no longer in the
+        registry. Assistants without that metadata may belong to someone else sharing the API
+        key, so they are only logged, never deleted.
+        """
+        try:
+            stale_ids = set(self.assistant_registry.stale_ids(ASSISTANT_MAX_AGE))
+            known_ids = self.assistant_registry.known_ids()
+            host = platform.node()[:64]
+            for assistant in self.client.beta.assistants.list(limit=100):
+                if assistant.id in known_ids or assistant.name != ASSISTANT_NAME:
+                    continue
+                metadata = assistant.metadata or {}
+                if metadata.get("app") == "ava" and metadata.get("host") == host:
+                    stale_ids.add(assistant.id)
+                elif metadata.get("app") != "ava":
+                    self.log(f"Leaving Assistant {assistant.id} named {ASSISTANT_NAME} alone, it was not created by this app")
+
+            for assistant_id in stale_ids:
+                if assistant_id == self.assistant_id:
+                    continue
+                try:
+                    self.client.beta.assistants.delete(assistant_id=assistant_id)
+                except openai.NotFoundError:
+                    pass
+                self.assistant_registry.remove(assistant_id)
+                self.log(f"Deleted stale Assistant with ID: {assistant_id}")
+        except Exception as e:
+            self.log(f"Error collecting stale assistants: {str(e)}", level=logging.ERROR)
+
+    def log(self, message: str, *args, level: int = logging.INFO) -> None:
+        """Logs message, %-formatted with args only if a sink actually takes the record."""
+        self.logger.log(level, message, *args)
 
     def execute_tool(self, tool_name: str, arguments: str) -> str:
         if not tool_name:
@@ -214,26 +415,30 @@ class AIAssistant:
 
         args = json.loads(arguments)
         self.log(f"Executing tool: {tool_name}")
-        self.log(f"Arguments: {args}")
+        self.log("Arguments: %s", args)
 
         tool_functions = {
-            "vision": lambda x: self.vision(x.get("query")),
+            "vision": lambda x: self.vision(x.get("query"), x.get("area", "screen"), x.get("region")),
             "create_file": self.create_file,
             "edit_file": self.edit_file,
             "search_files": self.search_files,
             "search_and_replace_in_files": self.search_and_replace_in_files,
             "generate_chart": self.generate_chart,
             "execute_terminal_command": self.execute_terminal_command,
+            "get_job_status": self.get_job_status,
+            "kill_job": self.kill_job,
+            "list_jobs": self.list_jobs,
             "read_file": self.read_file,
             "delete_file": self.delete_file,
             "read_highlighted_text": self.read_highlighted_text
         }
 
         if tool_name in tool_functions:
-            return tool_functions[tool_name](args)
+            with tracer.span(f"tool.{tool_name}"):
+                return tool_functions[tool_name](args)
         else:
             error_message = f"Unknown tool: {tool_name}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
 
     def read_highlighted_text(self, args: Dict[str, Any]) -> str:
@@ -257,13 +462,13 @@ class AIAssistant:
             pyperclip.copy(original_clipboard)
             
             if highlighted_text:
-                self.log(f"Read highlighted text: {highlighted_text}")
+                self.log("Read highlighted text: %s", highlighted_text)
                 return f"The highlighted text is: {highlighted_text}"
             else:
                 return "No text was highlighted or copied. Please highlight some text and try again."
         except Exception as e:
             error_message = f"Error reading highlighted text: {str(e)}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
 
     def delete_file(self, args: Dict[str, Any]) -> str:
@@ -277,31 +482,38 @@ class AIAssistant:
             return f"File '{filepath}' has been deleted successfully."
         except FileNotFoundError:
             error_message = f"Error: File '{filepath}' not found."
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
         except PermissionError:
             error_message = f"Error: Permission denied to delete file '{filepath}'."
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
         except Exception as e:
             error_message = f"Error deleting file: {str(e)}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
     
-    def vision(self, query):
-        """Captures the screen and analyzes it using the OpenAI Vision API."""
+    def vision(self, query, area="screen", region=None):
+        """Captures the screen and analyzes it using the OpenAI Vision API.
+
+        The capture is downscaled and compressed before upload, and the answer is reused
+        while the same query is asked about a screen that has not changed at all.
+        """
         try:
             # Capture the screen
-            screenshot = pyautogui.screenshot()
-        
-            # Convert the screenshot to a base64-encoded string
-            img_buffer = io.BytesIO()
-            screenshot.save(img_buffer, format="PNG")
-            img_buffer.seek(0)
-            base64_image = base64.b64encode(img_buffer.read()).decode("utf-8")
-            # Call the OpenAI Vision API with the base64 image
+            screenshot = screen_capture.capture(area, region)
+            screenshot = screen_capture.downscale(screenshot, VISION_MAX_SIZE)
+
+            digest = screen_capture.screen_digest(screenshot)
+            cached = self.vision_cache.get(query, area, region, digest)
+            if cached is not None:
+                self.log("Vision: screen unchanged, reusing the previous answer")
+                return cached
+
+            image_url = screen_capture.encode(screenshot, VISION_FORMAT, VISION_QUALITY)
+            # Call the OpenAI Vision API with the encoded image
             response = openai.chat.completions.create(
-                model="gpt-4o-mini",  # Replace with the desired model version
+                model=VISION_MODEL,
                 messages=[
                     {
                         "role": "user",
@@ -310,8 +522,8 @@ class AIAssistant:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:image/png;base64,{base64_image}",
-                                    "detail": "auto"  # Can be 'low', 'high', or 'auto' based on requirements
+                                    "url": image_url,
+                                    "detail": VISION_DETAIL  # Can be 'low', 'high', or 'auto' based on requirements
                                 },
                             },
                         ],
@@ -321,7 +533,8 @@ class AIAssistant:
             
             # Extract and return the response content
             result = response.choices[0].message.content
-            print("Vision tool output: " + result)
+            self.vision_cache.put(query, area, region, digest, result)
+            self.log("Vision tool output: %s", result)
             return result
 
         except Exception as e:
@@ -333,13 +546,21 @@ class AIAssistant:
             return "Error: No filepath provided for read_file"
         
         try:
-            with open(filepath, 'r') as file:
-                content = file.read()
+            content = file_tools.read_file(
+                filepath,
+                start_line=args.get("start_line"),
+                end_line=args.get("end_line"),
+                start_byte=args.get("start_byte"),
+                end_byte=args.get("end_byte"),
+                head=args.get("head"),
+                tail=args.get("tail"),
+                pattern=args.get("pattern")
+            )
             self.log(f"File '{filepath}' has been read successfully.")
-            return f"File contents:\n{content}"
+            return content
         except Exception as e:
             error_message = f"Error reading file: {str(e)}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
 
     def execute_terminal_command(self, args: Dict[str, Any]) -> str:
@@ -347,38 +568,58 @@ class AIAssistant:
         if not command:
             return "Error: No command provided for execute_terminal_command"
 
-        def run_command():
-            try:
-                process = subprocess.Popen(
-                    command,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                self.log(f"Running command: {command}")
-
-                # Read stdout and stderr line by line
-                for line in iter(process.stdout.readline, ''):
-                    self.log_to_terminal(f"OUTPUT: {line.strip()}")
-
-                for line in iter(process.stderr.readline, ''):
-                    self.log_to_terminal(f"ERROR: {line.strip()}")
-
-                process.stdout.close()
-                process.stderr.close()
-                process.wait()
-
-                if process.returncode == 0:
-                    self.log_to_terminal(f"Command '{command}' completed successfully.")
-                else:
-                    self.log_to_terminal(f"Command failed with return code {process.returncode}.")
-            except Exception as e:
-                error_message = f"Error while running command: {e}"
-                self.log_to_terminal(error_message)
+        try:
+            job = self.job_manager.start(command, args.get("timeout"))
+        except Exception as e:
+            error_message = f"Error while running command: {str(e)}"
+            self.log(error_message, level=logging.ERROR)
+            return error_message
+        self.log(f"Running command as job {job.id}: {command}")
+
+        if job.done.wait(JOB_WAIT):
+            job.reported = True
+            return self.job_manager.describe(job, JOB_TAIL_LINES)
+        return (f"{self.job_manager.describe(job, JOB_TAIL_LINES)}\n"
+                f"It keeps running in the background, and its result will be included with the user's "
+                f"next message. Use get_job_status with job_id {job.id} to check on it sooner.")
+
+    def get_job_status(self, args: Dict[str, Any]) -> str:
+        job = self.job_manager.get(args.get("job_id"))
+        if not job:
+            return f"Error: No job with ID {args.get('job_id')}"
+        if not job.running:
+            job.reported = True
+        return self.job_manager.describe(job, args.get("tail_lines") or JOB_TAIL_LINES)
+
+    def kill_job(self, args: Dict[str, Any]) -> str:
+        job = self.job_manager.kill(args.get("job_id"))
+        if not job:
+            return f"Error: No job with ID {args.get('job_id')}"
+        job.reported = True
+        return self.job_manager.describe(job, JOB_TAIL_LINES)
+
+    def list_jobs(self, args: Dict[str, Any]) -> str:
+        jobs = self.job_manager.list()
+        if not jobs:
+            return "No terminal commands have been run yet."
+        return "\n".join(job.summary() for job in jobs)
+
+    def on_job_line(self, job, stream: str, line: str) -> None:
+        self.log_to_terminal(f"{'OUTPUT' if stream == 'stdout' else 'ERROR'} [job {job.id}]: {line}")
+
+    def on_job_finished(self, job) -> None:
+        """Called on the AI loop when a job ends. Its result waits for the next turn, since a run
+        may be using the conversation thread right now."""
+        if job.status == "exited" and job.exit_code == 0:
+            self.log_to_terminal(f"Command '{job.command}' completed successfully.")
+        else:
+            self.log_to_terminal(job.summary())
+        self.finished_jobs.append(job)
 
-        threading.Thread(target=run_command, daemon=True).start()
-        return f"Command '{command}' is running. Check the terminal for logs."
+    def job_results_notice(self, jobs) -> str:
+        """The results of finished background jobs, as a notice to put before the user's message."""
+        results = "\n\n".join(self.job_manager.describe(job, JOB_TAIL_LINES) for job in jobs)
+        return f"(Automatic notice, not said by the user) Background commands finished since the last message:\n{results}"
 
 
 
@@ -395,7 +636,7 @@ class AIAssistant:
             return f"File '{filepath}' has been created successfully."
         except Exception as e:
             error_message = f"Error creating file: {str(e)}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
 
     def edit_file(self, args: Dict[str, Any]) -> str:
@@ -411,29 +652,37 @@ class AIAssistant:
             return f"File '{filepath}' has been updated successfully."
         except Exception as e:
             error_message = f"Error editing file: {str(e)}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
 
     def search_files(self, args: Dict[str, Any]) -> str:
         pattern = args.get("pattern")
+        match = args.get("match", "glob")
         max_results = args.get("max_results", 10)
         if not pattern:
             return "Error: No search pattern provided for search_files"
         
         try:
-            home_dir = self.system_info['home_dir']
-            search_path = os.path.join(home_dir, '**', pattern)
-            results = glob.glob(search_path, recursive=True)[:max_results]
+            if self.file_index.ready.is_set():
+                results = self.file_index.search(pattern, mode=match, max_results=max_results)
+            else:
+                # The first index scan is still running; walk the tree but stop at max_results
+                if match == "prefix":
+                    pattern = glob.escape(pattern) + "*"
+                elif match == "substring":
+                    pattern = "*" + glob.escape(pattern) + "*"
+                search_path = os.path.join(self.system_info['home_dir'], '**', pattern)
+                results = list(itertools.islice(glob.iglob(search_path, recursive=True), max_results))
             
             if results:
                 result_str = "\n".join(results)
-                self.log(f"Found {len(results)} file(s):\n{result_str}")
+                self.log("Found %d file(s):\n%s", len(results), result_str)
                 return f"Found {len(results)} file(s):\n{result_str}"
             else:
                 return "No files found matching the pattern."
         except Exception as e:
             error_message = f"Error searching for files: {str(e)}"
-            self.log(error_message)
+            self.log(error_message, level=logging.ERROR)
             return error_message
 
     def search_and_replace_in_files(self, args: Dict[str, Any]) -> str:
@@ -443,28 +692,21 @@ class AIAssistant:
         line_numbers = args.get("line_numbers", [])
 
         try:
-            files = glob.glob(file_pattern, recursive=True)
-            if not files:
+            regex = re.compile(search_pattern)
+            scanned, counts, errors = file_tools.search_and_replace(file_pattern, regex, replacement, line_numbers)
+            if not scanned:
                 return f"No files found matching the pattern: {file_pattern}"
 
-            total_replacements = 0
-            for file_path in files:
-                with open(file_path, 'r') as file:
-                    lines = file.readlines()
-
-                new_lines = []
-                for i, line in enumerate(lines, 1):
-                    if not line_numbers or i in line_numbers:
-                        new_line, count = re.subn(search_pattern, replacement, line)
-                        total_replacements += count
-                    else:
-                        new_line = line
-                    new_lines.append(new_line)
-
-                with open(file_path, 'w') as file:
-                    file.writelines(new_lines)
-
-            return f"Completed search and replace. Made {total_replacements} replacements across {len(files)} files."
+            total_replacements = sum(counts.values())
+            result = f"Completed search and replace. Made {total_replacements} replacements across {len(counts)} of {scanned} files."
+            details = [f"{path}: {count}" for path, count in sorted(counts.items())]
+            details += [f"{path}: error: {error}" for path, error in sorted(errors.items())]
+            if details:
+                result += "\n" + "\n".join(details[:50])
+                if len(details) > 50:
+                    result += f"\n... and {len(details) - 50} more"
+            self.log(result)
+            return result
         except Exception as e:
             return f"Error during search and replace: {str(e)}"
 
@@ -473,6 +715,12 @@ class AIAssistant:
         data = args.get("data", {"x": [1, 2, 3], "y": [4, 5, 6]})
         title = args.get("title", "Sample Chart")
 
+        # Matplotlib takes most of a second to import, so it is loaded by the first chart.
+        # The 'agg' backend avoids GUI issues.
+        import matplotlib
+        matplotlib.use('agg')
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(10, 6))
         chart_functions = {
             "line": lambda: plt.plot(data.get("x", []), data.get("y", [])),
@@ -509,92 +757,245 @@ class AIAssistant:
             except FileNotFoundError:
                 break
 
-    def wait_for_run_completion(self) -> None:
-        while True:
-            run_status = self.client.beta.threads.runs.retrieve(
-                thread_id=self.thread_id,
-                run_id=self.current_run_id
-            )
-            if run_status.status in ["completed", "failed"]:
-                break
-            time.sleep(1)
+    async def wait_for_run_completion_async(self) -> None:
+        """Waits until no turn is using the conversation thread."""
+        async with self.thread_lock:
+            pass
 
-    def get_ai_response(self, user_input: str) -> str:
+    def wait_for_run_completion(self, timeout: float = 120) -> None:
         try:
-            if not self.thread_id:
-                thread = self.client.beta.threads.create()
-                self.thread_id = thread.id
-                self.log(f"New conversation thread created with ID: {self.thread_id}")
-
-            if self.current_run_id:
-                self.wait_for_run_completion()
-
-            self.log(f"Sending user input to AI: {user_input}")
-            self.client.beta.threads.messages.create(
-                thread_id=self.thread_id,
-                role="user",
-                content=user_input
-            )
-
-            run = self.client.beta.threads.runs.create(
-                thread_id=self.thread_id,
-                assistant_id=self.assistant_id
-            )
-            self.current_run_id = run.id
-            self.log(f"Created new run with ID: {run.id}")
-
-            while True:
-                run_status = self.client.beta.threads.runs.retrieve(
-                    thread_id=self.thread_id,
-                    run_id=run.id
-                )
-                self.log(f"Run status: {run_status.status}")
-                
-                if run_status.status == "completed":
-                    messages = self.client.beta.threads.messages.list(thread_id=self.thread_id)
-                    response = messages.data[0].content[0].text.value
-                    self.log(f"AI response: {response}")
-                    return response
-
-                elif run_status.status == "requires_action":
-                    tool_calls = run_status.required_action.submit_tool_outputs.tool_calls
-                    tool_outputs = []
-
-                    for tool_call in tool_calls:
-                        function_name = tool_call.function.name
-                        function_args = tool_call.function.arguments
-
-                        self.log(f"Executing tool: {function_name}")
-                        output = self.execute_tool(function_name, function_args)
-                        tool_outputs.append({"tool_call_id": tool_call.id, "output": output})
-
-                    self.log("Submitting tool outputs")
-                    self.client.beta.threads.runs.submit_tool_outputs(
-                        thread_id=self.thread_id,
-                        run_id=run.id,
-                        tool_outputs=tool_outputs
-                    )
-
-                elif run_status.status == "failed":
-                    error_message = f"Run failed: {run_status.last_error.message}"
-                    self.log(error_message)
-                    return error_message
-
-                time.sleep(1)  # Add a small delay to avoid excessive API calls
+            self.loop.run(self.wait_for_run_completion_async(), timeout)
+        except TimeoutError:
+            self.log(f"Timed out waiting for run {self.current_run_id} to finish", level=logging.ERROR)
+
+    async def execute_tool_async(self, tool_name: str, arguments: str) -> str:
+        """Runs a tool on the dispatcher's worker pool without blocking the event loop."""
+        outputs = await self.tool_dispatcher.dispatch([(tool_name, arguments)])
+        return outputs[0]
+
+    async def run_tool_calls(self, tool_calls) -> List[Dict[str, str]]:
+        """Executes the tool calls of one run step in parallel, keeping their order."""
+        self.log(f"Executing tools: {', '.join(tool_call.function.name for tool_call in tool_calls)}")
+        outputs = await self.tool_dispatcher.dispatch(
+            [(tool_call.function.name, tool_call.function.arguments) for tool_call in tool_calls]
+        )
+        return [{"tool_call_id": tool_call.id, "output": output} for tool_call, output in zip(tool_calls, outputs)]
+
+    async def consume_run_stream(self, stream, on_text_delta=None, turn: int = None) -> str:
+        """Handles the events of a streamed run until it reaches a terminal state.
+
+        Tool calls are executed as soon as the run reports requires_action, and the
+        outputs are submitted on a new stream that replaces the current one.
+        """
+        response_parts: List[str] = []
+        requested = time.perf_counter()  # When the run (or the latest tool outputs) went out
+        while stream is not None:
+            next_stream = None
+            try:
+                async for event in stream:
+                    if event.event == "thread.run.created":
+                        self.current_run_id = event.data.id
+                        self.log(f"Created new run with ID: {event.data.id}")
+
+                    elif event.event == "thread.message.delta":
+                        for part in event.data.delta.content or []:
+                            if part.type == "text" and part.text and part.text.value:
+                                if not response_parts:
+                                    tracer.record("ai.first_token", requested, turn=turn)
+                                response_parts.append(part.text.value)
+                                if on_text_delta:
+                                    on_text_delta(part.text.value)
+
+                    elif event.event == "thread.run.requires_action":
+                        tool_calls = event.data.required_action.submit_tool_outputs.tool_calls
+                        with tracer.span("ai.tools", turn=turn, count=len(tool_calls)):
+                            tool_outputs = await self.run_tool_calls(tool_calls)
+
+                        self.log("Submitting tool outputs")
+                        requested = time.perf_counter()
+                        next_stream = await self.async_client.beta.threads.runs.submit_tool_outputs(
+                            thread_id=self.thread_id,
+                            run_id=event.data.id,
+                            tool_outputs=tool_outputs,
+                            stream=True
+                        )
+                        break
+
+                    elif event.event == "thread.run.completed":
+                        response = "".join(response_parts)
+                        self.log("AI response: %s", response)
+                        return response
+
+                    elif event.event == "thread.run.failed":
+                        last_error = event.data.last_error
+                        error_message = f"Run failed: {last_error.message if last_error else 'unknown error'}"
+                        self.log(error_message, level=logging.ERROR)
+                        return error_message
+
+                    elif event.event in ("thread.run.cancelled", "thread.run.expired"):
+                        error_message = f"Run {event.data.status}"
+                        self.log(error_message, level=logging.ERROR)
+                        return error_message
+
+                    elif event.event == "error":
+                        error_message = f"Run stream error: {event.data.message}"
+                        self.log(error_message, level=logging.ERROR)
+                        return error_message
+            finally:
+                await stream.close()
+            stream = next_stream
+
+        error_message = "Run stream ended before the run completed"
+        self.log(error_message, level=logging.ERROR)
+        return error_message
+
+    async def create_run_stream(self):
+        return await self.async_client.beta.threads.runs.create(
+            thread_id=self.thread_id,
+            assistant_id=self.assistant_id,
+            stream=True
+        )
+
+    async def assistant_exists(self) -> bool:
+        """Whether the API still has the current assistant; other errors propagate."""
+        try:
+            await self.async_client.beta.assistants.retrieve(self.assistant_id)
+        except openai.NotFoundError:
+            return False
+        return True
+
+    async def cancel_run(self) -> None:
+        """Cancels the in-flight run and waits until the thread accepts new messages again.
+
+        A turn preempted before its run.created event arrived has no run ID yet, so the
+        thread's active runs are looked up and cancelled instead.
+        """
+        if not self.thread_id:
+            return
+        run_ids = [self.current_run_id] if self.current_run_id else []
+        try:
+            if not run_ids:
+                runs = await self.async_client.beta.threads.runs.list(thread_id=self.thread_id, limit=5)
+                run_ids = [run.id for run in runs.data if run.status in ACTIVE_RUN_STATUSES]
+            for run_id in run_ids:
+                await self.cancel_run_by_id(run_id)
+        except openai.APIError as e:
+            self.log(f"Could not look up the active runs: {str(e)}", level=logging.ERROR)
+        finally:
+            self.current_run_id = None
+
+    async def cancel_run_by_id(self, run_id: str) -> None:
+        try:
+            run = await self.async_client.beta.threads.runs.cancel(run_id, thread_id=self.thread_id)
+            self.log(f"Cancelling run {run_id}")
+            delay = 0.1
+            deadline = time.monotonic() + RUN_CANCEL_TIMEOUT
+            while run.status in ACTIVE_RUN_STATUSES + ("cancelling",) and time.monotonic() < deadline:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 1.0)
+                run = await self.async_client.beta.threads.runs.retrieve(run_id, thread_id=self.thread_id)
+            self.log(f"Run {run_id} status after cancel: {run.status}")
+        except openai.APIError as e:
+            # Usually the run reached a terminal state on its own in the meantime
+            self.log(f"Could not cancel run {run_id}: {str(e)}", level=logging.ERROR)
+
+    async def get_ai_response_async(self, user_input: str, on_text_delta=None, turn: int = None) -> str:
+        with tracer.span("ai.response", turn=turn) as span:
+            try:
+                # Turns queue up here, so only one of them uses the conversation thread at a time
+                waiting = tracer.span("ai.wait", turn=turn)
+                async with self.thread_lock:
+                    waiting.end()
+                    try:
+                        with tracer.span("ai.message", turn=turn):
+                            if not self.thread_id:
+                                thread = await self.async_client.beta.threads.create()
+                                self.thread_id = thread.id
+                                self.log(f"New conversation thread created with ID: {self.thread_id}")
+
+                            self.log("Sending user input to AI: %s", user_input)
+                            # Background jobs that finished since the last turn and that the model
+                            # has not asked about are reported along with the user's message
+                            content = user_input
+                            jobs = [job for job in self.finished_jobs if not job.reported]
+                            if jobs:
+                                content = f"{self.job_results_notice(jobs)}\n\nUser: {user_input}"
+                            await self.async_client.beta.threads.messages.create(
+                                thread_id=self.thread_id,
+                                role="user",
+                                content=content
+                            )
+                            for job in jobs:
+                                job.reported = True
+                            self.finished_jobs = [job for job in self.finished_jobs if not job.reported]
+
+                        with tracer.span("ai.run", turn=turn):
+                            try:
+                                stream = await self.create_run_stream()
+                            except openai.NotFoundError:
+                                # The thread can be missing too; only replace the assistant once it
+                                # is confirmed gone, then retry once
+                                if not self.assistant_id or await self.assistant_exists():
+                                    raise
+                                self.log(f"Assistant {self.assistant_id} no longer exists, creating a new one")
+                                await asyncio.to_thread(self.setup_assistant, True)
+                                stream = await self.create_run_stream()
+                            response = await self.consume_run_stream(stream, on_text_delta, turn)
+                        self.current_run_id = None
+                        return response
+                    except BaseException:
+                        # Preempted by a newer turn, or failed mid-stream: stop the run before the
+                        # next turn tries to add its message to the thread
+                        await asyncio.shield(self.cancel_run())
+                        raise
 
-        except Exception as e:
-            error_message = f"Error in get_ai_response: {str(e)}"
-            self.log(error_message)
-            return error_message
+            except Exception as e:
+                error_message = f"Error in get_ai_response: {str(e)}"
+                self.log(error_message, level=logging.ERROR)
+                span.set(error=type(e).__name__)
+                return error_message
+
+    def submit_ai_response(self, user_input: str, on_text_delta=None, preempt: bool = True) -> concurrent.futures.Future:
+        """Starts a turn on the AI loop and returns a future for the reply.
+
+        With preempt, a turn still in progress is cancelled first: its run is cancelled on
+        the API side and its pending tool calls are abandoned before the new turn starts.
+        """
+        with self.turn_lock:
+            if preempt and self.active_turn and not self.active_turn.done():
+                self.log("New input received, cancelling the turn in progress")
+                self.active_turn.cancel()
+            self.active_turn = self.loop.submit(
+                self.get_ai_response_async(user_input, on_text_delta, tracer.current_turn))
+            return self.active_turn
+
+    def get_ai_response(self, user_input: str, on_text_delta=None) -> str:
+        try:
+            return self.submit_ai_response(user_input, on_text_delta).result()
+        except concurrent.futures.CancelledError:
+            return "Error in get_ai_response: the request was cancelled by a newer one"
 
     def delete_assistant(self) -> None:
         if self.assistant_id:
             try:
                 self.client.beta.assistants.delete(assistant_id=self.assistant_id)
+                self.assistant_registry.remove(self.assistant_id)
                 self.log(f"Assistant with ID {self.assistant_id} has been deleted.")
                 self.assistant_id = None
             except Exception as e:
-                self.log(f"Error deleting assistant: {str(e)}")
-
-    def get_logs(self) -> str:
-        return "\n".join(self.log_messages)
+                self.log(f"Error deleting assistant: {str(e)}", level=logging.ERROR)
+
+    def close(self) -> None:
+        """Stops the background work owned by the assistant."""
+        self.file_index.stop()
+        self.tool_dispatcher.shutdown()
+        self.job_manager.shutdown()
+        self.loop.stop()
+        self.log("Turn latency by stage:\n%s", tracer.summary())
+        self.terminal_logger.removeHandler(self.terminal_handler)
+
+    def get_logs(self, level: str = None, contains: str = None, tail: int = None, last_seconds: float = None) -> str:
+        """Recent log lines, optionally only those at or above level, containing a string, from
+        the last last_seconds seconds, or just the last tail of them."""
+        since = time.time() - last_seconds if last_seconds is not None else None
+        return "\n".join(self.log_ring.query(level=level, contains=contains, since=since, tail=tail))
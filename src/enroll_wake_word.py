@@ -0,0 +1,37 @@
+"""Records the wake-word templates used by the local template engine.
+
+Say the wake word once per prompt, the way you would to start a command. The recordings go
+to config/wake_word (or AVA_WAKE_WORD_TEMPLATES, or --dir) next to any earlier ones, and the
+template engine is used from the next start whenever that directory holds recordings. Run
+it again to add more takes; delete the directory to start over.
+
+    python src/enroll_wake_word.py --count 5
+"""
+import argparse
+import os
+import sys
+
+import speech_recognition as sr
+
+from modules.wake_word import TEMPLATES_DIR, TemplateWakeWordEngine, record_templates
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=5, help="recordings to make (default 5, at least 2 in total)")
+    parser.add_argument("--dir", default=os.getenv('AVA_WAKE_WORD_TEMPLATES') or TEMPLATES_DIR,
+                        help="directory for the recordings")
+    args = parser.parse_args()
+
+    paths = record_templates(sr.Microphone(), args.dir, args.count)
+    print(f"Recorded {len(paths)} template(s) to {args.dir}")
+    try:
+        engine = TemplateWakeWordEngine.from_directory(args.dir)
+    except ValueError as e:
+        sys.exit(str(e))
+    print(f"Calibrated detection threshold: {engine.threshold:.2f} "
+          f"(override with AVA_WAKE_WORD_THRESHOLD or scale with AVA_WAKE_WORD_SENSITIVITY)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,33 @@
 import tkinter as tk
 from tkinter import scrolledtext, ttk
 import threading
-import queue
+import collections
+import json
 import time
-from modules.speech_recognizer import SpeechRecognizer
-from modules.text_to_speech import TextToSpeech
+from modules.text_to_speech import TextToSpeech, PRIORITY_REPLY
+from modules.tracing import tracer
+
+READY_PROMPT = "I am ready. Enable listening or type to get started!"
+LISTENING_PROMPT = "Listening"
+RETRY_PROMPT = "I didn't catch that. Please try again."
+TIMEOUT_PROMPT = "Time out. Please say 'Ava' to ask a new question."
+GOODBYE_PROMPT = "Goodbye!"
+# Fixed phrases synthesized at startup, so they play instantly and from the cache
+SPOKEN_PROMPTS = [READY_PROMPT, LISTENING_PROMPT, RETRY_PROMPT, TIMEOUT_PROMPT, GOODBYE_PROMPT]
+
+TERMINAL_MAX_LINES = 5000  # Scrollback kept in the terminal widget
+TERMINAL_BACKLOG = 20000  # Pending lines; beyond this the oldest pending lines are dropped
+TERMINAL_BATCH = 2000  # Most lines inserted per tick
+TERMINAL_TICK_BUSY = 20  # ms between ticks while a backlog is being worked off
+TERMINAL_TICK_IDLE = 200  # Longest ms between ticks when nothing arrives
+
+# Startup stages reported once all of them are done, in seconds since the process started
+STARTUP_STAGES = ('window', 'audio', 'assistant')
 
 class AIAssistantGUI:
-    def __init__(self, master, ai_assistant):
+    def __init__(self, master, create_ai_assistant, started=None, exit_after_startup=False):
+        """Shows the window right away. The assistant (made by create_ai_assistant, which gets
+        the terminal log callback) and the audio engines are set up on background threads."""
         self.master = master
         self.master.title("Advanced Virtual Assistant")
         self.master.geometry("1000x700")
@@ -16,18 +36,27 @@ class AIAssistantGUI:
         self.style = ttk.Style(self.master)
         self.style.theme_use("equilux")
 
-        self.ai_assistant = ai_assistant
-        self.speech_recognizer = SpeechRecognizer(wake_word="ava")
-        self.speech_recognizer.set_callback(self.speech_recognizer_callback)
-        self.text_to_speech = TextToSpeech()
+        self.ai_assistant = None  # Set once setup_assistant has created it
+        self.speech_recognizer = None  # Both set by init_audio, on the Tk thread
+        self.text_to_speech = None
+        self.audio_ready = threading.Event()
 
         self.listening_enabled = False
-
-        self.terminal_queue = queue.Queue()
+        self.started = started if started is not None else time.perf_counter()
+        self.exit_after_startup = exit_after_startup
+        self.startup_times = {}
+        self.startup_failures = {}  # Stage name to error message
+
+        self.terminal_queue = collections.deque()
+        self.terminal_lock = threading.Lock()
+        self.terminal_dropped = 0
+        self.terminal_tick = TERMINAL_TICK_BUSY
         self.create_widgets()
 
-        # Setup assistant after creating widgets
-        self.setup_assistant()
+        # Setup assistant and audio after creating widgets
+        self.setup_assistant(create_ai_assistant)
+        self.init_audio()
+        self.master.after(0, self.startup_stage_done, 'window')
 
         # Start the terminal update loop
         self.update_terminal()
@@ -71,11 +100,12 @@ class AIAssistantGUI:
         control_frame = ttk.Frame(right_frame, style='TFrame')
         control_frame.pack(fill='x', padx=5, pady=5)
 
-        self.status_label = ttk.Label(control_frame, text="Voice recognition is off", style='TLabel')
+        self.status_label = ttk.Label(control_frame, text="Starting audio...", style='TLabel')
         self.status_label.pack(side=tk.LEFT, pady=5)
 
         self.toggle_button = ttk.Button(control_frame, text="Enable Listening", command=self.toggle_listening, style='Accent.TButton')
         self.toggle_button.pack(side=tk.RIGHT, padx=(10, 0))
+        self.toggle_button.state(['disabled'])  # Until init_audio is done
 
         # Wake Word Toggle
         self.wake_word_var = tk.BooleanVar(value=True)  # Default to enabled
@@ -86,21 +116,76 @@ class AIAssistantGUI:
             command=self.toggle_wake_word
         )
         self.wake_word_toggle.pack(side=tk.BOTTOM, pady=10)
+        self.wake_word_toggle.state(['disabled'])
 
     def toggle_wake_word(self):
         self.speech_recognizer.use_wake_word = self.wake_word_var.get()
         status = "enabled" if self.speech_recognizer.use_wake_word else "disabled"
         self.add_terminal_message(f"Wake word usage {status}.")
 
-    def setup_assistant(self):
+    def setup_assistant(self, create_ai_assistant):
         def setup():
-            self.ai_assistant.setup_assistant()
-            self.master.after(0, self.add_terminal_message, "System: AI Assistant setup completed.")
-            self.master.after(0, self.text_to_speech.speak, "I am ready. Enable listening or type to get started!")
-
-        threading.Thread(target=setup, daemon=True).start()
+            try:
+                self.ai_assistant = create_ai_assistant(self.add_terminal_message)
+                self.ai_assistant.setup_assistant()
+            except Exception as e:
+                self.add_terminal_message(f"Error setting up AI Assistant: {e}")
+                self.master.after(0, self.startup_stage_done, 'assistant', str(e))
+                return
+            self.add_terminal_message("System: AI Assistant setup completed.")
+            self.master.after(0, self.startup_stage_done, 'assistant')
+            self.audio_ready.wait()
+            if self.text_to_speech:
+                self.master.after(0, self.text_to_speech.speak, READY_PROMPT)
+
+        threading.Thread(target=setup, daemon=True, name="assistant-setup").start()
         self.add_terminal_message("System: Setting up AI Assistant...")
 
+    def init_audio(self):
+        """Creates the speech recognizer and text-to-speech engine without holding up the window."""
+        def init():
+            try:
+                # Imports numpy, webrtcvad and the speech engines, and loads any local models
+                from modules.speech_recognizer import SpeechRecognizer
+                text_to_speech = TextToSpeech()
+                text_to_speech.prewarm(SPOKEN_PROMPTS)
+                speech_recognizer = SpeechRecognizer(wake_word="ava")
+                speech_recognizer.set_callback(self.speech_recognizer_callback)
+            except Exception as e:
+                self.add_terminal_message(f"Error initializing audio: {e}")
+                self.audio_ready.set()
+                self.master.after(0, self.on_audio_failed, str(e))
+                return
+            self.master.after(0, self.on_audio_ready, speech_recognizer, text_to_speech)
+
+        threading.Thread(target=init, daemon=True, name="audio-init").start()
+
+    def on_audio_ready(self, speech_recognizer, text_to_speech):
+        self.speech_recognizer = speech_recognizer
+        self.text_to_speech = text_to_speech
+        self.audio_ready.set()
+        self.toggle_button.state(['!disabled'])
+        self.wake_word_toggle.state(['!disabled'])
+        self.status_label.config(text="Voice recognition is off")
+        self.startup_stage_done('audio')
+
+    def on_audio_failed(self, error):
+        self.status_label.config(text="Voice unavailable, type your requests")
+        self.startup_stage_done('audio', error)
+
+    def startup_stage_done(self, stage, error=None):
+        """Notes when a startup stage finished, or failed with error, and reports all of them
+        once the last one is in."""
+        self.startup_times[stage] = round(time.perf_counter() - self.started, 3)
+        if error is not None:
+            self.startup_failures[stage] = error
+        if all(name in self.startup_times for name in STARTUP_STAGES):
+            if self.startup_failures:
+                print("Startup failures: " + json.dumps(self.startup_failures))
+            print("Startup stages (s): " + json.dumps(self.startup_times))
+            if self.exit_after_startup:
+                self.master.destroy()
+
     def toggle_listening(self):
         self.listening_enabled = not self.listening_enabled
         if self.listening_enabled:
@@ -140,9 +225,11 @@ class AIAssistantGUI:
             self.master.after(0, self.answer_timeout)
 
     def wake_word_detected(self):
+        # The user is talking again, so whatever Ava is still saying is no longer wanted
+        self.text_to_speech.stop()
         self.status_label.config(text="Wake word detected! Processing command...")
         self.add_terminal_message("System: Wake word 'Ava' detected.")
-        self.text_to_speech.speak("Listening")
+        self.text_to_speech.speak(LISTENING_PROMPT)
 
     def command_received(self, command=None):
         if command:
@@ -151,40 +238,72 @@ class AIAssistantGUI:
         else:
             self.status_label.config(text="Say 'Ava' to wake me up!")
             self.add_terminal_message("System: No command detected.")
-            self.text_to_speech.speak("I didn't catch that. Please try again.")
+            self.text_to_speech.speak(RETRY_PROMPT)
 
 
     def send_text_input(self, event=None):
         user_input = self.text_input.get()
         if user_input:
             self.text_input.delete(0, tk.END)
+            tracer.begin_turn()  # Spoken turns start at speech onset, in the recognizer
             self.process_input(user_input)
 
     def process_input(self, user_input):
         self.add_message(f"You: {user_input}", "white")
         self.add_terminal_message(f"User: {user_input}")
+        if self.ai_assistant is None:
+            self.add_terminal_message("System: The AI Assistant is still starting up, please try again in a moment.")
+            return
         self.status_label.config(text="Processing your request...")
 
-        def get_response():
-            response = self.ai_assistant.get_ai_response(user_input)
-            self.master.after(0, self.display_and_speak_response, response)
-
-        threading.Thread(target=get_response, daemon=True).start()
-
-    def display_and_speak_response(self, response):
+        self.request_response(user_input)
+
+    def request_response(self, user_input):
+        """Starts an AI turn on the assistant's loop, speaking each sentence as it streams in.
+
+        A turn still in progress is preempted: its run is cancelled and its speech cut off.
+        Until the audio engines are ready, replies are only shown.
+        """
+        speech = None
+        if self.text_to_speech:
+            self.text_to_speech.stop()
+            speech = self.text_to_speech.start_stream()
+
+        def on_response(future):
+            if future.cancelled():
+                if speech:
+                    speech.close()
+                return
+            response = future.result()
+            if speech:
+                if not speech.has_text:
+                    # Errors are returned rather than streamed, so speak them in one piece
+                    speech.feed(response)
+                speech.close()
+            self.master.after(0, self.display_and_speak_response, response, speech)
+
+        future = self.ai_assistant.submit_ai_response(user_input, on_text_delta=speech.feed if speech else None)
+        future.add_done_callback(on_response)
+
+    def display_and_speak_response(self, response, speech=None):
         self.add_message(f"AI: {response}", "light green")
         self.add_terminal_message(f"AI: {response}")
+        if speech is None and self.text_to_speech is None:
+            self.status_label.config(text="Ready for next input")
+            return
         self.status_label.config(text="Speaking...")
 
-        def speak():
-            self.text_to_speech.speak(response)
-            # After speaking, check if the response is a question
+        def on_spoken(future):
+            if future.cancelled() or future.exception() or not future.result():
+                return  # Interrupted by newer input, which now owns the status and the mic
+            # Listen for an answer the moment a question has been spoken
             if response.strip().endswith("?"):
                 self.master.after(0, self.start_listening_for_answer)
             else:
                 self.master.after(0, self.status_label.config, {"text": "Ready for next input"})
 
-        threading.Thread(target=speak, daemon=True).start()
+        spoken = speech.future if speech else self.text_to_speech.speak(response, PRIORITY_REPLY)
+        spoken.add_done_callback(on_spoken)
 
     def add_message(self, message, color):
         self.chat_display.config(state=tk.NORMAL)
@@ -196,27 +315,57 @@ class AIAssistantGUI:
         self.chat_display.see(tk.END)
 
     def add_terminal_message(self, message):
-        self.terminal_queue.put(message)
+        # Safe from any thread. When the GUI falls behind, the oldest pending lines are dropped
+        # and only counted, so a flood of command output cannot grow memory or stall Tk.
+        with self.terminal_lock:
+            if len(self.terminal_queue) >= TERMINAL_BACKLOG:
+                self.terminal_queue.popleft()
+                self.terminal_dropped += 1
+            self.terminal_queue.append(message)
 
     def update_terminal(self):
-        while not self.terminal_queue.empty():
-            message = self.terminal_queue.get()
+        """Writes pending lines to the terminal in one widget update per tick.
+
+        The tick shortens while a backlog is being worked off and backs off towards
+        TERMINAL_TICK_IDLE when nothing arrives. Scrollback is trimmed to TERMINAL_MAX_LINES.
+        """
+        with self.terminal_lock:
+            count = min(len(self.terminal_queue), TERMINAL_BATCH)
+            lines = [self.terminal_queue.popleft() for _ in range(count)]
+            dropped, self.terminal_dropped = self.terminal_dropped, 0
+            backlog = len(self.terminal_queue)
+        if dropped:
+            lines.insert(0, f"... {dropped} lines skipped ...")
+
+        if lines:
             self.terminal.config(state=tk.NORMAL)
-            self.terminal.insert(tk.END, message + "\n")
+            self.terminal.insert(tk.END, "\n".join(lines) + "\n")
+            excess = int(self.terminal.index('end-1c').split('.')[0]) - 1 - TERMINAL_MAX_LINES
+            if excess > 0:
+                self.terminal.delete('1.0', f'{excess + 1}.0')
             self.terminal.config(state=tk.DISABLED)
             self.terminal.see(tk.END)
-        self.master.after(100, self.update_terminal)
+            self.terminal_tick = TERMINAL_TICK_BUSY
+        else:
+            self.terminal_tick = min(self.terminal_tick * 2, TERMINAL_TICK_IDLE)
+        self.master.after(TERMINAL_TICK_BUSY if backlog else self.terminal_tick, self.update_terminal)
 
     def on_closing(self):
-        self.add_terminal_message("System: Deleting AI Assistant...")
+        # The assistant is kept in the registry and reused on the next launch
+        self.add_terminal_message("System: Closing application.")
         self.listening_enabled = False
-        self.speech_recognizer.stop_listening()
+        if self.speech_recognizer:
+            self.speech_recognizer.stop_listening()
 
         def cleanup():
-            self.ai_assistant.delete_assistant()
-            self.add_terminal_message("System: AI Assistant deleted. Closing application.")
-            self.text_to_speech.speak("Goodbye!")
-            time.sleep(1)
+            if self.ai_assistant:
+                self.ai_assistant.close()
+            if self.text_to_speech:
+                try:
+                    self.text_to_speech.speak(GOODBYE_PROMPT).result(timeout=10)
+                except Exception as e:
+                    print(f"Error speaking goodbye: {e}")
+                self.text_to_speech.close()
             self.master.after(0, self.master.destroy)
 
         threading.Thread(target=cleanup, daemon=True).start()
@@ -233,21 +382,12 @@ class AIAssistantGUI:
             self.add_message(f"You: {answer}", "white")
             self.status_label.config(text="Processing your answer...")
             # No need to stop listening here as the recognizer handles mode switching
-
-            def process_answer():
-                try:
-                    response = self.ai_assistant.get_ai_response(answer)
-                    self.master.after(0, self.display_and_speak_response, response)
-                except Exception as e:
-                    print(f"Exception in process_answer: {e}")
-                    self.add_terminal_message(f"Error processing answer: {e}")
-
-            threading.Thread(target=process_answer, daemon=True).start()
+            self.request_response(answer)
         except Exception as e:
             print(f"Exception in answer_received: {e}")
             self.add_terminal_message(f"Error in answer_received: {e}")
 
     def answer_timeout(self):
         self.add_terminal_message("System: Answer timeout. Returning to wake word detection.")
-        self.text_to_speech.speak("Time out. Please say 'Ava' to ask a new question.")
+        self.text_to_speech.speak(TIMEOUT_PROMPT)
         self.status_label.config(text="Say 'Ava' to wake me up!")
@@ -1,10 +1,25 @@
-from ttkthemes import ThemedTk
-from ai import AIAssistant
-from gui import AIAssistantGUI
+import os
+import sys
+import time
+
+started = time.perf_counter()
+
+from ttkthemes import ThemedTk  # noqa: E402
+from gui import AIAssistantGUI  # noqa: E402
+
+# Close as soon as every startup stage is done, for benchmarks/startup_benchmark.py
+EXIT_AFTER_STARTUP = os.getenv('AVA_EXIT_AFTER_STARTUP') == '1'
+
+
+def create_ai_assistant(log_callback):
+    # openai and the assistant's tools are imported here, on a background thread, after the window is up
+    from ai import AIAssistant
+    return AIAssistant(log_callback=log_callback)
 
 
 if __name__ == "__main__":
     root = ThemedTk(theme="equilux")
-    ai_assistant = AIAssistant(log_callback=lambda msg: app.add_terminal_message(msg))
-    app = AIAssistantGUI(root, ai_assistant)
+    app = AIAssistantGUI(root, create_ai_assistant, started=started, exit_after_startup=EXIT_AFTER_STARTUP)
     root.mainloop()
+    if EXIT_AFTER_STARTUP and app.startup_failures:
+        sys.exit(1)
@@ -0,0 +1,149 @@
+import atexit
+import collections
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+
+LOG_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'logs'))
+LOG_LEVEL = os.getenv('AVA_LOG_LEVEL', 'INFO').upper()
+LOG_BUFFER_SIZE = int(os.getenv('AVA_LOG_BUFFER_SIZE', '5000'))  # Records kept in memory for get_logs
+LOG_MAX_CHARS = int(os.getenv('AVA_LOG_MAX_CHARS', '4000'))  # Longer formatted messages are cut
+LOG_FILE_BYTES = 1024 * 1024
+LOG_FILE_COUNT = 5
+LOG_TO_FILE = os.getenv('AVA_LOG_FILE', '1') != '0'
+
+FILE_FORMAT = '%(asctime)s %(levelname)-7s %(name)s: %(message)s'
+
+_configure_lock = threading.Lock()
+_ring = None
+
+
+class TruncateFilter(logging.Filter):
+    """Cuts long messages, so one huge payload cannot bloat every sink.
+
+    The message is formatted with its arguments (of any type, including a single dict) and,
+    when it is too long, replaced by the cut text with the arguments cleared.
+    """
+
+    def __init__(self, max_chars=LOG_MAX_CHARS):
+        super().__init__()
+        self.max_chars = max_chars
+
+    def filter(self, record):
+        if not getattr(record, 'truncated', False):  # Every sink shares the record; cut it once
+            message = record.getMessage()
+            if len(message) > self.max_chars:
+                record.msg = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} more characters]"
+                record.args = None
+            record.truncated = True
+        return True
+
+
+class RingBufferHandler(logging.Handler):
+    """Keeps the latest capacity records in memory, unformatted until they are queried."""
+
+    def __init__(self, capacity=LOG_BUFFER_SIZE):
+        super().__init__()
+        self.records = collections.deque(maxlen=capacity)
+        self.setFormatter(logging.Formatter(FILE_FORMAT))
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def query(self, level=None, contains=None, logger=None, since=None, tail=None):
+        """Formatted records at or above level, optionally only those whose message contains a
+        string, that come from a logger (or its children), or that are newer than since (a
+        time.time() value). tail limits the result to the last tail matches."""
+        if isinstance(level, str):
+            level = logging.getLevelName(level.upper())
+        with self.lock:
+            records = list(self.records)
+        matches = []
+        for record in reversed(records):
+            if level is not None and record.levelno < level:
+                continue
+            if since is not None and record.created < since:
+                break
+            if logger and record.name != logger and not record.name.startswith(logger + "."):
+                continue
+            if contains and contains.lower() not in record.getMessage().lower():
+                continue
+            matches.append(record)
+            if tail and len(matches) >= tail:
+                break
+        return [self.format(record) for record in reversed(matches)]
+
+
+class CallbackHandler(logging.Handler):
+    """Passes each formatted message to a callback, such as the GUI terminal."""
+
+    def __init__(self, callback):
+        super().__init__()
+        self.callback = callback
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        try:
+            self.callback(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def configure_logging():
+    """Sets up the 'ava' loggers once and returns the in-memory ring buffer handler.
+
+    Records go to the ring buffer, to stdout (as plain messages, like the prints they
+    replace) and to a rotating file in config/logs written by a background thread.
+    Terminal output ('ava.terminal') is kept off stdout, since it has its own sink, and is
+    always logged at INFO, so AVA_LOG_LEVEL only quiets the sinks set up here.
+    """
+    global _ring
+    with _configure_lock:
+        if _ring is not None:
+            return _ring
+        logger = logging.getLogger('ava')
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+        logging.getLogger('ava.terminal').setLevel(logging.INFO)
+        truncate = TruncateFilter()
+
+        # Terminal records pass the logger at INFO whatever the level, so the sinks check it
+        _ring = RingBufferHandler()
+        _ring.setLevel(LOG_LEVEL)
+        _ring.addFilter(truncate)
+        logger.addHandler(_ring)
+
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(logging.Formatter('%(message)s'))
+        console.setLevel(LOG_LEVEL)
+        console.addFilter(truncate)
+        console.addFilter(lambda record: not record.name.startswith('ava.terminal'))
+        logger.addHandler(console)
+
+        if LOG_TO_FILE:
+            try:
+                os.makedirs(LOG_DIR, exist_ok=True)
+                file_handler = logging.handlers.RotatingFileHandler(
+                    os.path.join(LOG_DIR, 'ava.log'), maxBytes=LOG_FILE_BYTES,
+                    backupCount=LOG_FILE_COUNT, encoding='utf-8')
+                file_handler.setFormatter(logging.Formatter(FILE_FORMAT))
+                records = queue.Queue()
+                queue_handler = logging.handlers.QueueHandler(records)
+                queue_handler.setLevel(LOG_LEVEL)
+                queue_handler.addFilter(truncate)
+                logger.addHandler(queue_handler)
+                listener = logging.handlers.QueueListener(records, file_handler)
+                listener.start()
+                atexit.register(listener.stop)
+            except OSError as e:
+                print(f"Error opening log file, logging to memory and console only: {e}")
+        return _ring
+
+
+def get_logger(name=None):
+    configure_logging()
+    return logging.getLogger(f"ava.{name}" if name else 'ava')
+
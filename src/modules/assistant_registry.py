@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+class AssistantRegistry:
+    """Remembers which OpenAI assistant was created for which configuration.
+
+    Entries are keyed by a hash of the model, instructions and tool schema, so a launch
+    with an unchanged configuration can reuse the assistant without any API call.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.data = self._load()
+
+    @staticmethod
+    def config_hash(model, instructions, tools):
+        payload = json.dumps({"model": model, "instructions": instructions, "tools": tools}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if isinstance(data.get("assistants"), dict):
+                return data
+        except (FileNotFoundError, ValueError, AttributeError):
+            pass
+        return {"current": None, "assistants": {}}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def lookup(self, config_hash):
+        """Returns the assistant ID stored for config_hash, marking it as the current one."""
+        with self.lock:
+            entry = self.data["assistants"].get(config_hash)
+            if not entry:
+                return None
+            entry["last_used"] = time.time()
+            self.data["current"] = config_hash
+            self._save()
+            return entry["id"]
+
+    def current(self):
+        """Returns (config_hash, assistant_id) of the most recently used assistant, if any."""
+        with self.lock:
+            config_hash = self.data.get("current")
+            entry = self.data["assistants"].get(config_hash)
+            return (config_hash, entry["id"]) if entry else (None, None)
+
+    def record(self, config_hash, assistant_id, replaces=None):
+        with self.lock:
+            if replaces:
+                self.data["assistants"].pop(replaces, None)
+            now = time.time()
+            self.data["assistants"][config_hash] = {"id": assistant_id, "created": now, "last_used": now}
+            self.data["current"] = config_hash
+            self._save()
+
+    def remove(self, assistant_id):
+        with self.lock:
+            for config_hash, entry in list(self.data["assistants"].items()):
+                if entry["id"] == assistant_id:
+                    del self.data["assistants"][config_hash]
+                    if self.data.get("current") == config_hash:
+                        self.data["current"] = None
+            self._save()
+
+    def known_ids(self):
+        with self.lock:
+            return {entry["id"] for entry in self.data["assistants"].values()}
+
+    def collection_due(self, interval):
+        """Claims a garbage collection pass if the last one was more than interval seconds ago."""
+        with self.lock:
+            now = time.time()
+            if now - self.data.get("last_collected", 0) < interval:
+                return False
+            self.data["last_collected"] = now
+            self._save()
+            return True
+
+    def stale_ids(self, max_age):
+        """IDs of non-current assistants that have not been used for max_age seconds."""
+        cutoff = time.time() - max_age
+        with self.lock:
+            return [
+                entry["id"] for config_hash, entry in self.data["assistants"].items()
+                if config_hash != self.data.get("current") and entry.get("last_used", 0) < cutoff
+            ]
@@ -0,0 +1,33 @@
+import asyncio
+import threading
+
+
+class AsyncLoop:
+    """An asyncio event loop running on its own daemon thread.
+
+    Other threads (the Tk main loop, recognizer callbacks) hand coroutines to it with
+    submit() and get a concurrent.futures.Future back, which can be waited on, given a
+    done callback or cancelled.
+    """
+
+    def __init__(self, name="ai-loop"):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Runs coro on the loop and blocks the calling thread until it finishes."""
+        if threading.current_thread() is self.thread:
+            coro.close()
+            raise RuntimeError("AsyncLoop.run cannot block the loop's own thread")
+        return self.submit(coro).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
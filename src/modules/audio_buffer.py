@@ -0,0 +1,90 @@
+import threading
+
+
+class AudioRingBuffer:
+    """Continuous microphone capture into a fixed, preallocated ring of PCM bytes.
+
+    A capture thread reads the stream without pause and writes into the ring, so no audio is
+    lost while consumers switch modes or are busy. Positions are absolute byte cursors that
+    only grow (the ring offset is cursor % capacity). Each consumer keeps its own cursor and
+    reads forward from it. A consumer that falls more than capacity bytes behind skips ahead
+    to the oldest audio still held, and the skip is counted in overruns.
+    """
+
+    def __init__(self, stream, chunk_size, sample_rate, sample_width=2, seconds=30):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.capacity = int(sample_rate * seconds) * sample_width
+        self.ring = bytearray(self.capacity)
+        self.view = memoryview(self.ring)
+        self.written = 0
+        self.overruns = 0
+        self.error = None
+        self.running = False
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._capture, daemon=True, name="audio-capture")
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1)
+
+    def _capture(self):
+        try:
+            while self.running:
+                self.write(self.stream.read(self.chunk_size))
+        except Exception as e:
+            self.error = e
+        finally:
+            with self.condition:
+                self.running = False
+                self.condition.notify_all()
+
+    def write(self, pcm):
+        offset = self.written % self.capacity
+        first = min(len(pcm), self.capacity - offset)
+        self.view[offset:offset + first] = pcm[:first]
+        if first < len(pcm):
+            self.view[:len(pcm) - first] = pcm[first:]
+        with self.condition:
+            self.written += len(pcm)
+            self.condition.notify_all()
+
+    def cursor(self):
+        """Cursor of the newest audio, for a consumer that wants to start from now."""
+        with self.condition:
+            return self.written
+
+    def window(self, start, end):
+        """Copy of the audio between two cursors. Parts already overwritten are left out."""
+        start = max(start, self.written - self.capacity)
+        if start >= end:
+            return b""
+        offset, length = start % self.capacity, end - start
+        if offset + length <= self.capacity:
+            return bytes(self.view[offset:offset + length])
+        return bytes(self.view[offset:]) + bytes(self.view[:length - (self.capacity - offset)])
+
+    def read(self, cursor, size):
+        """Waits for size bytes after cursor and returns (pcm, next_cursor).
+
+        Raises OSError("Stream closed") once capture has stopped and the data will not come.
+        """
+        with self.condition:
+            while self.written < cursor + size:
+                if not self.running:
+                    raise OSError(f"Stream closed: {self.error}" if self.error else "Stream closed")
+                self.condition.wait()
+            if cursor < self.written - self.capacity:
+                self.overruns += 1
+                cursor = self.written - self.capacity
+        return self.window(cursor, cursor + size), cursor + size
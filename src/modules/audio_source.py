@@ -0,0 +1,162 @@
+import glob
+import os
+import threading
+import time
+import wave
+
+import speech_recognition as sr
+
+from modules.audio_utils import Resampler, read_wav
+
+# Recorded session played instead of the microphone: a WAV file, a directory of WAV files
+# or several paths separated by os.pathsep
+REPLAY_PATH = os.getenv('AVA_AUDIO_REPLAY')
+REPLAY_SPEED = float(os.getenv('AVA_AUDIO_REPLAY_SPEED', '1'))  # 1 is real time, 0 as fast as it is read
+RECORD_DIR = os.getenv('AVA_AUDIO_RECORD')  # Live sessions are recorded to WAV files here when set
+
+
+def replay_files(path):
+    """WAV files named by an AVA_AUDIO_REPLAY value, in playing order."""
+    files = []
+    for part in path.split(os.pathsep):
+        if os.path.isdir(part):
+            files += sorted(glob.glob(os.path.join(part, '*.wav')))
+        elif part:
+            files.append(part)
+    return files
+
+
+class _ReplayStream:
+    """Reads recorded PCM like a PyAudio input stream, paced to speed times real time."""
+
+    def __init__(self, pcm, sample_rate, speed):
+        self.view = memoryview(pcm)
+        self.bytes_per_second = sample_rate * 2
+        self.speed = speed
+        self.offset = 0
+        self.started = None
+        self.closed = False
+
+    def read(self, frames, exception_on_overflow=False):
+        if self.closed:
+            raise OSError("Stream closed")
+        if self.offset >= len(self.view):
+            raise EOFError("End of the recorded session")
+        if self.started is None:
+            self.started = time.monotonic()
+        size = frames * 2
+        chunk = bytes(self.view[self.offset:self.offset + size])
+        self.offset += size
+        if self.speed > 0:
+            delay = self.started + self.offset / self.bytes_per_second / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        return chunk + b"\0" * (size - len(chunk))
+
+    def close(self):
+        self.closed = True
+
+
+class WavReplaySource(sr.AudioSource):
+    """Plays recorded WAV sessions in place of a microphone.
+
+    The files are joined into one 16-bit mono stream at the rate of the first file (or
+    sample_rate), and tail_silence seconds of silence are added so the last phrase can end.
+    At speed 1 audio arrives in real time like from a microphone. Higher speeds compress
+    time, and speed 0 delivers it as fast as it is read. Once the session is used up, the
+    stream raises EOFError, which ends the listen loop.
+    """
+
+    def __init__(self, paths, speed=REPLAY_SPEED, chunk_size=1024, sample_rate=None, tail_silence=1.0):
+        if isinstance(paths, str):
+            paths = replay_files(paths)
+        if not paths:
+            raise ValueError("No WAV files to replay")
+        self.paths = paths
+        self.speed = speed
+        self.SAMPLE_WIDTH = 2
+        self.CHUNK = chunk_size
+        self.SAMPLE_RATE = sample_rate
+        segments = []
+        for path in paths:
+            pcm, rate = read_wav(path)
+            if self.SAMPLE_RATE is None:
+                self.SAMPLE_RATE = rate
+            segments.append(Resampler(rate, self.SAMPLE_RATE).convert(pcm))
+        segments.append(b"\0" * (int(self.SAMPLE_RATE * tail_silence) * 2))
+        self.pcm = b"".join(segments)
+        self.duration = len(self.pcm) / 2 / self.SAMPLE_RATE
+        self.stream = None
+
+    def __enter__(self):
+        self.stream = _ReplayStream(self.pcm, self.SAMPLE_RATE, self.speed)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stream.close()
+        self.stream = None
+
+
+class _RecordingStream:
+    def __init__(self, stream, wav):
+        self.stream = stream
+        self.wav = wav
+        self.lock = threading.Lock()
+
+    def read(self, frames, exception_on_overflow=False):
+        data = self.stream.read(frames)
+        with self.lock:
+            if self.wav:
+                self.wav.writeframesraw(data)
+        return data
+
+    def close(self):
+        with self.lock:
+            self.wav.close()
+            self.wav = None
+
+
+class SessionRecorder(sr.AudioSource):
+    """Wraps another source and writes everything read from it to a WAV file.
+
+    Every time the source is opened, a new session-<time>.wav is started in directory. The
+    result replays as it was heard with WavReplaySource.
+    """
+
+    def __init__(self, source, directory):
+        self.source = source
+        self.directory = directory
+        self.path = None
+        self.stream = None
+
+    def __enter__(self):
+        self.source.__enter__()
+        self.SAMPLE_RATE, self.SAMPLE_WIDTH, self.CHUNK = self.source.SAMPLE_RATE, self.source.SAMPLE_WIDTH, self.source.CHUNK
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.path = os.path.join(self.directory, time.strftime('session-%Y%m%d-%H%M%S.wav'))
+            wav = wave.open(self.path, 'wb')
+            wav.setnchannels(1)
+            wav.setsampwidth(self.SAMPLE_WIDTH)
+            wav.setframerate(self.SAMPLE_RATE)
+        except Exception:
+            self.source.__exit__(None, None, None)
+            raise
+        self.stream = _RecordingStream(self.source.stream, wav)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            return self.source.__exit__(exc_type, exc_value, traceback)
+        finally:
+            self.stream.close()
+            self.stream = None
+            print(f"Recorded audio session to {self.path}")
+
+
+def create_audio_source():
+    """The microphone, or the session named by AVA_AUDIO_REPLAY; recorded to AVA_AUDIO_RECORD when set."""
+    source = WavReplaySource(REPLAY_PATH) if REPLAY_PATH else sr.Microphone()
+    if RECORD_DIR:
+        source = SessionRecorder(source, RECORD_DIR)
+    return source
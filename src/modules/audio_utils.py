@@ -0,0 +1,37 @@
+import audioop
+import wave
+
+
+class Resampler:
+    """Converts a stream of 16-bit mono PCM chunks from one sample rate to another.
+
+    The converter state is carried across chunks, so consecutive chunks resample as one
+    continuous signal without clicks at the boundaries.
+    """
+
+    def __init__(self, from_rate, to_rate):
+        self.from_rate = from_rate
+        self.to_rate = to_rate
+        self.state = None
+
+    def convert(self, pcm):
+        if self.from_rate == self.to_rate:
+            return pcm
+        converted, self.state = audioop.ratecv(pcm, 2, 1, self.from_rate, self.to_rate, self.state)
+        return converted
+
+
+def read_wav(path):
+    """Reads a WAV file (path or file object) as 16-bit mono PCM. Returns (pcm_bytes, sample_rate)."""
+    with wave.open(path, 'rb') as wf:
+        pcm = wf.readframes(wf.getnframes())
+        width, channels, rate = wf.getsampwidth(), wf.getnchannels(), wf.getframerate()
+    if width == 1:
+        pcm = audioop.bias(pcm, 1, -128)  # 8-bit WAV samples are unsigned
+    if width != 2:
+        pcm = audioop.lin2lin(pcm, width, 2)
+    if channels == 2:
+        pcm = audioop.tomono(pcm, 2, 0.5, 0.5)
+    elif channels != 1:
+        raise ValueError(f"Unsupported channel count {channels} in {path}")
+    return pcm, rate
@@ -0,0 +1,197 @@
+import fnmatch
+import os
+import sqlite3
+import threading
+
+# Fnmatch patterns for file and directory names that are never indexed
+DEFAULT_EXCLUDES = ["node_modules", "__pycache__", "venv", "site-packages"]
+# Patterns for directories only: hidden directories such as .git and .cache are skipped,
+# while dotfiles such as .env and .gitignore are still indexed
+DEFAULT_DIR_EXCLUDES = [".*"]
+
+# Bumped when the tables change; an index from an older version is dropped and rebuilt
+SCHEMA_VERSION = 2
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, name TEXT NOT NULL, name_lower TEXT NOT NULL, dir TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS files_name ON files(name);
+CREATE INDEX IF NOT EXISTS files_name_lower ON files(name_lower);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+
+class FileIndex:
+    """Filename index of a directory tree, stored in SQLite and kept current in the background.
+
+    The first start scans the whole tree once. After that, directory mtimes are polled and
+    only directories whose mtime changed are rescanned. Queries are answered from the index
+    and stop as soon as max_results rows have been found.
+    """
+
+    def __init__(self, db_path, root, excludes=None, dir_excludes=None, poll_interval=60):
+        self.db_path = db_path
+        self.root = os.path.abspath(root)
+        self.excludes = list(DEFAULT_EXCLUDES if excludes is None else excludes)
+        self.dir_excludes = list(DEFAULT_DIR_EXCLUDES if dir_excludes is None else dir_excludes)
+        self.poll_interval = poll_interval
+        self.ready = threading.Event()
+        self.stop_event = threading.Event()
+        self.local = threading.local()
+        self.thread = None
+
+        connection = self._connection()
+        if connection.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            connection.executescript("DROP TABLE IF EXISTS files; DROP TABLE IF EXISTS dirs; DROP TABLE IF EXISTS meta;")
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.executescript(SCHEMA)
+        row = connection.execute("SELECT value FROM meta WHERE key = 'root'").fetchone()
+        if row and row[0] == self.root:
+            # A previous session finished indexing this root; serve it while it is refreshed
+            self.ready.set()
+
+    def _connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        try:
+            if self.ready.is_set():
+                self.refresh()
+            else:
+                self.rebuild()
+            while not self.stop_event.wait(self.poll_interval):
+                self.refresh()
+        except Exception as e:
+            print(f"File index error: {e}")
+
+    def _excluded(self, name, is_dir):
+        patterns = self.excludes + self.dir_excludes if is_dir else self.excludes
+        return any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+    def rebuild(self):
+        """Indexes the whole tree from scratch."""
+        connection = self._connection()
+        with connection:
+            connection.execute("DELETE FROM files")
+            connection.execute("DELETE FROM dirs")
+            connection.execute("DELETE FROM meta WHERE key = 'root'")
+        if not self._scan_tree(self.root):
+            # Stopped part way: without the root marker the next start rebuilds the index
+            return
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('root', ?)", (self.root,))
+        self.ready.set()
+
+    def _scan_tree(self, top):
+        """Indexes everything below top. Returns False if it was stopped before the end."""
+        connection = self._connection()
+        pending = [top]
+        scanned = 0
+        while pending and not self.stop_event.is_set():
+            directory = pending.pop()
+            subdirs = self._scan_directory(connection, directory)
+            pending.extend(subdirs)
+            scanned += 1
+            if scanned % 200 == 0:
+                connection.commit()
+        connection.commit()
+        return not pending
+
+    def _scan_directory(self, connection, directory):
+        """Records the direct entries of directory and returns its subdirectories."""
+        rows = []
+        subdirs = []
+        try:
+            mtime = os.stat(directory).st_mtime
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        is_dir = False
+                    if self._excluded(entry.name, is_dir):
+                        continue
+                    rows.append((entry.path, entry.name, entry.name.lower(), directory))
+                    if is_dir:
+                        subdirs.append(entry.path)
+        except OSError:
+            return []
+        connection.execute("INSERT OR REPLACE INTO dirs (path, mtime) VALUES (?, ?)", (directory, mtime))
+        connection.executemany("INSERT OR REPLACE INTO files (path, name, name_lower, dir) VALUES (?, ?, ?, ?)", rows)
+        return subdirs
+
+    def _forget_subtree(self, connection, directory):
+        # Range scans over the primary keys cover everything below directory without LIKE escaping
+        lower, upper = directory + os.sep, directory + chr(ord(os.sep) + 1)
+        connection.execute("DELETE FROM files WHERE path = ? OR (path >= ? AND path < ?)", (directory, lower, upper))
+        connection.execute("DELETE FROM dirs WHERE path = ? OR (path >= ? AND path < ?)", (directory, lower, upper))
+
+    def refresh(self):
+        """Rescans the directories whose mtime changed since they were last indexed."""
+        connection = self._connection()
+        known_dirs = connection.execute("SELECT path, mtime FROM dirs").fetchall()
+        known = {row[0] for row in known_dirs}
+        for directory, indexed_mtime in known_dirs:
+            if self.stop_event.is_set():
+                return
+            try:
+                mtime = os.stat(directory).st_mtime
+            except OSError:
+                self._forget_subtree(connection, directory)
+                continue
+            if mtime == indexed_mtime:
+                continue
+
+            previous = {row[0] for row in connection.execute("SELECT path FROM files WHERE dir = ?", (directory,))}
+            connection.execute("DELETE FROM files WHERE dir = ?", (directory,))
+            subdirs = self._scan_directory(connection, directory)
+            current = {row[0] for row in connection.execute("SELECT path FROM files WHERE dir = ?", (directory,))}
+            for removed in previous - current:
+                self._forget_subtree(connection, removed)
+            for subdir in subdirs:
+                if subdir not in known:
+                    self._scan_tree(subdir)
+            connection.commit()
+        connection.commit()
+
+    def search(self, pattern, mode="glob", max_results=10):
+        """Returns up to max_results indexed paths matching pattern.
+
+        mode is 'glob' (matched against the name, or against the path relative to the root
+        when the pattern contains a separator, case-sensitive), or 'prefix' or 'substring'
+        (both matched against the name, case-insensitive).
+        """
+        connection = self._connection()
+        if mode == "prefix":
+            # A range over the lowercased names, so the index on them is used
+            query = "SELECT path FROM files WHERE name_lower >= ? AND name_lower < ? LIMIT ?"
+            params = (pattern.lower(), pattern.lower() + "\U0010ffff", max_results)
+        elif mode == "substring":
+            query = "SELECT path FROM files WHERE instr(name_lower, ?) > 0 LIMIT ?"
+            params = (pattern.lower(), max_results)
+        elif "/" in pattern or os.sep in pattern:
+            relative = pattern.lstrip("/" + os.sep)
+            query = "SELECT path FROM files WHERE path GLOB ? OR path GLOB ? LIMIT ?"
+            params = (os.path.join(self.root, relative), os.path.join(self.root, "*", relative), max_results)
+        elif not any(c in pattern for c in "*?["):
+            query = "SELECT path FROM files WHERE name = ? LIMIT ?"
+            params = (pattern, max_results)
+        else:
+            query = "SELECT path FROM files WHERE name GLOB ? LIMIT ?"
+            params = (pattern, max_results)
+        return [row[0] for row in connection.execute(query, params)]
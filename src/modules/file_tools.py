@@ -0,0 +1,343 @@
+import glob
+import locale
+import mmap
+import os
+import re
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+REGEX_METACHARACTERS = set(".^$*+?{}[]\\|()")
+
+
+def literal_of(pattern):
+    """Returns pattern if it contains no regex syntax, so a plain substring check can stand in for it."""
+    if pattern and not any(c in REGEX_METACHARACTERS for c in pattern):
+        return pattern
+    return None
+
+
+def file_contains(path, needle):
+    """Checks for needle (bytes) in path through mmap, without reading the file into memory."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(needle) != -1
+
+
+def replace_in_file(path, regex, replacement, line_numbers=None, literal=None):
+    """Replaces regex matches line by line and returns the number of replacements made.
+
+    Files are streamed rather than loaded. The file is only rewritten when a line actually
+    changes, through a temporary file in the same directory that is renamed over it.
+    """
+    if literal is not None and not file_contains(path, literal.encode(locale.getpreferredencoding(False))):
+        return 0
+
+    def in_scope(number):
+        return line_numbers is None or number in line_numbers
+
+    # A read-only pass first, so unchanged files are never written
+    with open(path, 'r', newline='') as source:
+        if not any(in_scope(number) and regex.search(line) for number, line in enumerate(source, 1)):
+            return 0
+
+    count = 0
+    changed = False
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.ava-', suffix='.tmp')
+    try:
+        with open(path, 'r', newline='') as source, os.fdopen(fd, 'w', newline='') as target:
+            for number, line in enumerate(source, 1):
+                if in_scope(number):
+                    new_line, replaced = regex.subn(replacement, line)
+                    count += replaced
+                    changed = changed or new_line != line
+                    line = new_line
+                target.write(line)
+        if changed:
+            shutil.copymode(path, temp_path)
+            os.replace(temp_path, path)
+            temp_path = None
+        return count if changed else 0
+    finally:
+        if temp_path:
+            os.unlink(temp_path)
+
+
+def search_and_replace(file_pattern, regex, replacement, line_numbers=None, max_workers=8):
+    """Runs replace_in_file over every file matching file_pattern on a worker pool.
+
+    Files are taken from the glob lazily and at most 2 * max_workers are in flight, so large
+    trees are never listed in memory at once. Returns (files_scanned, {path: count} for the
+    files that changed, {path: error}).
+    """
+    literal = literal_of(regex.pattern) if isinstance(regex.pattern, str) and not regex.flags & re.IGNORECASE else None
+    line_numbers = set(line_numbers) if line_numbers else None
+    counts = {}
+    errors = {}
+    scanned = 0
+
+    def collect(done):
+        for future in done:
+            path = in_flight.pop(future)
+            try:
+                count = future.result()
+                if count:
+                    counts[path] = count
+            except Exception as e:
+                errors[path] = str(e)
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for path in glob.iglob(file_pattern, recursive=True):
+            if not os.path.isfile(path):
+                continue
+            scanned += 1
+            in_flight[executor.submit(replace_in_file, path, regex, replacement, line_numbers, literal)] = path
+            if len(in_flight) >= 2 * max_workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        collect(list(in_flight))
+    return scanned, counts, errors
+
+
+READ_BUDGET = 20000  # Characters of file content a single read_file call may return
+SUMMARY_THRESHOLD = 256 * 1024  # Files above this size are summarized unless a range is asked for
+SUMMARY_LINES = 20
+COUNT_CHUNK = 4 * 1024 * 1024
+
+
+def sniff_encoding(sample):
+    """Guesses the encoding of a file from its first bytes; returns None for binary data."""
+    if sample.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if sample.startswith((b'\xff\xfe', b'\xfe\xff')):
+        return 'utf-16'
+    if b'\x00' in sample:
+        return None
+    try:
+        sample.decode('utf-8')
+        return 'utf-8'
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut off by the end of the sample is still UTF-8
+        return 'utf-8' if e.start >= len(sample) - 3 else 'latin-1'
+
+
+def count_lines(mm):
+    count = sum(mm[i:i + COUNT_CHUNK].count(b'\n') for i in range(0, len(mm), COUNT_CHUNK))
+    return count + (1 if len(mm) and mm[len(mm) - 1:] != b'\n' else 0)
+
+
+def iter_lines(mm, start=0):
+    position = start
+    size = len(mm)
+    while position < size:
+        end = mm.find(b'\n', position)
+        end = size if end == -1 else end + 1
+        yield mm[position:end]
+        position = end
+
+
+def head_lines(mm, first, last=None, max_bytes=None):
+    """Returns (lines first..last, cut) by scanning newlines from the start (1-based, inclusive).
+
+    Collection stops once max_bytes have been gathered, in which case cut is True. Lines
+    before first and past max_bytes are never copied out of the map.
+    """
+    lines = []
+    collected = 0
+    position = 0
+    size = len(mm)
+    number = 1
+    while position < size and (last is None or number <= last):
+        end = mm.find(b'\n', position)
+        end = size if end == -1 else end + 1
+        if number >= first:
+            if max_bytes is not None and collected + end - position >= max_bytes:
+                lines.append(mm[position:position + max_bytes - collected])
+                return b''.join(lines), position + max_bytes - collected < size
+            lines.append(mm[position:end])
+            collected += end - position
+        position = end
+        number += 1
+    return b''.join(lines), False
+
+
+def tail_lines(mm, count, max_bytes=None):
+    """Returns (last count lines, cut) by searching for newlines backwards from the end.
+
+    Only the last max_bytes bytes are searched. When the lines start before them, just
+    those bytes are returned and cut is True.
+    """
+    end = len(mm)
+    floor = 0 if max_bytes is None else max(0, end - max_bytes)
+    position = end - 1 if end and mm[end - 1:end] == b'\n' else end
+    for _ in range(count):
+        position = mm.rfind(b'\n', floor, position)
+        if position == -1:
+            return mm[floor:end], floor > 0 and mm[floor - 1:floor] != b'\n'
+    return mm[position + 1:end], False
+
+
+def cut_note(limit, at_start=False):
+    """Marks lines that head_lines or tail_lines cut to limit bytes."""
+    if at_start:
+        return f"[Only the last {limit} bytes are shown]\n"
+    return f"\n[Cut after {limit} bytes]\n"
+
+
+class OutputBudget:
+    """Collects decoded text up to a hard character limit."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.parts = []
+        self.used = 0
+        self.truncated = False
+
+    def add(self, text):
+        if self.used + len(text) > self.limit:
+            text = text[:max(0, self.limit - self.used)]
+            self.truncated = True
+        self.parts.append(text)
+        self.used += len(text)
+        return not self.truncated
+
+    def text(self):
+        result = "".join(self.parts)
+        if self.truncated:
+            result += f"\n[Output truncated at {self.limit} characters. Request a line or byte range to read more.]"
+        return result
+
+
+def _read_utf16(mm, size, output, budget, start_line, end_line, start_byte, end_byte, head, tail, pattern):
+    """read_file for UTF-16 text, whose two-byte newlines the byte-level helpers cannot find.
+
+    Only a window of budget * 4 bytes is decoded: the start of the file, or its end for tail.
+    """
+    codec = 'utf-16-le' if mm[:2] == b'\xff\xfe' else 'utf-16-be'
+    window = budget * 4
+
+    def decode(start, end):
+        start, end = max(2, start - start % 2), min(size, end - end % 2)  # Whole code units after the BOM
+        return mm[start:end].decode(codec, errors='replace')
+
+    if start_byte is not None or end_byte is not None:
+        start = max(0, start_byte or 0)
+        end = min(size, end_byte if end_byte is not None else start + window)
+        output.add(decode(start, end))
+        return f"Bytes {start}-{end} of {size}:\n{output.text()}"
+
+    lines = decode(0, 2 + window).splitlines(keepends=True)
+    partial = size > 2 + window
+    note = f"\n[Only the first {window} bytes of this UTF-16 file were read.]" if partial else ""
+
+    if pattern is not None:
+        regex = re.compile(pattern)
+        matches = 0
+        for number, line in enumerate(lines, 1):
+            if (start_line is None or number >= start_line) and (end_line is None or number <= end_line) and regex.search(line):
+                matches += 1
+                if not output.add(f"{number}: {line.rstrip()}\n"):
+                    break
+        return (f"{matches} matching line(s):\n{output.text()}" if matches else "No lines match the pattern.") + note
+
+    if start_line is not None or end_line is not None:
+        first = max(1, start_line or 1)
+        output.add("".join(lines[first - 1:end_line]))
+        return f"Lines {first}-{end_line if end_line is not None else 'end'}:\n{output.text()}{note}"
+
+    if head is not None or tail is not None:
+        if head:
+            output.add("".join(lines[:head]))
+        if tail:
+            if head:
+                output.add("\n...\n")
+            end_lines = decode(size - window, size).splitlines(keepends=True) if partial else lines
+            if partial:
+                end_lines = end_lines[1:]  # The window most likely starts inside a line
+            output.add("".join(end_lines[-tail:]))
+        return f"File excerpt:\n{output.text()}"
+
+    output.add("".join(lines))
+    return f"File ({size} bytes, utf-16):\n{output.text()}{note}"
+
+
+def read_file(path, start_line=None, end_line=None, start_byte=None, end_byte=None,
+              head=None, tail=None, pattern=None, budget=READ_BUDGET):
+    """Reads part of a file through mmap, never loading more of it than the output needs.
+
+    Line and byte ranges, head/tail and regex-filtered reads are supported. A file above
+    SUMMARY_THRESHOLD read without any of them gets a summary (size, line count, encoding,
+    first and last lines) instead of its full content.
+    """
+    for name, value in (("head", head), ("tail", tail)):
+        if value is not None and value < 1:
+            raise ValueError(f"{name} must be at least 1 line")
+
+    size = os.path.getsize(path)
+    if size == 0:
+        return "The file is empty."
+
+    output = OutputBudget(budget)
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        encoding = sniff_encoding(mm[:8192])
+        ranged = any(v is not None for v in (start_line, end_line, start_byte, end_byte, head, tail, pattern))
+
+        if encoding is None and start_byte is None and end_byte is None:
+            return f"Binary file of {size} bytes. Use a byte range to inspect it."
+
+        def decode(data):
+            return data.decode(encoding or 'latin-1', errors='replace')
+
+        if encoding == 'utf-16':
+            return _read_utf16(mm, size, output, budget, start_line, end_line, start_byte, end_byte, head, tail, pattern)
+
+        if start_byte is not None or end_byte is not None:
+            start = max(0, start_byte or 0)
+            end = min(size, end_byte if end_byte is not None else start + budget * 4)
+            output.add(decode(mm[start:end]))
+            return f"Bytes {start}-{end} of {size}:\n{output.text()}"
+
+        if pattern is not None:
+            regex = re.compile(pattern)
+            matches = 0
+            for number, line in enumerate(iter_lines(mm), 1):
+                text = decode(line)
+                if (start_line is None or number >= start_line) and (end_line is None or number <= end_line) and regex.search(text):
+                    matches += 1
+                    if not output.add(f"{number}: {text.rstrip()}\n"):
+                        break
+            return f"{matches} matching line(s):\n{output.text()}" if matches else "No lines match the pattern."
+
+        if start_line is not None or end_line is not None:
+            first = max(1, start_line or 1)
+            output.add(decode(head_lines(mm, first, end_line, max_bytes=budget * 4)[0]))
+            return f"Lines {first}-{end_line if end_line is not None else 'end'}:\n{output.text()}"
+
+        if head is not None or tail is not None:
+            if head:
+                output.add(decode(head_lines(mm, 1, head, max_bytes=budget * 4)[0]))
+            if tail:
+                if head:
+                    output.add("\n...\n")
+                # Decoding never yields more characters than bytes, so the window and its note fit the budget
+                window = max(1, budget - 100)
+                data, cut = tail_lines(mm, tail, max_bytes=window)
+                output.add((cut_note(window, at_start=True) if cut else "") + decode(data))
+            return f"File excerpt:\n{output.text()}"
+
+        if size > SUMMARY_THRESHOLD and not ranged:
+            # A share of the budget for each end, so a file with huge lines still shows both
+            window = max(1, budget - 200) // 2
+            first, first_cut = head_lines(mm, 1, SUMMARY_LINES, max_bytes=window)
+            last, last_cut = tail_lines(mm, SUMMARY_LINES, max_bytes=window)
+            first = decode(first) + (cut_note(window) if first_cut else "")
+            last = (cut_note(window, at_start=True) if last_cut else "") + decode(last)
+            output.add(f"First {SUMMARY_LINES} lines:\n{first}\n...\nLast {SUMMARY_LINES} lines:\n{last}")
+            return (f"Large file: {size} bytes, {count_lines(mm)} lines, encoding {encoding}. "
+                    f"Use start_line/end_line, head/tail or pattern to read specific parts.\n{output.text()}")
+
+        output.add(decode(mm[:budget * 4]))
+        return f"File contents:\n{output.text()}"
@@ -0,0 +1,266 @@
+import asyncio
+import codecs
+import collections
+import itertools
+import locale
+import os
+import signal
+import threading
+import time
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+READ_SIZE = 65536
+MAX_LINE_CHARS = 4000  # Longer lines are split, so one runaway line cannot take the whole buffer
+KILL_GRACE = 2  # Seconds between asking a job to terminate and killing it
+READER_GRACE = 5  # Seconds to wait for the output pipes to close once the process is gone
+
+
+class OutputBuffer:
+    """The latest lines of a job's stdout and stderr, interleaved, within max_chars.
+
+    Older lines are dropped once the budget is used up; how many is kept in dropped.
+    """
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.lines = collections.deque()
+        self.chars = 0
+        self.dropped = 0
+
+    def append(self, stream, line):
+        line = line[:self.max_chars]
+        self.lines.append((stream, line))
+        self.chars += len(line)
+        while self.chars > self.max_chars:
+            _, old = self.lines.popleft()
+            self.chars -= len(old)
+            self.dropped += 1
+
+    def tail(self, count=None):
+        lines = list(self.lines)[-count:] if count else list(self.lines)
+        return "\n".join(f"[stderr] {line}" if stream == "stderr" else line for stream, line in lines)
+
+
+class Job:
+    """A shell command started by JobManager. Fields are updated on the event loop thread, and
+    its output is read under the manager's lock (JobManager.describe)."""
+
+    def __init__(self, job_id, command, timeout, max_output):
+        self.id = job_id
+        self.command = command
+        self.timeout = timeout
+        self.output = OutputBuffer(max_output)
+        self.status = "starting"  # starting, running, exited, timed out, killed or failed to start
+        self.exit_code = None
+        self.error = None
+        self.started = time.time()
+        self.ended = None
+        self.reported = False  # The final result has been given to the model
+        self.done = threading.Event()
+        self.process = None
+        self.kill_requested = False
+
+    @property
+    def running(self):
+        return not self.done.is_set()
+
+    def summary(self):
+        """One line with the job's command and state."""
+        elapsed = (self.ended or time.time()) - self.started
+        if self.status == "exited":
+            state = f"exited with code {self.exit_code} after {elapsed:.1f} s"
+        elif self.status == "failed to start":
+            state = f"failed to start: {self.error}"
+        elif self.status == "timed out":
+            state = f"timed out after {self.timeout} s and was killed (exit code {self.exit_code})"
+        else:
+            state = f"{self.status} for {elapsed:.1f} s" if self.running else f"{self.status} after {elapsed:.1f} s"
+        return f"Job {self.id} ({self.command}): {state}"
+
+    def describe(self, tail=None):
+        lines = [self.summary()]
+        output = self.output.tail(tail)
+        if output:
+            shown = output.count("\n") + 1
+            total = len(self.output.lines) + self.output.dropped
+            lines.append(f"Output (last {shown} of {total} lines):" if shown < total else "Output:")
+            lines.append(output)
+        elif not self.running:
+            lines.append("No output.")
+        return "\n".join(lines)
+
+
+class JobManager:
+    """Runs shell commands as asyncio subprocesses on an AsyncLoop and keeps a table of them.
+
+    stdout and stderr are read at the same time, so a child filling either pipe never stalls,
+    and each job keeps only the last max_output characters of its output. A job is killed
+    (with its whole process group on POSIX) when it runs longer than its timeout or when
+    kill() is called. On POSIX, cpu_seconds and memory_mb set RLIMIT_CPU and RLIMIT_AS for
+    the command. on_line(job, stream, line) gets every output line and on_finished(job) every
+    finished job, both on the loop thread. At most max_jobs run at a time, and the table
+    keeps the latest history finished jobs.
+    """
+
+    def __init__(self, loop, on_line=None, on_finished=None, default_timeout=600, max_output=20000,
+                 cpu_seconds=0, memory_mb=0, max_jobs=8, history=50):
+        self.loop = loop
+        self.on_line = on_line
+        self.on_finished = on_finished
+        self.default_timeout = default_timeout
+        self.max_output = max_output
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self.history = history
+        self.jobs = collections.OrderedDict()
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def start(self, command, timeout=None):
+        """Starts command from any thread but the loop's and returns its Job once it is running."""
+        with self.lock:
+            if sum(job.running for job in self.jobs.values()) >= self.max_jobs:
+                raise RuntimeError(f"{self.max_jobs} jobs are already running")
+            job = Job(next(self.ids), command, timeout or self.default_timeout, self.max_output)
+            self.jobs[job.id] = job
+            finished = [job_id for job_id, old in self.jobs.items() if not old.running]
+            for job_id in finished[:max(0, len(finished) - self.history)]:
+                del self.jobs[job_id]
+        self.loop.run(self._spawn(job))
+        return job
+
+    def get(self, job_id):
+        try:
+            job_id = int(job_id)
+        except (TypeError, ValueError):
+            return None
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return list(self.jobs.values())
+
+    def describe(self, job, tail=None):
+        """A summary of the job for the model: its state and the last tail lines of output."""
+        with self.lock:
+            return job.describe(tail)
+
+    def kill(self, job_id):
+        """Kills a running job and waits until it is gone. Returns the job, or None if unknown."""
+        job = self.get(job_id)
+        if job and job.running:
+            job.kill_requested = True
+            self.loop.run(self._kill(job))
+            job.done.wait(KILL_GRACE + READER_GRACE)
+        return job
+
+    def shutdown(self, timeout=KILL_GRACE + 1):
+        """Kills every running job."""
+        running = [job for job in self.list() if job.running]
+        for job in running:
+            job.kill_requested = True
+        if running:
+            try:
+                self.loop.run(self._kill_all(running), timeout)
+            except TimeoutError:
+                pass
+
+    async def _kill_all(self, jobs):
+        await asyncio.gather(*[self._kill(job) for job in jobs])
+
+    def _limit_resources(self):
+        # Runs in the child between fork and exec
+        if self.cpu_seconds:
+            resource.setrlimit(resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds))
+        if self.memory_mb:
+            limit = self.memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    async def _spawn(self, job):
+        options = {}
+        if os.name == "posix":
+            options["start_new_session"] = True  # Its own process group, so kills reach its children
+            if resource and (self.cpu_seconds or self.memory_mb):
+                options["preexec_fn"] = self._limit_resources
+        try:
+            job.process = await asyncio.create_subprocess_shell(
+                job.command, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE, **options)
+        except Exception as e:
+            job.status, job.error = "failed to start", str(e)
+            self._finish(job)
+            return
+        job.status = "running"
+        asyncio.get_running_loop().create_task(self._supervise(job))
+
+    async def _read(self, job, stream, name):
+        decoder = codecs.getincrementaldecoder(locale.getpreferredencoding(False))(errors="replace")
+        pending = ""
+        while True:
+            data = await stream.read(READ_SIZE)
+            lines = (pending + decoder.decode(data, final=not data)).split("\n")
+            pending = lines.pop()
+            if not data and pending:
+                lines.append(pending)  # Last line without a newline
+            while len(pending) > MAX_LINE_CHARS:
+                lines.append(pending[:MAX_LINE_CHARS])
+                pending = pending[MAX_LINE_CHARS:]
+            for line in lines:
+                line = line.rstrip("\r")
+                with self.lock:
+                    job.output.append(name, line)
+                if self.on_line:
+                    self.on_line(job, name, line)
+            if not data:
+                return
+
+    async def _supervise(self, job):
+        process = job.process
+        readers = asyncio.gather(self._read(job, process.stdout, "stdout"), self._read(job, process.stderr, "stderr"))
+        try:
+            await asyncio.wait_for(process.wait(), job.timeout)
+        except asyncio.TimeoutError:
+            job.status = "timed out"
+            await self._kill(job)
+        try:
+            # Children that outlive the shell can hold the pipes open
+            await asyncio.wait_for(readers, READER_GRACE)
+        except asyncio.TimeoutError:
+            pass
+        job.exit_code = process.returncode
+        if job.status == "running":
+            job.status = "killed" if job.kill_requested else "exited"
+        self._finish(job)
+
+    async def _kill(self, job):
+        process = job.process
+        if process is None or process.returncode is not None:
+            return
+        self._signal(process, signal.SIGTERM)
+        try:
+            await asyncio.wait_for(process.wait(), KILL_GRACE)
+        except asyncio.TimeoutError:
+            self._signal(process, signal.SIGKILL if os.name == "posix" else signal.SIGTERM)
+            await process.wait()
+
+    @staticmethod
+    def _signal(process, sig):
+        try:
+            if os.name == "posix":
+                os.killpg(process.pid, sig)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+
+    def _finish(self, job):
+        job.ended = time.time()
+        job.done.set()
+        if self.on_finished:
+            self.on_finished(job)
@@ -0,0 +1,91 @@
+import base64
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+
+from PIL import Image
+
+
+def capture(area="screen", region=None):
+    """Takes a screenshot of the whole screen, the active window or an explicit region.
+
+    region is a dict with x, y, width and height. Falls back to the whole screen when the
+    active window cannot be determined (pyautogui only supports that on Windows).
+    """
+    import pyautogui  # Slow to import and needs a display, so only loaded for the first capture
+
+    if region:
+        box = (int(region["x"]), int(region["y"]), int(region["width"]), int(region["height"]))
+        return pyautogui.screenshot(region=box)
+    if area == "active_window":
+        try:
+            window = pyautogui.getActiveWindow()
+            if window and window.width > 0 and window.height > 0:
+                return pyautogui.screenshot(region=(window.left, window.top, window.width, window.height))
+        except Exception as e:
+            print(f"Could not capture the active window, using the whole screen: {e}")
+    return pyautogui.screenshot()
+
+
+def downscale(image, max_size):
+    """Shrinks image so its longer side is at most max_size pixels."""
+    if max(image.size) <= max_size:
+        return image
+    scale = max_size / max(image.size)
+    return image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+
+def encode(image, image_format="jpeg", quality=70):
+    """Returns the image as a data URL in the requested format."""
+    image_format = image_format.lower()
+    buffer = io.BytesIO()
+    if image_format == "png":
+        image.save(buffer, format="PNG", optimize=True)
+    else:
+        image_format = "webp" if image_format == "webp" else "jpeg"
+        image.convert("RGB").save(buffer, format=image_format.upper(), quality=quality)
+    return f"data:image/{image_format};base64,{base64.b64encode(buffer.getvalue()).decode('utf-8')}"
+
+
+def screen_digest(image):
+    """Exact digest of the captured pixels, so any change on screen, even one line of text, differs."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{image.mode} {image.width}x{image.height}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class VisionCache:
+    """Remembers recent vision answers by query and digest of the captured screen.
+
+    A lookup hits only when the same query is asked about the same area and the captured
+    pixels are exactly the same as when the answer was given.
+    """
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(query, area, region):
+        region_key = tuple(sorted(region.items())) if region else None
+        return (" ".join(query.lower().split()), area, region_key)
+
+    def get(self, query, area, region, digest):
+        key = self._key(query, area, region)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] == digest:
+                self.entries.move_to_end(key)
+                return entry[1]
+        return None
+
+    def put(self, query, area, region, digest, answer):
+        key = self._key(query, area, region)
+        with self.lock:
+            self.entries[key] = (digest, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
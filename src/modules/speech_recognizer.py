@@ -1,23 +1,91 @@
 import speech_recognition as sr
 import threading
 import time
-import webrtcvad
-import io
-import wave
+import os
+import queue
+import collections
+from concurrent.futures import ThreadPoolExecutor
+from modules.audio_buffer import AudioRingBuffer
+from modules.audio_source import create_audio_source
+from modules.stt_backends import create_stt_backend
+from modules.tracing import tracer
+from modules.vad import StreamingVAD
+from modules.wake_word import create_wake_word_engine
+
+# Seconds of microphone audio kept by the capture ring buffer
+AUDIO_BUFFER_SECONDS = float(os.getenv('AVA_AUDIO_BUFFER_SECONDS', '30'))
+
+# Listening states and the events that move between them. 'home' stands for wake_word, or
+# continuous_command when the wake word is disabled. Events without an entry for the
+# current state are ignored.
+TRANSITIONS = {
+    ('wake_word', 'wake_word_detected'): 'command',
+    ('wake_word', 'phrase_captured'): 'verifying_wake_word',
+    ('wake_word', 'answer_requested'): 'answer',
+    ('wake_word', 'wake_word_disabled'): 'continuous_command',
+    ('verifying_wake_word', 'wake_word_detected'): 'command',
+    ('verifying_wake_word', 'wake_word_checked'): 'home',
+    ('verifying_wake_word', 'answer_requested'): 'answer',
+    ('verifying_wake_word', 'wake_word_disabled'): 'continuous_command',
+    ('command', 'phrase_captured'): 'home',
+    ('command', 'timeout'): 'home',
+    ('command', 'wake_word_disabled'): 'continuous_command',
+    ('answer', 'phrase_captured'): 'home',
+    ('answer', 'timeout'): 'home',
+    ('answer', 'wake_word_disabled'): 'continuous_command',
+    ('continuous_command', 'phrase_captured'): 'continuous_command',
+    ('continuous_command', 'wake_word_enabled'): 'wake_word',
+}
+
+# Longest phrase recorded in each state, in seconds
+PHRASE_TIME_LIMITS = {'wake_word': 5, 'command': 10, 'answer': 10, 'continuous_command': 10}
 
 
 class SpeechRecognizer:
-    def __init__(self, wake_word="ava"):
+    def __init__(self, wake_word="ava", audio_source=None):
         self.recognizer = sr.Recognizer()
+        # sr.AudioSource to listen to; None means the microphone, or AVA_AUDIO_REPLAY (see create_audio_source)
+        self.audio_source = audio_source
         self.wake_word = wake_word.lower()
         self.is_listening = False
         self.callback = None
         self.listening_thread = None
         self.stop_listening_event = threading.Event()
-        self.use_wake_word = True
-        self.mode = 'wake_word'  # Modes: 'wake_word', 'command', 'answer', 'continuous_command'
+        self._use_wake_word = True
+        self.mode = 'wake_word'  # Current state, see TRANSITIONS
+        self.command_timeout = 5
         self.answer_timeout = 30
         self.lock = threading.Lock()  # Added to ensure thread-safe access
+        # Local wake-word spotting; None means every phrase is sent to cloud recognition
+        self.wake_word_engine = create_wake_word_engine()
+        # Speech-to-text engine chosen by AVA_STT_BACKEND (google, vosk or whisper)
+        self.stt_backend = create_stt_backend(recognizer=self.recognizer)
+        self.vad = None  # StreamingVAD for the open microphone, created by _listen_loop
+        self.audio_buffer = None  # Continuous capture of the open microphone
+        self.cursor = 0  # Position in audio_buffer up to which audio has been consumed
+        # Requests from other threads and recognition results, handled by the listening thread
+        self.events = queue.Queue()
+        self.recognition_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="recognition")
+        # Event name -> audio clock time at which it fires. The audio clock counts the seconds
+        # of microphone audio consumed, so timeouts measure what was heard and stay exact
+        # to the frame even when the loop runs behind the capture.
+        self.deadlines = {}
+        self.bytes_per_second = 32000
+        self.phrase = None  # Recognition session of the phrase being captured
+        self.phrase_span = None  # Tracing span of that phrase, from speech onset to its end
+        self.state_start = 0  # Cursor at which the current state was entered
+        self.state_entered = time.monotonic()
+        self.transition_log = collections.deque(maxlen=200)  # (time, from, event, to, seconds spent in from)
+        self.transition_counts = collections.Counter()
+
+    @property
+    def use_wake_word(self):
+        return self._use_wake_word
+
+    @use_wake_word.setter
+    def use_wake_word(self, enabled):
+        self._use_wake_word = enabled
+        self.events.put(('transition', 'wake_word_enabled' if enabled else 'wake_word_disabled'))
 
     def listen_in_background(self):
         with self.lock:  # Ensure thread-safe access
@@ -27,13 +95,13 @@ class SpeechRecognizer:
 
             self.is_listening = True
             self.stop_listening_event.clear()
-            self.mode = 'wake_word' if self.use_wake_word else 'continuous_command'
+            self.events = queue.Queue()
             self.listening_thread = threading.Thread(target=self._listen_loop, daemon=True)
             self.listening_thread.start()
 
     def _configure_microphone(self):
         try:
-            return sr.Microphone()
+            return self.audio_source if self.audio_source is not None else create_audio_source()
         except OSError as e:
             print(f"Error configuring microphone: {e}")
             raise
@@ -42,31 +110,34 @@ class SpeechRecognizer:
         try:
             with self._configure_microphone() as source:
                 self.recognizer.adjust_for_ambient_noise(source, duration=0.5)
+                self.vad = StreamingVAD(source.SAMPLE_RATE, end_silence=self.recognizer.pause_threshold)
+                # A replayed session can arrive faster than it is consumed, so the ring holds all of it
+                seconds = max(AUDIO_BUFFER_SECONDS, getattr(source, 'duration', 0) + 1)
+                self.audio_buffer = AudioRingBuffer(source.stream, source.CHUNK, source.SAMPLE_RATE,
+                                                    source.SAMPLE_WIDTH, seconds=seconds)
+                self.audio_buffer.start()
+                self.cursor = 0  # From the start of capture, so a replay fast enough to be ahead is heard in full
+                self.bytes_per_second = source.SAMPLE_RATE * source.SAMPLE_WIDTH
+                if self.wake_word_engine:
+                    self.wake_word_engine.min_rms = self.recognizer.energy_threshold
+                self._enter_state(self._home_state())
+                print(f"Listening loop running in mode: {self.mode}")
 
                 while not self.stop_listening_event.is_set():
-                    print(f"Listening loop running in mode: {self.mode}")
-
                     try:
-                        if self.mode == 'wake_word':
-                            self._listen_for_wake_word(source)
-                        elif self.mode == 'command':
-                            self._listen_for_command(source)
-                        elif self.mode == 'answer':
-                            self._listen_for_answer(source)
-                        elif self.mode == 'continuous_command':
-                            self._listen_for_continuous_command(source)
-                    except sr.RequestError as e:
-                        print(f"Request error in listen loop: {e}")
+                        self._step(source)
                     except OSError as e:
                         if "Stream closed" in str(e):
                             print("Audio stream closed. Restarting loop.")
+                            self._finish_recognitions()
                             break
                         else:
                             print(f"Unexpected OSError: {e}")
                     except Exception as e:
                         print(f"Unexpected error in listen loop: {e}")
+                        time.sleep(0.1)
 
-                    time.sleep(0.1)
+                self.audio_buffer.stop()
         except OSError as e:
             print(f"Error in _listen_loop setup: {e}")
             self.stop_listening_event.set()  # Ensure the loop exits cleanly
@@ -74,82 +145,188 @@ class SpeechRecognizer:
             print(f"General error in _listen_loop setup: {e}")
             self.stop_listening_event.set()
 
-    def _listen_for_wake_word(self, source):
+    def _step(self, source):
+        """Handles pending events and due deadlines, then one frame of audio.
+
+        While a wake phrase is being verified no audio is consumed; it waits in the ring
+        buffer and is picked up by whichever state the verification leads to.
+        """
+        self._process_events()
+        now = self._audio_clock()
+        for event in [event for event, due in self.deadlines.items() if due <= now]:
+            del self.deadlines[event]
+            self._on_deadline(event)
+        if self.mode == 'verifying_wake_word':
+            self._process_events(wait=0.1)
+            return
+        self._on_frame(self._read_chunk(source), source)
+
+    def _finish_recognitions(self):
+        """Waits for the phrases already captured to be recognized and delivers their results."""
+        self.recognition_worker.submit(lambda: None).result()  # The single worker runs in order
+        self._process_events()
+
+    def _process_events(self, wait=None):
         try:
-            print("Listening for wake word...")
-            audio = self.recognizer.listen(source, timeout=1, phrase_time_limit=5)
-            if self._preprocess_audio(audio.get_wav_data()):
-                text = self.recognizer.recognize_google(audio).lower()
-                print(f"Heard: {text}")
-
-                if self.wake_word in text:
-                    command_part = text.split(self.wake_word, 1)[1].strip()
-                    if command_part:
-                        self._trigger_callback('command_finished', text=command_part)
-                    else:
-                        self.mode = 'command'
-                        self._trigger_callback('wake_word_detected')
-        except sr.WaitTimeoutError:
+            event = self.events.get(timeout=wait) if wait else self.events.get_nowait()
+            while True:
+                if event[0] == 'recognition':
+                    self._on_recognition(event[1], event[2])
+                else:
+                    self._handle(event[1])
+                event = self.events.get_nowait()
+        except queue.Empty:
             pass
-        except sr.UnknownValueError:
-            pass
-        except sr.RequestError as e:
-            self._trigger_callback('error', str(e))
 
-    def _listen_for_command(self, source):
-        print("Listening for command...")
-        try:
-            audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
-            if self._preprocess_audio(audio.get_wav_data()):
-                command_text = self.recognizer.recognize_google(audio)
-                print(f"Recognized: {command_text}")
-                self._trigger_callback('command_finished', text=command_text)
-        except sr.WaitTimeoutError:
-            self._trigger_callback('command_timeout', text="No command detected.")
-        except sr.UnknownValueError:
-            self._trigger_callback('command_unrecognized', text="Could not understand the command.")
-        except sr.RequestError as e:
-            self._trigger_callback('error', str(e))
-        finally:
-            if self.use_wake_word:
-                self.mode = 'wake_word'
+    def _audio_clock(self):
+        return self.cursor / self.bytes_per_second
 
-    def _listen_for_answer(self, source):
-        print("Listening for answer...")
+    def _home_state(self):
+        return 'wake_word' if self._use_wake_word else 'continuous_command'
+
+    def _handle(self, event):
+        """Applies the transition for event in the current state, if there is one."""
+        target = TRANSITIONS.get((self.mode, event))
+        if target is None:
+            return
+        if target == 'home':
+            target = self._home_state()
+        dwell = time.monotonic() - self.state_entered
+        self.transition_log.append((time.time(), self.mode, event, target, dwell))
+        self.transition_counts[(self.mode, event, target)] += 1
+        print(f"Speech state: {self.mode} -> {target} on {event} after {dwell:.2f}s")
+        self._enter_state(target)
+
+    def _enter_state(self, state):
+        self.mode = state
+        self.state_entered = time.monotonic()
+        self.state_start = self.cursor
+        self.phrase = None
+        if self.phrase_span:
+            self.phrase_span.end(abandoned=True)
+            self.phrase_span = None
+        self.deadlines.clear()
+        self.vad.reset()
+        if self.wake_word_engine:
+            self.wake_word_engine.reset()
+        if state == 'command':
+            self.deadlines['timeout'] = self._audio_clock() + self.command_timeout
+        elif state == 'answer':
+            self.deadlines['timeout'] = self._audio_clock() + self.answer_timeout
+
+    def _on_deadline(self, event):
+        if event == 'phrase_limit':
+            self._end_phrase()
+        elif event == 'timeout':
+            if self.mode == 'command':
+                self._trigger_callback('command_timeout', text="No command detected.")
+            elif self.mode == 'answer':
+                self._trigger_callback('answer_timeout')
+            self._handle('timeout')
+
+    def _on_frame(self, chunk, source):
+        if self.mode == 'wake_word' and self.wake_word_engine:
+            if self.wake_word_engine.process(chunk, source.SAMPLE_RATE):
+                print("Wake word detected locally")
+                self._handle('wake_word_detected')
+                self._trigger_callback('wake_word_detected')
+            return
+
+        started = time.perf_counter()
+        events = self.vad.process(chunk)
+        if self.phrase_span:
+            self.phrase_span.attrs['vad_ms'] += (time.perf_counter() - started) * 1000
+        if self.phrase is None:
+            if 'start' in events:
+                self._start_phrase(source)
+        else:
+            self._feed_phrase(chunk)
+        if self.phrase is not None and 'end' in events:
+            self._end_phrase()
+
+    def _start_phrase(self, source):
+        """Opens a recognition session at speech onset, with the lead-in taken back out of the
+        ring buffer. The lead-in never reaches before the current state was entered, so a
+        command that follows the wake word in the same breath starts right after it."""
+        start = max(self.state_start, self.cursor - int(self.recognizer.non_speaking_duration * self.bytes_per_second))
+        start -= (start - self.state_start) % source.SAMPLE_WIDTH
+        # Every phrase may carry a request, so each one starts a new turn for tracing
+        self.phrase_span = tracer.span('speech.capture', turn=tracer.begin_turn(), state=self.mode, vad_ms=0.0)
+        self.phrase = self.stt_backend.start_session(source.SAMPLE_RATE)
+        self.deadlines.pop('timeout', None)
+        self.deadlines['phrase_limit'] = start / self.bytes_per_second + PHRASE_TIME_LIMITS[self.mode]
+        self._feed_phrase(self.audio_buffer.window(start, self.cursor))
+
+    def _feed_phrase(self, pcm):
+        partial = self.phrase.feed(pcm)
+        if partial and self.mode != 'wake_word':
+            self._trigger_callback('partial_recognition', text=partial)
+
+    def _end_phrase(self):
+        """Hands the finished phrase to the recognition worker and moves on without waiting."""
+        purpose, session, span = self.mode, self.phrase, self.phrase_span
+        self.phrase = self.phrase_span = None
+        self.deadlines.pop('phrase_limit', None)
+        span.end()
+        # Includes the wait for the worker, which is busy while an earlier phrase is recognized
+        recognize_span = tracer.span('speech.recognize', turn=span.turn, state=purpose)
+
+        def on_done(future):
+            recognize_span.end(ok=not future.cancelled() and future.exception() is None)
+            self.events.put(('recognition', purpose, future))
+
+        future = self.recognition_worker.submit(session.finish)
+        future.add_done_callback(on_done)
+        self._handle('phrase_captured')
+
+    def _on_recognition(self, purpose, future):
+        """Delivers the result of a phrase recognized for the state named by purpose."""
+        text, unrecognized = None, False
         try:
-            audio = self.recognizer.listen(source, timeout=5, phrase_time_limit=10)
-            if self._preprocess_audio(audio.get_wav_data()):
-                answer_text = self.recognizer.recognize_google(audio).lower()
-                if answer_text.strip():
-                    print(f"Answer recognized: {answer_text}")
-                    self._trigger_callback('answer_received', text=answer_text)
-                    self.mode = 'wake_word' if self.use_wake_word else 'continuous_command'
+            text = future.result()
         except sr.UnknownValueError:
-            print("Could not understand the answer.")
-            self._trigger_callback('answer_timeout')
+            unrecognized = True
         except sr.RequestError as e:
             self._trigger_callback('error', str(e))
-        if self.use_wake_word:
-            self.mode = 'wake_word'
-
-    def _listen_for_continuous_command(self, source):
-        print("Listening for continuous command...")
-        while not self.stop_listening_event.is_set():
-            try:
-                audio = self.recognizer.listen(source, phrase_time_limit=10)
-                if self._preprocess_audio(audio.get_wav_data()):
-                    command_text = self.recognizer.recognize_google(audio)
-                    print(f"Recognized: {command_text}")
-                    self._trigger_callback('command_finished', text=command_text)
-            except sr.UnknownValueError:
-                print("Could not understand the command.")
-            except sr.RequestError as e:
-                self._trigger_callback('error', str(e))
+        except Exception as e:
+            print(f"Error recognizing phrase: {e}")
+
+        if purpose == 'wake_word':
+            heard = (text or "").lower()
+            if heard:
+                print(f"Heard: {heard}")
+            if self.wake_word in heard:
+                command_part = heard.split(self.wake_word, 1)[1].strip()
+                if not command_part:
+                    self._handle('wake_word_detected')
+                    self._trigger_callback('wake_word_detected')
+                    return
+                self._trigger_callback('command_finished', text=command_part)
+            self._handle('wake_word_checked')
+        elif purpose == 'answer':
+            if text and text.strip():
+                print(f"Answer recognized: {text.lower()}")
+                self._trigger_callback('answer_received', text=text.lower())
+            elif unrecognized:
+                print("Could not understand the answer.")
+                self._trigger_callback('answer_timeout')
+        elif text:
+            print(f"Recognized: {text}")
+            self._trigger_callback('command_finished', text=text)
+        elif unrecognized and purpose == 'command':
+            self._trigger_callback('command_unrecognized', text="Could not understand the command.")
+        elif unrecognized:
+            print("Could not understand the command.")
+
+    def _read_chunk(self, source):
+        """Next CHUNK of microphone audio, continuing exactly where the previous read ended."""
+        chunk, self.cursor = self.audio_buffer.read(self.cursor, source.CHUNK * source.SAMPLE_WIDTH)
+        return chunk
 
     def start_listening_for_answer(self):
         if self.use_wake_word:
             print("Starting to listen for answer...")
-            self.mode = 'answer'
+            self.events.put(('transition', 'answer_requested'))
 
     def stop_listening(self):
         self.stop_listening_event.set()
@@ -164,14 +341,3 @@ class SpeechRecognizer:
         print(f"_trigger_callback called with event: {event}, text: {text}")
         if self.callback:
             self.callback(event, text)
-
-    def _preprocess_audio(self, audio_data, sample_rate=16000):
-        """Filters out non-speech audio using VAD."""
-        vad = webrtcvad.Vad(2)  # 0-3 (0: least aggressive, 3: most aggressive)
-        raw_audio = io.BytesIO(audio_data)
-        with wave.open(raw_audio) as wf:
-            audio = wf.readframes(wf.getnframes())
-        frame_duration = 30  # ms
-        frame_length = int(sample_rate * frame_duration / 1000) * 2
-        speech_frames = [audio[i:i+frame_length] for i in range(0, len(audio), frame_length)]
-        return any(vad.is_speech(frame, sample_rate) for frame in speech_frames)
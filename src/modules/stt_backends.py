@@ -0,0 +1,197 @@
+import json
+import os
+
+import speech_recognition as sr
+
+from modules.audio_utils import Resampler
+
+LOCAL_RATE = 16000  # Vosk and Whisper models are trained on 16 kHz audio
+
+
+class RecognitionSession:
+    """Recognition of one phrase, fed with 16-bit mono PCM chunks as they are captured.
+
+    feed() returns the current partial transcript when it has changed, otherwise None.
+    finish() returns the final transcript and raises sr.UnknownValueError when nothing was
+    understood, or sr.RequestError when the backend failed.
+    """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.chunks = []
+
+    def feed(self, pcm):
+        self.chunks.append(pcm)
+        return None
+
+    def finish(self):
+        raise NotImplementedError
+
+
+class SpeechBackend:
+    """Interface of the speech-to-text engines used by SpeechRecognizer."""
+
+    name = None
+    streams_partials = False
+
+    def start_session(self, sample_rate):
+        raise NotImplementedError
+
+    def transcribe(self, pcm, sample_rate):
+        """Recognizes a whole recording in one go."""
+        session = self.start_session(sample_rate)
+        session.feed(pcm)
+        return session.finish()
+
+
+class _GoogleSession(RecognitionSession):
+    def __init__(self, recognizer, sample_rate):
+        super().__init__(sample_rate)
+        self.recognizer = recognizer
+
+    def finish(self):
+        audio = sr.AudioData(b"".join(self.chunks), self.sample_rate, 2)
+        return self.recognizer.recognize_google(audio)
+
+
+class GoogleBackend(SpeechBackend):
+    """The free Google Web Speech API through SpeechRecognition. Needs a network connection."""
+
+    name = 'google'
+
+    def __init__(self, recognizer=None):
+        self.recognizer = recognizer or sr.Recognizer()
+
+    def start_session(self, sample_rate):
+        return _GoogleSession(self.recognizer, sample_rate)
+
+
+class _VoskSession(RecognitionSession):
+    def __init__(self, model, sample_rate):
+        from vosk import KaldiRecognizer
+        super().__init__(sample_rate)
+        self.recognizer = KaldiRecognizer(model, LOCAL_RATE)
+        self.resampler = Resampler(sample_rate, LOCAL_RATE)
+        self.segments = []
+        self.partial = ""
+
+    def feed(self, pcm):
+        if self.recognizer.AcceptWaveform(self.resampler.convert(pcm)):
+            # Vosk found an endpoint inside the phrase; keep the finished segment
+            self.segments.append(json.loads(self.recognizer.Result()).get("text", ""))
+            text = ""
+        else:
+            text = json.loads(self.recognizer.PartialResult()).get("partial", "")
+        partial = " ".join(s for s in self.segments + [text] if s)
+        if partial and partial != self.partial:
+            self.partial = partial
+            return partial
+        return None
+
+    def finish(self):
+        self.segments.append(json.loads(self.recognizer.FinalResult()).get("text", ""))
+        text = " ".join(s for s in self.segments if s)
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class VoskBackend(SpeechBackend):
+    """Offline Kaldi recognition with Vosk. Decodes while audio arrives, so partials are free."""
+
+    name = 'vosk'
+    streams_partials = True
+
+    def __init__(self, model_path):
+        from vosk import Model, SetLogLevel
+        if not model_path or not os.path.isdir(model_path):
+            raise ValueError(f"Vosk model directory not found: {model_path}")
+        SetLogLevel(-1)
+        self.model = Model(model_path)  # Loaded once and shared by every session
+
+    def start_session(self, sample_rate):
+        return _VoskSession(self.model, sample_rate)
+
+
+class _WhisperSession(RecognitionSession):
+    def __init__(self, backend, sample_rate):
+        super().__init__(sample_rate)
+        self.backend = backend
+        self.resampler = Resampler(sample_rate, LOCAL_RATE)
+        self.pending_bytes = 0
+        self.partial = ""
+
+    def feed(self, pcm):
+        self.chunks.append(self.resampler.convert(pcm))
+        interval = self.backend.partial_interval
+        if not interval:
+            return None
+        self.pending_bytes += len(pcm) * LOCAL_RATE // self.sample_rate
+        if self.pending_bytes < interval * LOCAL_RATE * 2:
+            return None
+        self.pending_bytes = 0
+        partial = self.backend.decode(b"".join(self.chunks))
+        if partial and partial != self.partial:
+            self.partial = partial
+            return partial
+        return None
+
+    def finish(self):
+        text = self.backend.decode(b"".join(self.chunks))
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+class WhisperBackend(SpeechBackend):
+    """Offline Whisper recognition on the CPU with faster-whisper (CTranslate2, int8).
+
+    Whisper decodes whole utterances. With partial_interval set, the audio so far is decoded
+    again every partial_interval seconds to produce partials, which costs extra CPU.
+    """
+
+    name = 'whisper'
+
+    def __init__(self, model_size="base.en", compute_type="int8", language=None, partial_interval=0):
+        from faster_whisper import WhisperModel
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type)
+        self.language = language
+        self.partial_interval = partial_interval
+        self.streams_partials = bool(partial_interval)
+
+    def decode(self, pcm):
+        import numpy as np  # Only Whisper needs it, and faster_whisper depends on it anyway
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        try:
+            segments, _ = self.model.transcribe(samples, language=self.language, beam_size=1,
+                                                condition_on_previous_text=False)
+            return " ".join(segment.text.strip() for segment in segments).strip()
+        except Exception as e:
+            raise sr.RequestError(f"Whisper transcription failed: {str(e)}")
+
+    def start_session(self, sample_rate):
+        return _WhisperSession(self, sample_rate)
+
+
+def create_stt_backend(name=None, recognizer=None):
+    """Builds the configured speech-to-text backend: 'google' (default), 'vosk' or 'whisper'.
+
+    Falls back to Google when a local backend cannot be loaded.
+    """
+    name = (name or os.getenv('AVA_STT_BACKEND', 'google')).lower()
+    try:
+        if name == 'vosk':
+            return VoskBackend(os.getenv('AVA_VOSK_MODEL'))
+        if name == 'whisper':
+            return WhisperBackend(
+                model_size=os.getenv('AVA_WHISPER_MODEL', 'base.en'),
+                compute_type=os.getenv('AVA_WHISPER_COMPUTE_TYPE', 'int8'),
+                language=os.getenv('AVA_WHISPER_LANGUAGE') or None,
+                partial_interval=float(os.getenv('AVA_WHISPER_PARTIAL_INTERVAL', '0'))
+            )
+        if name != 'google':
+            print(f"Unknown speech backend '{name}', using Google")
+    except Exception as e:
+        print(f"Speech backend '{name}' unavailable, falling back to Google: {e}")
+    return GoogleBackend(recognizer)
+
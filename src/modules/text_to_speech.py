@@ -1,25 +1,202 @@
+import io
+import itertools
 import os
-import tempfile
+import queue
+import re
 import threading
-import time
-import pyttsx3
+from concurrent.futures import Future
 import json
 import logging
 
-try:
-    from google.cloud import texttospeech
-    import pygame
-    GOOGLE_TTS_AVAILABLE = True
-except ImportError:
-    GOOGLE_TTS_AVAILABLE = False
+from modules.audio_utils import Resampler, read_wav
+from modules.tracing import tracer
+from modules.tts_cache import TTSCache
+
+# Imported by _import_google_tts when Google TTS is used, since the client is slow to load
+texttospeech = None
+pyaudio = None
+
+# Google TTS is asked for 16-bit mono PCM at this rate, the rate of the persistent output stream
+PLAYBACK_RATE = 24000
+
+# Synthesized speech cache: AVA_TTS_CACHE_MB in memory, plus config/tts_cache on disk unless
+# AVA_TTS_DISK_CACHE=0
+TTS_CACHE_BYTES = int(float(os.getenv('AVA_TTS_CACHE_MB', '32')) * 1024 * 1024)
+TTS_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'tts_cache'))
+TTS_DISK_CACHE = os.getenv('AVA_TTS_DISK_CACHE', '1') != '0'
+
+# A sentence ends at terminal punctuation (plus closing quotes/brackets) followed by whitespace,
+# or at a line break. Requiring the whitespace keeps "3.14" or "file.txt" in one piece.
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+
+# Playback queue priorities: short system prompts go ahead of queued replies
+PRIORITY_PROMPT = 0
+PRIORITY_REPLY = 1
+
+# Ends a SpeechStream's sentence and audio queues; None stays free to mean "no audio"
+_END = object()
+
+
+def _import_google_tts():
+    """Imports the Google TTS client and PyAudio. Returns False if either is missing."""
+    global texttospeech, pyaudio
+    try:
+        from google.cloud import texttospeech
+        import pyaudio
+    except ImportError:
+        return False
+    return True
+
+
+class SpeechStream:
+    """Speaks a reply sentence by sentence while the rest of it is still being generated.
+
+    Text deltas go in through feed(). Each complete sentence is synthesized on the stream's
+    own thread while the previous one plays on the TextToSpeech playback worker, so the
+    first audio only waits for the first sentence and playback continues without gaps.
+    future resolves like the one returned by TextToSpeech.speak().
+    """
+
+    def __init__(self, tts, turn=None):
+        self.tts = tts
+        self.turn = turn  # Tracing turn the reply belongs to
+        self.buffer = ""
+        self.has_text = False
+        self.sentences = queue.Queue()
+        self.audio = queue.Queue()
+        self.finished = threading.Event()
+        self.stopped = threading.Event()
+        self.future = Future()
+        threading.Thread(target=self._synthesize_loop, daemon=True).start()
+
+    def feed(self, text):
+        if not text or self.stopped.is_set():
+            return
+        self.has_text = True
+        self.buffer += text
+        while True:
+            match = SENTENCE_BOUNDARY.search(self.buffer)
+            if not match:
+                break
+            sentence = self.buffer[:match.end()].strip()
+            self.buffer = self.buffer[match.end():]
+            if sentence:
+                self.sentences.put(sentence)
+
+    def close(self):
+        """Flushes the trailing partial sentence and marks the end of the reply."""
+        if self.buffer.strip():
+            self.sentences.put(self.buffer.strip())
+        self.buffer = ""
+        self.sentences.put(_END)
+
+    def wait(self, timeout=None):
+        """Blocks until every sentence has been played or the stream was stopped."""
+        return self.finished.wait(timeout)
+
+    def stop(self):
+        """Drops every sentence not yet played. The sentence playing now is cut by TextToSpeech.interrupt()."""
+        self.stopped.set()
+        self.sentences.put(_END)
+        self.audio.put(_END)
+        self.finished.set()
+
+    def _synthesize_loop(self):
+        while True:
+            sentence = self.sentences.get()
+            if sentence is _END or self.stopped.is_set():
+                self.audio.put(_END)
+                return
+            # A sentence that cannot be synthesized is skipped, the rest of the reply still plays
+            try:
+                audio = self.tts.synthesize(sentence, self.turn)
+            except Exception as e:
+                logging.error(f"Error synthesizing sentence: {e}")
+                continue
+            if audio is None:
+                logging.warning(f"Skipping a sentence that could not be synthesized: {sentence}")
+                continue
+            self.audio.put(audio)
+
+    def play_through(self):
+        """Plays sentences as they are synthesized. Runs on the playback worker.
+
+        Returns True when the whole reply was played, False when the stream was stopped.
+        """
+        first = True
+        try:
+            while True:
+                audio = self.audio.get()
+                if audio is _END or self.stopped.is_set():
+                    return not self.stopped.is_set()
+                if first:
+                    tracer.record_since_turn_start('turn.first_audio', self.turn)
+                    first = False
+                self.tts.play(audio)
+        finally:
+            self.finished.set()
+
+
+class PcmPlayer:
+    """Plays 16-bit mono PCM from memory on one persistent PyAudio output stream.
+
+    The stream is opened once and stays running; its callback copies the current buffer out
+    through a memoryview and outputs silence between utterances, so playback starts without
+    any device setup. play() blocks on an event that the callback sets once the last sample
+    has been handed to the device, or that stop() sets to cut playback short.
+    """
+
+    def __init__(self, sample_rate=PLAYBACK_RATE):
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.audio = None
+        self.position = 0
+        self.done = threading.Event()
+        self.pyaudio = pyaudio.PyAudio()
+        self.stream = self.pyaudio.open(format=pyaudio.paInt16, channels=1, rate=sample_rate,
+                                        output=True, stream_callback=self._callback)
+
+    def _callback(self, in_data, frame_count, time_info, status):
+        size = frame_count * 2
+        with self.lock:
+            if self.audio is None:
+                return (bytes(size), pyaudio.paContinue)
+            chunk = bytes(self.audio[self.position:self.position + size])
+            self.position += size
+            if self.position >= len(self.audio):
+                self.audio = None
+                self.done.set()
+        return (chunk + bytes(size - len(chunk)), pyaudio.paContinue)
+
+    def play(self, pcm):
+        done = threading.Event()
+        with self.lock:
+            self.done.set()  # Releases a play() call whose audio is being replaced
+            self.audio, self.position, self.done = memoryview(pcm), 0, done
+        done.wait()
+
+    def stop(self):
+        with self.lock:
+            self.audio = None
+            self.done.set()
+
+    def close(self):
+        self.stop()
+        self.stream.stop_stream()
+        self.stream.close()
+        self.pyaudio.terminate()
+
 
 class TextToSpeech:
     def __init__(self):
         self.credentials_file = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'credentials.json'))
-        self.use_google_tts = GOOGLE_TTS_AVAILABLE and os.path.exists(self.credentials_file)
-        self.temp_files = []
-        self.cleanup_lock = threading.Lock()
-        
+        self.use_google_tts = os.path.exists(self.credentials_file) and _import_google_tts()
+        # Everything is spoken by one playback worker, in priority order, one item at a time
+        self.playback_queue = queue.PriorityQueue()
+        self.sequence = itertools.count()
+        self.current = None
+        self.interrupted = threading.Event()
+
         if self.use_google_tts:
             logging.info("Using Google TTS")
             os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = self.credentials_file
@@ -36,15 +213,17 @@ class TextToSpeech:
                 ssml_gender=texttospeech.SsmlVoiceGender.FEMALE
             )
             self.audio_config = texttospeech.AudioConfig(
-                audio_encoding=texttospeech.AudioEncoding.MP3,
+                audio_encoding=texttospeech.AudioEncoding.LINEAR16,
+                sample_rate_hertz=PLAYBACK_RATE,
                 speaking_rate=1.0,
                 pitch=0.0
             )
-            pygame.mixer.init()
-            self.cleanup_thread = threading.Thread(target=self._cleanup_files, daemon=True)
-            self.cleanup_thread.start()
+            self.player = PcmPlayer(PLAYBACK_RATE)
+            self.cache = TTSCache(TTS_CACHE_BYTES, TTS_CACHE_DIR if TTS_DISK_CACHE else None)
+            self.cache_settings = f"{self.voice}|{self.audio_config}"
         else:
             logging.info("Using pyttsx3 TTS")
+            import pyttsx3
             self.engine = pyttsx3.init()
             voices = self.engine.getProperty('voices')
             female_voice = next((voice for voice in voices if "female" in voice.name.lower()), None)
@@ -53,54 +232,159 @@ class TextToSpeech:
             self.engine.setProperty('rate', 150)
             self.engine.setProperty('volume', 0.8)
 
-    def speak(self, text):
+        self.playback_thread = threading.Thread(target=self._playback_loop, daemon=True, name="tts-playback")
+        self.playback_thread.start()
+
+    def speak(self, text, priority=PRIORITY_PROMPT):
+        """Queues text for speaking and returns at once.
+
+        The returned Future resolves to True once the text has been played to the end, or to
+        False if it was interrupted while playing. It is cancelled if it was flushed from the
+        queue before it started.
+        """
+        future = Future()
+        self.playback_queue.put((priority, next(self.sequence), text, future, tracer.current_turn))
+        return future
+
+    def start_stream(self, priority=PRIORITY_REPLY):
+        """Queues a SpeechStream that speaks text as it is fed in, and returns it."""
+        stream = SpeechStream(self, tracer.current_turn)
+        self.playback_queue.put((priority, next(self.sequence), stream, stream.future, stream.turn))
+        return stream
+
+    def _playback_loop(self):
+        while True:
+            priority, _, item, future, turn = self.playback_queue.get()
+            if item is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.interrupted.clear()
+            self.current = item
+            try:
+                with tracer.span('tts.speak', turn=turn, priority=priority) as span:
+                    if isinstance(item, SpeechStream):
+                        completed = item.play_through()
+                    else:
+                        audio = self.synthesize(item, turn)
+                        if priority == PRIORITY_REPLY:
+                            tracer.record_since_turn_start('turn.first_audio', turn)
+                        self.play(audio)
+                        completed = not self.interrupted.is_set()
+                    span.set(completed=completed)
+                if completed and priority == PRIORITY_REPLY:
+                    tracer.record_since_turn_start('turn.total', turn)
+                future.set_result(completed)
+            except Exception as e:
+                logging.error(f"Error in text-to-speech playback: {e}")
+                future.set_exception(e)
+            finally:
+                self.current = None
+
+    def flush(self):
+        """Drops everything queued for speaking, leaving the current item playing."""
+        while True:
+            try:
+                _, _, item, future, _ = self.playback_queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is None:
+                self.playback_queue.put((-1, next(self.sequence), None, None, None))  # Keep the shutdown request
+                return
+            if isinstance(item, SpeechStream):
+                item.stop()
+            future.cancel()
+
+    def interrupt(self):
+        """Cuts off the item playing now; the queue carries on with the next one."""
+        self.interrupted.set()
+        current = self.current
+        if isinstance(current, SpeechStream):
+            current.stop()
+        try:
+            if self.use_google_tts:
+                self.player.stop()
+            else:
+                self.engine.stop()
+        except Exception as e:
+            logging.error(f"Error stopping text-to-speech playback: {e}")
+
+    def stop(self):
+        """Interrupts the current playback and drops everything still queued for speaking."""
+        self.flush()
+        self.interrupt()
+
+    def synthesize(self, text, turn=None):
+        """Turns text into something play() accepts.
+
+        Google TTS returns raw PCM at the player's rate; pyttsx3 synthesizes while it plays,
+        so the text itself is passed through.
+        """
         if self.use_google_tts:
-            self._speak_google(text)
+            with tracer.span('tts.synthesize', turn=turn, chars=len(text)) as span:
+                key = TTSCache.key(text, self.cache_settings)
+                audio = self.cache.get(key)
+                span.set(cached=audio is not None)
+                if audio is None:
+                    audio = self._synthesize_google(text)
+                    self.cache.put(key, audio)
+            return audio
+        return text
+
+    def prewarm(self, phrases):
+        """Synthesizes phrases into the cache in the background, so they later play instantly."""
+        if not self.use_google_tts:
+            return
+
+        def warm():
+            for phrase in phrases:
+                self.synthesize(phrase)
+
+        threading.Thread(target=warm, daemon=True).start()
+
+    def play(self, audio):
+        if audio is None:
+            return
+        if self.use_google_tts:
+            self._play_google(audio)
         else:
-            self._speak_pyttsx3(text)
+            self._speak_pyttsx3(audio)
 
-    def _speak_google(self, text):
+    def _synthesize_google(self, text):
         try:
             response = self.client.synthesize_speech(
                 input=texttospeech.SynthesisInput(text=text),
                 voice=self.voice,
                 audio_config=self.audio_config
             )
+            return self._to_player_pcm(response.audio_content)
+        except Exception as e:
+            logging.error(f"Error in Google text-to-speech: {e}")
+            return None
 
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as temp_audio_file:
-                temp_audio_file.write(response.audio_content)
-                temp_audio_file_path = temp_audio_file.name
-
-            pygame.mixer.music.load(temp_audio_file_path)
-            pygame.mixer.music.play()
-            while pygame.mixer.music.get_busy():
-                pygame.time.Clock().tick(10)
-
-            with self.cleanup_lock:
-                self.temp_files.append(temp_audio_file_path)
+    def _to_player_pcm(self, audio_content):
+        """Strips the WAV header Google puts on LINEAR16 audio, resampling if the rate differs."""
+        if audio_content[:4] != b"RIFF":
+            return audio_content
+        pcm, rate = read_wav(io.BytesIO(audio_content))
+        if rate != self.player.sample_rate:
+            pcm = Resampler(rate, self.player.sample_rate).convert(pcm)
+        return pcm
 
+    def _play_google(self, pcm):
+        try:
+            self.player.play(pcm)
         except Exception as e:
-            logging.error(f"Error in Google text-to-speech: {e}")
+            logging.error(f"Error playing Google text-to-speech audio: {e}")
 
     def _speak_pyttsx3(self, text):
         self.engine.say(text)
         self.engine.runAndWait()
 
-    def _cleanup_files(self):
-        while True:
-            with self.cleanup_lock:
-                for file in self.temp_files[:]:
-                    try:
-                        os.unlink(file)
-                        self.temp_files.remove(file)
-                    except (PermissionError, FileNotFoundError):
-                        pass
-            time.sleep(5)
-
-    def __del__(self):
-        if hasattr(self, 'temp_files'):
-            for file in self.temp_files:
-                try:
-                    os.unlink(file)
-                except:
-                    pass
+    def close(self):
+        """Stops playback, ends the playback worker and releases the audio output."""
+        self.stop()
+        self.playback_queue.put((-1, next(self.sequence), None, None, None))
+        self.playback_thread.join(timeout=2)
+        if self.use_google_tts:
+            self.player.close()
@@ -0,0 +1,65 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ToolDispatcher:
+    """Runs the tool calls of one requires_action step side by side on a bounded thread pool.
+
+    Each tool can have its own timeout and its own concurrency limit (for example a single
+    vision capture at a time). Outputs come back in the order of the calls, so a step takes
+    about as long as its slowest tool.
+    """
+
+    def __init__(self, execute, max_workers=4, timeouts=None, concurrency=None, default_timeout=60):
+        self.execute = execute
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tool")
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.concurrency = concurrency or {}
+        self.limits = {}
+
+    async def _run(self, name, arguments, deadline):
+        loop = asyncio.get_running_loop()
+        timeout = self.timeouts.get(name, self.default_timeout)
+        timeout_message = f"Error: {name} did not finish within {timeout} seconds"
+
+        limit = None
+        if name in self.concurrency:
+            limit = self.limits.setdefault(name, asyncio.Semaphore(self.concurrency[name]))
+            try:
+                await asyncio.wait_for(limit.acquire(), max(0, deadline - loop.time()))
+            except asyncio.TimeoutError:
+                return timeout_message
+
+        work = self.executor.submit(self.execute, name, arguments)
+        if limit:
+            # The slot is freed when the worker thread is done, not when the caller gives up,
+            # so a timed-out or cancelled call still counts against the limit while it runs
+            work.add_done_callback(lambda _: loop.call_soon_threadsafe(limit.release))
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(work)), max(0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            work.cancel()  # Only takes effect if the call is still queued for a worker
+            return timeout_message
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+        except Exception as e:
+            return f"Error executing {name}: {str(e)}"
+
+    async def dispatch(self, calls):
+        """Executes (name, arguments) pairs concurrently and returns their outputs in order.
+
+        A tool's timeout counts from the start of the step, including any time spent waiting
+        for its concurrency slot. A timed-out tool keeps running in the background, but its
+        result is replaced with an error message. Cancelling the dispatch drops the calls that
+        have not started yet and abandons the ones already running.
+        """
+        started = asyncio.get_running_loop().time()
+        return await asyncio.gather(*[
+            self._run(name, arguments, started + self.timeouts.get(name, self.default_timeout))
+            for name, arguments in calls
+        ])
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
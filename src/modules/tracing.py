@@ -0,0 +1,198 @@
+import atexit
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+
+TRACE_ENABLED = os.getenv('AVA_TRACE', '1') != '0'
+TRACE_BUFFER_SIZE = int(os.getenv('AVA_TRACE_BUFFER_SIZE', '10000'))  # Finished spans kept for export
+TRACE_SAMPLES = int(os.getenv('AVA_TRACE_SAMPLES', '1000'))  # Latest durations per stage kept for percentiles
+# Trace written on exit when set, as a Chrome trace ('chrome') or as spans plus percentiles ('json')
+TRACE_FILE = os.getenv('AVA_TRACE_FILE')
+TRACE_FORMAT = os.getenv('AVA_TRACE_FORMAT', 'chrome')
+
+
+class Span:
+    """One timed stage of a turn. Ends once, by end() or by leaving its with block."""
+
+    __slots__ = ('tracer', 'name', 'turn', 'attrs', 'start', 'end_time', 'thread_id', 'thread_name')
+
+    def __init__(self, tracer, name, turn, attrs, start=None):
+        self.tracer = tracer
+        self.name = name
+        self.turn = turn
+        self.attrs = attrs
+        self.start = time.perf_counter() if start is None else start
+        self.end_time = None
+        thread = threading.current_thread()
+        self.thread_id, self.thread_name = thread.ident, thread.name
+
+    @property
+    def duration(self):
+        return (self.end_time if self.end_time is not None else time.perf_counter()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, **attrs):
+        if self.end_time is not None:
+            return
+        self.attrs.update(attrs)
+        self.end_time = time.perf_counter()
+        self.tracer._finish(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attrs['error'] = exc_type.__name__
+        self.end()
+        return False
+
+
+class Tracer:
+    """Collects spans of the stages of a voice turn, from microphone to speaker.
+
+    A turn starts at speech onset (or typed input) and gets an ID; spans opened without an
+    explicit turn belong to the latest one, since only one turn is active at a time. Finished
+    spans go to a bounded buffer for export, and their durations to per-stage histograms
+    that percentiles() summarizes.
+    """
+
+    def __init__(self, capacity=TRACE_BUFFER_SIZE, samples=TRACE_SAMPLES, enabled=TRACE_ENABLED):
+        self.enabled = enabled
+        self.spans = collections.deque(maxlen=capacity)
+        self.samples = samples
+        self.durations = {}
+        self.turn_ids = itertools.count(1)
+        self.current_turn = None
+        self.turn_starts = collections.OrderedDict()  # Turn ID -> perf_counter() at its start
+        self.epoch = time.perf_counter()
+        self.epoch_wall = time.time()
+        self.lock = threading.Lock()
+
+    def begin_turn(self):
+        """Starts a new turn and returns its ID."""
+        with self.lock:
+            turn = next(self.turn_ids)
+            self.current_turn = turn
+            self.turn_starts[turn] = time.perf_counter()
+            while len(self.turn_starts) > 100:
+                self.turn_starts.popitem(last=False)
+        return turn
+
+    def turn_start(self, turn):
+        """perf_counter() value at which turn started, or None if it is unknown or too old."""
+        with self.lock:
+            return self.turn_starts.get(turn)
+
+    def span(self, name, turn=None, **attrs):
+        """Starts a span; use it as a context manager or call end() on it."""
+        return Span(self, name, self.current_turn if turn is None else turn, attrs)
+
+    def record(self, name, start, end=None, turn=None, **attrs):
+        """Records a span that already happened, from start to end (default now) in perf_counter() time."""
+        span = Span(self, name, self.current_turn if turn is None else turn, attrs, start=start)
+        span.end_time = time.perf_counter() if end is None else end
+        self._finish(span)
+        return span
+
+    def record_since_turn_start(self, name, turn, **attrs):
+        """Records a span from the start of turn until now, such as the time to the first audio."""
+        start = self.turn_start(turn)
+        if start is not None:
+            self.record(name, start, turn=turn, **attrs)
+
+    def _finish(self, span):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.spans.append(span)
+            samples = self.durations.get(span.name)
+            if samples is None:
+                samples = self.durations[span.name] = collections.deque(maxlen=self.samples)
+            samples.append(span.end_time - span.start)
+
+    def percentiles(self, names=None):
+        """{stage: {count, p50, p95, p99, max}} with times in milliseconds."""
+        with self.lock:
+            durations = {name: sorted(samples) for name, samples in self.durations.items()
+                         if names is None or name in names}
+        stats = {}
+        for name, samples in sorted(durations.items()):
+            if not samples:
+                continue
+            stats[name] = {'count': len(samples), 'max': samples[-1] * 1000}
+            for p in (50, 95, 99):
+                stats[name][f'p{p}'] = samples[min(len(samples) - 1, int(len(samples) * p / 100))] * 1000
+        return stats
+
+    def summary(self):
+        """Latency table of every stage seen so far."""
+        stats = self.percentiles()
+        if not stats:
+            return "No spans recorded"
+        width = max(len(name) for name in stats)
+        lines = [f"{'stage':<{width}} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"]
+        for name, s in stats.items():
+            lines.append(f"{name:<{width}} {s['count']:>6} {s['p50']:>9.1f} {s['p95']:>9.1f} {s['p99']:>9.1f} {s['max']:>9.1f}")
+        return "\n".join(lines)
+
+    def _snapshot(self, turn=None):
+        with self.lock:
+            return [span for span in self.spans if turn is None or span.turn == turn]
+
+    def to_json(self, turn=None):
+        """Spans (of one turn, or all) and the percentiles, as a JSON-serializable dict."""
+        spans = [{
+            'name': span.name,
+            'turn': span.turn,
+            'start': self.epoch_wall + span.start - self.epoch,
+            'duration_ms': (span.end_time - span.start) * 1000,
+            'thread': span.thread_name,
+            'attrs': span.attrs,
+        } for span in self._snapshot(turn)]
+        return {'spans': spans, 'percentiles': self.percentiles()}
+
+    def to_chrome_trace(self, turn=None):
+        """Spans in the Chrome trace event format, for chrome://tracing or Perfetto."""
+        pid = os.getpid()
+        events, threads = [], {}
+        for span in self._snapshot(turn):
+            threads[span.thread_id] = span.thread_name
+            events.append({
+                'name': span.name,
+                'cat': span.name.split('.', 1)[0],
+                'ph': 'X',
+                'ts': (span.start - self.epoch) * 1e6,
+                'dur': (span.end_time - span.start) * 1e6,
+                'pid': pid,
+                'tid': span.thread_id,
+                'args': dict(span.attrs, turn=span.turn),
+            })
+        events += [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                   for tid, name in threads.items()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def export(self, path, fmt='chrome'):
+        """Writes every span kept to path, in the Chrome trace format or, with fmt='json', as to_json()."""
+        data = self.to_json() if fmt == 'json' else self.to_chrome_trace()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, default=str)
+
+
+tracer = Tracer()
+
+
+def _export_on_exit():
+    try:
+        tracer.export(TRACE_FILE, TRACE_FORMAT)
+    except OSError as e:
+        print(f"Error writing trace file: {str(e)}")
+
+
+if TRACE_FILE:
+    atexit.register(_export_on_exit)
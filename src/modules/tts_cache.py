@@ -0,0 +1,133 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+
+class TTSCache:
+    """Content-addressed cache of synthesized speech.
+
+    Entries are keyed by a hash of the text and the voice and audio settings that produced
+    the audio, so changing the voice never plays stale audio. Up to max_bytes of audio are
+    kept in memory with LRU eviction. With a directory, entries are also written to disk, so
+    they survive restarts. The disk store is trimmed back to max_disk_bytes, oldest
+    first, using the file modification time as the last-use time.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, directory=None, max_disk_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.disk_size = self._scan_disk() if directory else 0
+
+    @staticmethod
+    def key(text, settings):
+        """Cache key of text spoken with settings (any string describing voice and audio config)."""
+        normalized = " ".join(text.split())
+        return hashlib.sha256(f"{settings}\0{normalized}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pcm")
+
+    def _scan_disk(self):
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def get(self, key):
+        with self.lock:
+            audio = self.entries.get(key)
+            if audio is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return audio
+        audio = self._read_disk(key)
+        with self.lock:
+            if audio is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._remember(key, audio)
+        return audio
+
+    def put(self, key, audio):
+        if not audio:
+            return
+        with self.lock:
+            self._remember(key, audio)
+        if self.directory:
+            self._write_disk(key, audio)
+
+    def _remember(self, key, audio):
+        if len(audio) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = audio
+        self.size += len(audio)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                audio = f.read()
+            os.utime(path)
+            return audio
+        except OSError:
+            return None
+
+    def _write_disk(self, key, audio):
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(audio)
+            os.replace(temp_path, path)
+            with self.lock:
+                self.disk_size += len(audio)
+                over = self.disk_size > self.max_disk_bytes
+            if over:
+                self._trim_disk()
+        except OSError as e:
+            print(f"Error writing speech cache entry: {e}")
+
+    def _trim_disk(self):
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except OSError:
+                pass
+        with self.lock:
+            self.disk_size = total
@@ -0,0 +1,75 @@
+import collections
+
+import webrtcvad
+
+from modules.audio_utils import Resampler
+
+VAD_RATES = (8000, 16000, 32000, 48000)  # The only rates webrtcvad accepts
+
+
+class StreamingVAD:
+    """Speech segmentation of a live 16-bit mono PCM stream with one persistent webrtcvad instance.
+
+    Chunks of any size are cut into frame_ms frames without copying. A partial frame at the
+    end of a chunk waits for the next chunk. Rates that webrtcvad does not support (such as
+    44.1 kHz) are resampled to 16 kHz first. Frame decisions are smoothed: speech starts once
+    onset_frames of the last onset_window frames are voiced. It ends after end_silence
+    seconds without a voiced frame. webrtcvad flags the first frames of a stream as voiced
+    while its noise estimate settles, so the first warmup seconds only train it.
+    """
+
+    def __init__(self, sample_rate, aggressiveness=2, frame_ms=30, onset_frames=3, onset_window=5, end_silence=0.8,
+                 warmup=0.3):
+        self.vad = webrtcvad.Vad(aggressiveness)
+        self.sample_rate = sample_rate
+        self.rate = sample_rate if sample_rate in VAD_RATES else 16000
+        self.resampler = Resampler(sample_rate, self.rate)
+        self.frame_bytes = self.rate * frame_ms // 1000 * 2
+        self.onset_frames = onset_frames
+        self.recent = collections.deque(maxlen=onset_window)
+        self.hangover_frames = max(1, round(end_silence * 1000 / frame_ms))
+        self.warmup_frames = round(warmup * 1000 / frame_ms)
+        self.pending = b""
+        self.reset()
+
+    def reset(self):
+        """Starts a new utterance. The webrtcvad instance and resampler state are kept."""
+        self.pending = b""
+        self.recent.clear()
+        self.in_speech = False
+        self.heard_speech = False
+        self.silent_frames = 0
+
+    def process(self, pcm):
+        """Feeds a chunk and returns the transitions it caused: a list of 'start' and 'end'."""
+        if self.rate != self.sample_rate:
+            pcm = self.resampler.convert(pcm)
+        data = self.pending + pcm if self.pending else pcm
+        usable = len(data) - len(data) % self.frame_bytes
+        events = []
+        with memoryview(data) as view:
+            for offset in range(0, usable, self.frame_bytes):
+                voiced = self.vad.is_speech(view[offset:offset + self.frame_bytes], self.rate)
+                if self.warmup_frames:
+                    self.warmup_frames -= 1
+                    continue
+                event = self._smooth(voiced)
+                if event:
+                    events.append(event)
+            self.pending = bytes(view[usable:])
+        return events
+
+    def _smooth(self, voiced):
+        self.recent.append(voiced)
+        if not self.in_speech:
+            if sum(self.recent) >= self.onset_frames:
+                self.in_speech = self.heard_speech = True
+                self.silent_frames = 0
+                return 'start'
+            return None
+        self.silent_frames = 0 if voiced else self.silent_frames + 1
+        if self.silent_frames >= self.hangover_frames:
+            self.in_speech = False
+            self.recent.clear()
+            return 'end'
+        return None
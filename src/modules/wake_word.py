@@ -0,0 +1,252 @@
+import audioop
+import glob
+import os
+import wave
+
+import numpy as np
+
+from modules.audio_utils import Resampler, read_wav
+
+ENGINE_RATE = 16000
+FRAME_LENGTH = 400  # 25 ms analysis frames
+FRAME_HOP = 160  # 10 ms between frames
+FFT_SIZE = 512
+MEL_BANDS = 26
+CEPSTRAL_COEFFICIENTS = 13
+TEMPLATES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'config', 'wake_word'))
+
+
+def _mel_filterbank(low=60.0, high=7600.0):
+    def to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def to_hz(mel):
+        return 700.0 * (10 ** (mel / 2595.0) - 1.0)
+
+    edges = to_hz(np.linspace(to_mel(low), to_mel(high), MEL_BANDS + 2))
+    bins = np.floor((FFT_SIZE + 1) * edges / ENGINE_RATE).astype(int)
+    filterbank = np.zeros((MEL_BANDS, FFT_SIZE // 2 + 1))
+    for band in range(MEL_BANDS):
+        left, center, right = bins[band], bins[band + 1], bins[band + 2]
+        for k in range(left, center):
+            filterbank[band, k] = (k - left) / max(center - left, 1)
+        for k in range(center, right):
+            filterbank[band, k] = (right - k) / max(right - center, 1)
+    return filterbank
+
+
+MEL_FILTERBANK = _mel_filterbank()
+HAMMING = np.hamming(FRAME_LENGTH)
+DCT = np.cos(np.pi / MEL_BANDS * (np.arange(MEL_BANDS) + 0.5)[None, :] * np.arange(CEPSTRAL_COEFFICIENTS)[:, None])
+
+
+def mfcc(samples):
+    """MFCC features (frames x coefficients) of 16 kHz float samples.
+
+    The 0th coefficient (overall loudness) is dropped, so matching does not depend on how
+    loudly the wake word is spoken.
+    """
+    if len(samples) < FRAME_LENGTH:
+        samples = np.pad(samples, (0, FRAME_LENGTH - len(samples)))
+    emphasized = np.append(samples[0], samples[1:] - 0.97 * samples[:-1])
+    frame_count = 1 + (len(emphasized) - FRAME_LENGTH) // FRAME_HOP
+    indices = np.arange(FRAME_LENGTH)[None, :] + FRAME_HOP * np.arange(frame_count)[:, None]
+    power = np.abs(np.fft.rfft(emphasized[indices] * HAMMING, FFT_SIZE)) ** 2 / FFT_SIZE
+    return (np.log(power @ MEL_FILTERBANK.T + 1e-10) @ DCT.T)[:, 1:]
+
+
+def subsequence_dtw(template, window):
+    """Best alignment cost of template anywhere inside window, per template frame.
+
+    Rows follow the template and columns the window. The first row may start at any column
+    and the result is the cheapest end column, so silence around the keyword costs nothing.
+    The horizontal recurrence row[j] = min(best[j], row[j-1] + cost[j]) is solved with a
+    cumulative sum and a running minimum instead of a Python loop over columns.
+    """
+    cost = np.sqrt(((template[:, None, :] - window[None, :, :]) ** 2).sum(axis=2))
+    previous = np.zeros(window.shape[0])
+    for i in range(template.shape[0]):
+        c = cost[i]
+        if i == 0:
+            row = c.copy()
+        else:
+            best = c + np.minimum(previous, np.concatenate(([np.inf], previous[:-1])))
+            cumulative = np.cumsum(c)
+            row = cumulative + np.minimum.accumulate(best - cumulative)
+        previous = row
+    return previous.min() / template.shape[0]
+
+
+class WakeWordEngine:
+    """Interface of the local wake-word detectors.
+
+    process() takes 16-bit mono PCM at any sample rate and returns True when the wake word
+    has just been heard. Implementations keep their own rolling audio window.
+    """
+
+    min_rms = 0  # Chunks quieter than this are not worth analysing
+
+    def process(self, pcm, sample_rate):
+        raise NotImplementedError
+
+    def reset(self):
+        pass
+
+
+class TemplateWakeWordEngine(WakeWordEngine):
+    """Matches a rolling audio window against recorded examples of the wake word.
+
+    Each template is a short WAV of the user saying the wake word. Every hop, the MFCCs of the
+    recent audio window are aligned against each template with subsequence DTW, and a cost
+    below threshold fires the detection. Without an explicit threshold, it is calibrated from
+    how far the templates are from each other: sensitivity times their average mutual cost.
+    """
+
+    def __init__(self, templates, threshold=None, sensitivity=1.0, hop_seconds=0.1, window_margin=1.5):
+        if not templates:
+            raise ValueError("TemplateWakeWordEngine needs at least one template")
+        self.templates = [mfcc(t) for t in templates]
+        if threshold is None:
+            if len(self.templates) < 2:
+                raise ValueError("Record at least two wake-word templates or set a threshold")
+            costs = [
+                subsequence_dtw(a, b) for i, a in enumerate(self.templates)
+                for j, b in enumerate(self.templates) if i != j
+            ]
+            threshold = sensitivity * sum(costs) / len(costs)
+        self.threshold = threshold
+        longest = max(len(t) for t in templates)
+        self.window_size = int(longest * window_margin)
+        self.hop_size = int(ENGINE_RATE * hop_seconds)
+        self.ring = np.zeros(self.window_size, dtype=np.float32)
+        self.filled = 0
+        self.since_check = 0
+        self.resamplers = {}
+        self.last_score = None
+
+    @classmethod
+    def from_directory(cls, directory, **kwargs):
+        templates = []
+        for path in sorted(glob.glob(os.path.join(directory, '*.wav'))):
+            pcm, rate = read_wav(path)
+            if rate != ENGINE_RATE:
+                pcm = Resampler(rate, ENGINE_RATE).convert(pcm)
+            templates.append(np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0)
+        return cls(templates, **kwargs)
+
+    def reset(self):
+        self.ring[:] = 0
+        self.filled = 0
+        self.since_check = 0
+        self.last_score = None
+
+    def process(self, pcm, sample_rate):
+        if sample_rate != ENGINE_RATE:
+            resampler = self.resamplers.setdefault(sample_rate, Resampler(sample_rate, ENGINE_RATE))
+            pcm = resampler.convert(pcm)
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        if len(samples) >= self.window_size:
+            self.ring[:] = samples[-self.window_size:]
+        else:
+            self.ring = np.roll(self.ring, -len(samples))
+            self.ring[-len(samples):] = samples
+        self.filled = min(self.window_size, self.filled + len(samples))
+        self.since_check += len(samples)
+
+        if self.since_check < self.hop_size or self.filled < self.window_size // 2:
+            return False
+        self.since_check = 0
+        if self.min_rms and audioop.rms((self.ring[-self.hop_size:] * 32768).astype(np.int16).tobytes(), 2) < self.min_rms:
+            return False
+
+        window = mfcc(self.ring[-self.filled:])
+        self.last_score = min(subsequence_dtw(template, window) for template in self.templates)
+        if self.last_score < self.threshold:
+            self.reset()  # Don't fire again on the same utterance
+            return True
+        return False
+
+
+class OpenWakeWordEngine(WakeWordEngine):
+    """Wraps an openWakeWord keyword-spotting model, if the package is installed."""
+
+    FRAME = 1280  # openWakeWord scores 80 ms frames of 16 kHz audio
+
+    def __init__(self, model_path, threshold=0.5):
+        from openwakeword.model import Model
+        self.model = Model(wakeword_models=[model_path])
+        self.threshold = threshold
+        self.pending = b""
+        self.resamplers = {}
+
+    def reset(self):
+        self.pending = b""
+        self.model.reset()
+
+    def process(self, pcm, sample_rate):
+        if sample_rate != ENGINE_RATE:
+            pcm = self.resamplers.setdefault(sample_rate, Resampler(sample_rate, ENGINE_RATE)).convert(pcm)
+        self.pending += pcm
+        detected = False
+        while len(self.pending) >= self.FRAME * 2:
+            frame, self.pending = self.pending[:self.FRAME * 2], self.pending[self.FRAME * 2:]
+            scores = self.model.predict(np.frombuffer(frame, dtype=np.int16))
+            detected = detected or max(scores.values()) >= self.threshold
+        if detected:
+            self.reset()
+        return detected
+
+
+def create_wake_word_engine(name=None, templates_dir=None):
+    """Builds the configured wake-word engine, or returns None to use cloud recognition.
+
+    name is 'template', 'openwakeword' or 'cloud'. Without a name, the template engine is used
+    when template recordings exist.
+    """
+    name = (name or os.getenv('AVA_WAKE_WORD_ENGINE', '')).lower()
+    templates_dir = templates_dir or os.getenv('AVA_WAKE_WORD_TEMPLATES') or TEMPLATES_DIR
+    try:
+        if name == 'openwakeword':
+            return OpenWakeWordEngine(os.getenv('AVA_OPENWAKEWORD_MODEL'),
+                                      threshold=float(os.getenv('AVA_WAKE_WORD_THRESHOLD', '0.5')))
+        if name == 'template' or (not name and glob.glob(os.path.join(templates_dir, '*.wav'))):
+            threshold = os.getenv('AVA_WAKE_WORD_THRESHOLD')
+            return TemplateWakeWordEngine.from_directory(
+                templates_dir,
+                threshold=float(threshold) if threshold else None,
+                sensitivity=float(os.getenv('AVA_WAKE_WORD_SENSITIVITY', '1.0'))
+            )
+    except Exception as e:
+        print(f"Local wake-word engine unavailable, falling back to cloud recognition: {e}")
+    return None
+
+
+def record_templates(source, directory=TEMPLATES_DIR, count=5, phrase_seconds=3, on_prompt=print):
+    """Records count utterances of the wake word from source into directory as 16 kHz WAVs.
+
+    source is a speech_recognition AudioSource, normally sr.Microphone(). Each utterance is
+    cut out of the stream by the recognizer's silence detection, after calibrating it on half
+    a second of background noise. on_prompt is told when to speak. Returns the new paths.
+    """
+    import speech_recognition as sr
+
+    os.makedirs(directory, exist_ok=True)
+    recognizer = sr.Recognizer()
+    paths = []
+    number = 0
+    with source:
+        recognizer.adjust_for_ambient_noise(source, duration=0.5)
+        for take in range(1, count + 1):
+            on_prompt(f"Say the wake word ({take}/{count})")
+            audio = recognizer.listen(source, phrase_time_limit=phrase_seconds)
+            number += 1
+            while os.path.exists(os.path.join(directory, f'template-{number}.wav')):
+                number += 1  # Keep earlier recordings
+            path = os.path.join(directory, f'template-{number}.wav')
+            with wave.open(path, 'wb') as wav:
+                wav.setnchannels(1)
+                wav.setsampwidth(2)
+                wav.setframerate(ENGINE_RATE)
+                wav.writeframes(audio.get_raw_data(convert_rate=ENGINE_RATE, convert_width=2))
+            paths.append(path)
+    return paths
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The application runs from src/ and imports its modules as top-level packages
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import os
+import platform
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+os.environ.setdefault("AVA_LOG_FILE", "0")
+
+import ai  # noqa: E402
+from modules.app_logging import get_logger  # noqa: E402
+from modules.assistant_registry import AssistantRegistry  # noqa: E402
+from modules.async_loop import AsyncLoop  # noqa: E402
+from modules.job_manager import JobManager  # noqa: E402
+from modules.tool_dispatcher import ToolDispatcher  # noqa: E402
+
+
+class StubAssistants:
+    def __init__(self, assistants):
+        self.assistants = assistants
+        self.deleted = []
+
+    def list(self, limit=100):
+        return self.assistants
+
+    def delete(self, assistant_id):
+        self.deleted.append(assistant_id)
+
+
+def bare_assistant(**attrs):
+    """An AIAssistant without __init__, so no API key, event loop or file index is needed."""
+    assistant = ai.AIAssistant.__new__(ai.AIAssistant)
+    assistant.logger = get_logger()
+    for name, value in attrs.items():
+        setattr(assistant, name, value)
+    return assistant
+
+
+def test_collect_stale_assistants_only_deletes_this_apps_assistants(tmp_path):
+    host = platform.node()[:64]
+    registry = AssistantRegistry(str(tmp_path / "assistants.json"))
+    registry.record("old", "asst_old")
+    registry.data["assistants"]["old"]["last_used"] = time.time() - ai.ASSISTANT_MAX_AGE - 1
+    registry.record("current", "asst_current")
+    stub = StubAssistants([
+        SimpleNamespace(id="asst_current", name="Ava", metadata={"app": "ava", "host": host}),
+        SimpleNamespace(id="asst_orphan", name="Ava", metadata={"app": "ava", "host": host}),
+        SimpleNamespace(id="asst_other_host", name="Ava", metadata={"app": "ava", "host": "elsewhere"}),
+        SimpleNamespace(id="asst_by_hand", name="Ava", metadata={}),
+        SimpleNamespace(id="asst_other_tool", name="Ava", metadata={"owner": "teammate"}),
+        SimpleNamespace(id="asst_unrelated", name="Helper", metadata={"app": "ava", "host": host}),
+    ])
+    assistant = bare_assistant(assistant_registry=registry, assistant_id="asst_current",
+                               client=SimpleNamespace(beta=SimpleNamespace(assistants=stub)))
+
+    assistant.collect_stale_assistants()
+
+    assert sorted(stub.deleted) == ["asst_old", "asst_orphan"]
+    assert registry.known_ids() == {"asst_current"}
+
+
+class StubStream:
+    """An async run event stream. With a gate, it blocks before its first event until the gate is set."""
+
+    def __init__(self, events, gate=None):
+        self.events = list(events)
+        self.gate = gate
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.closed or not self.events:
+            raise StopAsyncIteration
+        return self.events.pop(0)
+
+    async def close(self):
+        self.closed = True
+
+
+def event(name, **data):
+    return SimpleNamespace(event=name, data=SimpleNamespace(**data))
+
+
+def text_delta(text):
+    part = SimpleNamespace(type="text", text=SimpleNamespace(value=text))
+    return event("thread.message.delta", delta=SimpleNamespace(content=[part]))
+
+
+def not_found(message):
+    return openai.NotFoundError(message, response=SimpleNamespace(request=None, status_code=404, headers={}), body=None)
+
+
+class StubRuns:
+    def __init__(self, streams):
+        self.streams = list(streams)  # Returned by create and submit_tool_outputs, in order
+        self.runs = {}
+        self.created = []
+        self.cancelled = []
+        self.submitted = []
+        self.missing_assistants = set()
+        self.missing_threads = set()
+
+    async def create(self, thread_id, assistant_id, stream):
+        if assistant_id in self.missing_assistants:
+            raise not_found(f"No assistant found with id '{assistant_id}'.")
+        if thread_id in self.missing_threads:
+            raise not_found(f"No thread found with id '{thread_id}'.")
+        run_id = f"run_{len(self.created) + 1}"
+        self.created.append(run_id)
+        self.runs[run_id] = SimpleNamespace(id=run_id, status="in_progress")
+        return self.streams.pop(0)
+
+    async def submit_tool_outputs(self, thread_id, run_id, tool_outputs, stream):
+        self.submitted.append((run_id, tool_outputs))
+        return self.streams.pop(0)
+
+    async def list(self, thread_id, limit=20):
+        return SimpleNamespace(data=list(reversed(self.runs.values())))
+
+    async def cancel(self, run_id, thread_id):
+        self.cancelled.append(run_id)
+        self.runs[run_id].status = "cancelled"
+        return self.runs[run_id]
+
+    async def retrieve(self, run_id, thread_id):
+        return self.runs[run_id]
+
+
+class StubMessages:
+    def __init__(self):
+        self.created = []
+
+    async def create(self, thread_id, role, content):
+        self.created.append((role, content))
+
+
+class StubThreads:
+    def __init__(self, streams):
+        self.runs = StubRuns(streams)
+        self.messages = StubMessages()
+
+    async def create(self):
+        return SimpleNamespace(id="thread_1")
+
+
+class StubAsyncAssistants:
+    def __init__(self, existing):
+        self.existing = existing
+        self.retrieved = []
+
+    async def retrieve(self, assistant_id):
+        self.retrieved.append(assistant_id)
+        if assistant_id not in self.existing:
+            raise not_found(f"No assistant found with id '{assistant_id}'.")
+        return SimpleNamespace(id=assistant_id)
+
+
+@pytest.fixture
+def streaming_assistant():
+    """An AIAssistant with its event loop and tool dispatcher, talking to a stub async client."""
+    loop = AsyncLoop(name="test-ai-loop")
+    created = []
+
+    def make(streams):
+        threads = StubThreads(streams)
+        threads.assistants = StubAsyncAssistants({"asst_1"})
+        assistant = bare_assistant(
+            loop=loop, async_client=SimpleNamespace(beta=SimpleNamespace(threads=threads, assistants=threads.assistants)),
+            thread_lock=asyncio.Lock(), turn_lock=threading.Lock(), active_turn=None,
+            assistant_id="asst_1", thread_id=None, current_run_id=None, finished_jobs=[],
+            terminal_logger=get_logger('terminal'))
+        assistant.tool_dispatcher = ToolDispatcher(assistant.execute_tool)
+        assistant.job_manager = JobManager(loop, on_finished=assistant.on_job_finished)
+        created.append(assistant)
+        return assistant, threads
+
+    yield make
+    for assistant in created:
+        assistant.job_manager.shutdown()
+        assistant.tool_dispatcher.shutdown()
+    loop.stop()
+
+
+def test_preempted_turn_cancels_a_run_whose_id_never_arrived(streaming_assistant):
+    gate = asyncio.Event()  # Never set: the first run's stream stalls before run.created
+    assistant, threads = streaming_assistant([
+        StubStream([event("thread.run.created", id="run_1")], gate=gate),
+        StubStream([event("thread.run.created", id="run_2"), text_delta("Second."),
+                    event("thread.run.completed", id="run_2")]),
+    ])
+
+    first = assistant.submit_ai_response("First")
+    while not threads.runs.created:
+        time.sleep(0.01)
+    second = assistant.submit_ai_response("Second")
+
+    assert second.result(timeout=5) == "Second."
+    assert first.cancelled()
+    assert threads.runs.cancelled == ["run_1"]
+
+
+def test_streamed_turn_runs_tools_and_returns_the_text(streaming_assistant, tmp_path):
+    notes = tmp_path / "notes.txt"
+    notes.write_text("Buy milk.\n")
+    tool_call = SimpleNamespace(id="call_1", function=SimpleNamespace(
+        name="read_file", arguments=json.dumps({"filepath": str(notes)})))
+    required_action = SimpleNamespace(submit_tool_outputs=SimpleNamespace(tool_calls=[tool_call]))
+    assistant, threads = streaming_assistant([
+        StubStream([event("thread.run.created", id="run_1"),
+                    event("thread.run.requires_action", id="run_1", required_action=required_action)]),
+        StubStream([text_delta("You need "), text_delta("to buy milk."),
+                    event("thread.run.completed", id="run_1")]),
+    ])
+    deltas = []
+
+    response = assistant.submit_ai_response("What is on my list?", on_text_delta=deltas.append).result(timeout=5)
+
+    assert response == "You need to buy milk."
+    assert deltas == ["You need ", "to buy milk."]
+    assert assistant.thread_id == "thread_1"
+    assert threads.messages.created == [("user", "What is on my list?")]
+    [(run_id, outputs)] = threads.runs.submitted
+    assert run_id == "run_1"
+    assert outputs[0]["tool_call_id"] == "call_1"
+    assert "Buy milk." in outputs[0]["output"]
+    assert assistant.current_run_id is None
+
+
+def test_failed_run_returns_its_error(streaming_assistant):
+    assistant, _ = streaming_assistant([
+        StubStream([event("thread.run.created", id="run_1"),
+                    event("thread.run.failed", id="run_1", last_error=SimpleNamespace(message="rate limited"))]),
+    ])
+
+    assert assistant.get_ai_response("Hello") == "Run failed: rate limited"
+
+
+def test_deleted_assistant_is_replaced_and_the_run_retried(streaming_assistant):
+    assistant, threads = streaming_assistant([reply("run_1", "Hello again.")])
+    threads.runs.missing_assistants.add("asst_1")
+    threads.assistants.existing.clear()
+
+    def setup_assistant(force_create):
+        assert force_create
+        assistant.assistant_id = "asst_2"
+        threads.assistants.existing.add("asst_2")
+    assistant.setup_assistant = setup_assistant
+
+    assert assistant.get_ai_response("Hello") == "Hello again."
+    assert threads.assistants.retrieved == ["asst_1"]
+    assert assistant.assistant_id == "asst_2"
+
+
+def test_assistant_is_kept_when_the_thread_is_missing(streaming_assistant):
+    assistant, threads = streaming_assistant([])
+    threads.runs.missing_threads.add("thread_1")
+    assistant.setup_assistant = lambda force_create: pytest.fail("the assistant was re-created")
+
+    assert assistant.get_ai_response("Hello").startswith("Error in get_ai_response: No thread found")
+    assert threads.assistants.retrieved == ["asst_1"]
+    assert assistant.assistant_id == "asst_1"
+
+
+def reply(run_id, text):
+    return StubStream([event("thread.run.created", id=run_id), text_delta(text), event("thread.run.completed", id=run_id)])
+
+
+def test_background_job_result_goes_out_with_the_next_message(streaming_assistant, monkeypatch):
+    monkeypatch.setattr(ai, "JOB_WAIT", 0.05)
+    assistant, threads = streaming_assistant([reply("run_1", "Started."), reply("run_2", "It printed late.")])
+
+    started = assistant.execute_terminal_command({"command": "sleep 0.3; echo late"})
+    assert "keeps running in the background" in started
+    assert assistant.get_ai_response("Run it") == "Started."
+    job = assistant.job_manager.get(1)
+    assert job.done.wait(5)
+    time.sleep(0.05)  # on_finished runs on the loop right after done is set
+    assert len(threads.messages.created) == 1  # Nothing is posted between turns
+
+    assert assistant.get_ai_response("Is it done?") == "It printed late."
+    role, content = threads.messages.created[1]
+    assert content.startswith("(Automatic notice, not said by the user)")
+    assert "exited with code 0" in content and "late" in content
+    assert content.endswith("User: Is it done?")
+    assert assistant.finished_jobs == []
+
+    # The result is only sent once
+    threads.runs.streams.append(reply("run_3", "Ok."))
+    assistant.get_ai_response("Thanks")
+    assert threads.messages.created[2] == ("user", "Thanks")
+
+
+def test_job_result_seen_by_the_model_is_not_repeated(streaming_assistant):
+    assistant, threads = streaming_assistant([reply("run_1", "Ok.")])
+
+    result = assistant.execute_terminal_command({"command": "echo quick"})
+    assert "exited with code 0" in result and "quick" in result
+    time.sleep(0.05)
+    assistant.get_ai_response("Next")
+    assert threads.messages.created == [("user", "Next")]
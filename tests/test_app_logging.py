@@ -0,0 +1,71 @@
+import logging
+
+from modules.app_logging import RingBufferHandler, TruncateFilter
+
+
+def make_logger(name, max_chars=100):
+    ring = RingBufferHandler(capacity=10)
+    ring.addFilter(TruncateFilter(max_chars))
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(ring)
+    return logger, ring
+
+
+def test_dict_argument_is_truncated():
+    logger, ring = make_logger("test.truncate.dict")
+    logger.info("Arguments: %s", {"content": "x" * 10000})
+
+    record = ring.records[-1]
+    assert len(record.getMessage()) < 200
+    assert record.getMessage().startswith("Arguments: {'content': 'xxx")
+    assert "more characters]" in record.getMessage()
+
+
+def test_long_message_and_string_arguments_are_truncated_once():
+    logger, ring = make_logger("test.truncate.str")
+    truncate = ring.filters[0]
+    logger.info("%s and %s", "a" * 80, "b" * 80)
+
+    record = ring.records[-1]
+    message = record.getMessage()
+    truncate.filter(record)  # A second sink sharing the record does not cut it again
+    assert record.getMessage() == message
+    assert message.startswith("a" * 80 + " and bbb")
+    assert message.endswith("... [65 more characters]")
+
+
+def test_short_message_keeps_its_arguments():
+    logger, ring = make_logger("test.truncate.short")
+    logger.info("Job %d finished", 3)
+
+    record = ring.records[-1]
+    assert record.args == (3,)
+    assert record.getMessage() == "Job 3 finished"
+
+
+def test_terminal_output_is_shown_whatever_the_log_level(monkeypatch):
+    from modules import app_logging
+    from modules.app_logging import CallbackHandler
+
+    ava = logging.getLogger('ava')
+    handlers, level = list(ava.handlers), ava.level
+    monkeypatch.setattr(app_logging, "_ring", None)
+    monkeypatch.setattr(app_logging, "LOG_LEVEL", "WARNING")
+    monkeypatch.setattr(app_logging, "LOG_TO_FILE", False)
+    ava.handlers = []
+    shown = []
+    terminal = app_logging.get_logger('terminal')
+    handler = CallbackHandler(shown.append)
+    terminal.addHandler(handler)
+    try:
+        ring = app_logging.configure_logging()
+        terminal.info("OUTPUT [job 1]: hello")
+        app_logging.get_logger('tools').info("Executing tool: read_file")
+
+        assert shown == ["OUTPUT [job 1]: hello"]
+        assert ring.query() == []
+    finally:
+        terminal.removeHandler(handler)
+        ava.handlers, ava.level = handlers, level
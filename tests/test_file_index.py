@@ -0,0 +1,100 @@
+import os
+import sqlite3
+
+from modules.file_index import FileIndex
+
+
+def make_tree(root, count=20):
+    for i in range(count):
+        directory = os.path.join(root, f"dir{i}", "nested")
+        os.makedirs(directory)
+        with open(os.path.join(directory, f"file{i}.txt"), "w") as f:
+            f.write("x")
+
+
+def test_rebuild_indexes_the_whole_tree(tmp_path):
+    root = tmp_path / "home"
+    make_tree(str(root))
+    index = FileIndex(str(tmp_path / "index.db"), str(root))
+    index.rebuild()
+    assert index.ready.is_set()
+    assert len(index.search("*.txt", max_results=100)) == 20
+
+
+def test_interrupted_rebuild_is_not_marked_complete(tmp_path):
+    root = tmp_path / "home"
+    make_tree(str(root))
+    db_path = str(tmp_path / "index.db")
+    index = FileIndex(db_path, str(root))
+
+    scan_directory = index._scan_directory
+    scanned = []
+
+    def stop_after_a_few(connection, directory):
+        scanned.append(directory)
+        if len(scanned) == 5:
+            index.stop()
+        return scan_directory(connection, directory)
+
+    index._scan_directory = stop_after_a_few
+    index.rebuild()
+    assert not index.ready.is_set()
+
+    reopened = FileIndex(db_path, str(root))
+    assert not reopened.ready.is_set()
+    assert reopened._connection().execute("SELECT value FROM meta WHERE key = 'root'").fetchone() is None
+
+    # The next start rebuilds and finds everything
+    reopened.rebuild()
+    assert reopened.ready.is_set()
+    assert len(reopened.search("*.txt", max_results=100)) == 20
+
+
+def test_prefix_and_substring_search_ignore_case(tmp_path):
+    root = tmp_path / "home"
+    root.mkdir()
+    for name in ("README.md", "readme.txt", "Report.pdf", "ÉTÉ.txt"):
+        (root / name).write_text("x")
+    index = FileIndex(str(tmp_path / "index.db"), str(root))
+    index.rebuild()
+
+    names = lambda paths: sorted(os.path.basename(path) for path in paths)
+    assert names(index.search("Readme", mode="prefix")) == ["README.md", "readme.txt"]
+    assert names(index.search("EADM", mode="substring")) == ["README.md", "readme.txt"]
+    assert names(index.search("été", mode="prefix")) == ["ÉTÉ.txt"]
+    assert names(index.search("README.md")) == ["README.md"]  # Exact names stay case-sensitive
+
+
+def test_dotfiles_are_indexed_but_hidden_directories_are_not(tmp_path):
+    root = tmp_path / "home"
+    (root / ".git" / "objects").mkdir(parents=True)
+    (root / ".git" / "config").write_text("x")
+    (root / "project").mkdir()
+    (root / "project" / ".env").write_text("x")
+    (root / ".gitignore").write_text("x")
+    index = FileIndex(str(tmp_path / "index.db"), str(root))
+    index.rebuild()
+
+    assert sorted(index.search(".*", max_results=100)) == [str(root / ".gitignore"), str(root / "project" / ".env")]
+    assert index.search("config") == []
+
+
+def test_index_from_an_older_schema_is_rebuilt(tmp_path):
+    root = tmp_path / "home"
+    root.mkdir()
+    (root / "Notes.txt").write_text("x")
+    db_path = tmp_path / "index.db"
+    connection = sqlite3.connect(db_path)
+    connection.executescript("""
+        CREATE TABLE files (path TEXT PRIMARY KEY, name TEXT NOT NULL, dir TEXT NOT NULL);
+        CREATE TABLE dirs (path TEXT PRIMARY KEY, mtime REAL NOT NULL);
+        CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+    """)
+    connection.execute("INSERT INTO meta (key, value) VALUES ('root', ?)", (str(root),))
+    connection.commit()
+    connection.close()
+
+    index = FileIndex(str(db_path), str(root))
+    assert not index.ready.is_set()
+    index.rebuild()
+    assert index.search("notes", mode="prefix") == [str(root / "Notes.txt")]
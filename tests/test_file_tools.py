@@ -0,0 +1,58 @@
+import tracemalloc
+
+import pytest
+
+from modules import file_tools
+
+
+@pytest.fixture
+def utf16_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("".join(f"line{i}\n" for i in range(1, 101)), encoding="utf-16")
+    return str(path)
+
+
+def test_utf16_tail(utf16_file):
+    assert file_tools.read_file(utf16_file, tail=1) == "File excerpt:\nline100\n"
+
+
+def test_utf16_head_and_line_range(utf16_file):
+    assert file_tools.read_file(utf16_file, head=2) == "File excerpt:\nline1\nline2\n"
+    assert file_tools.read_file(utf16_file, start_line=3, end_line=4) == "Lines 3-4:\nline3\nline4\n"
+
+
+def test_utf16_pattern(utf16_file):
+    assert file_tools.read_file(utf16_file, pattern="^line2$") == "1 matching line(s):\n2: line2\n"
+
+
+def test_utf16_tail_of_a_file_larger_than_the_window(tmp_path):
+    path = tmp_path / "big.txt"
+    path.write_text("".join(f"line{i}\n" for i in range(1, 5001)), encoding="utf-16")
+    result = file_tools.read_file(str(path), tail=2, budget=1000)
+    assert result == "File excerpt:\nline4999\nline5000\n"
+
+
+def test_head_and_tail_must_be_positive(tmp_path):
+    path = tmp_path / "plain.txt"
+    path.write_text("a\nb\n")
+    with pytest.raises(ValueError):
+        file_tools.read_file(str(path), head=0)
+    with pytest.raises(ValueError):
+        file_tools.read_file(str(path), tail=0)
+
+
+@pytest.mark.parametrize("options", [{"head": 5}, {"tail": 5}, {}], ids=["head", "tail", "summary"])
+def test_single_huge_line_is_read_within_the_budget(tmp_path, options):
+    path = tmp_path / "minified.js"
+    path.write_bytes(b"a" * (32 * 1024 * 1024) + b"z")
+    tracemalloc.start()
+    try:
+        result = file_tools.read_file(str(path), budget=1000, **options)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert peak < file_tools.COUNT_CHUNK + 1024 * 1024  # Line counting maps the file in chunks
+    assert len(result) < 2000
+    assert "truncated" in result or "Cut after" in result or "Only the last" in result
+    if "tail" in options:
+        assert result.endswith("az")
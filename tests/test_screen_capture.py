@@ -0,0 +1,32 @@
+from PIL import Image, ImageDraw
+
+from modules import screen_capture
+from modules.screen_capture import VisionCache, screen_digest
+
+
+def text_page(replace_line=None):
+    image = Image.new("RGB", (1920, 1080), "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(60):
+        text = f"Log line {line}: compiling module {line} of 60"
+        if line == replace_line:
+            text = "ERROR: build failed at step 7"
+        draw.text((20, 15 + line * 17), text, fill="black")
+    return image
+
+
+def test_one_changed_line_misses_the_cache():
+    cache = VisionCache()
+    before = screen_capture.downscale(text_page(), 1280)
+    after = screen_capture.downscale(text_page(replace_line=30), 1280)
+    cache.put("What does my screen say?", "screen", None, screen_digest(before), "It is compiling.")
+
+    assert cache.get("What does my screen say?", "screen", None, screen_digest(after)) is None
+
+
+def test_unchanged_screen_hits_the_cache():
+    cache = VisionCache()
+    cache.put("What does my screen say?", "screen", None, screen_digest(text_page()), "It is compiling.")
+
+    assert cache.get("what does  my screen say?", "screen", None, screen_digest(text_page())) == "It is compiling."
+    assert cache.get("What does my screen say?", "active_window", None, screen_digest(text_page())) is None
@@ -0,0 +1,169 @@
+import wave
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+import speech_recognition as sr
+
+from modules.audio_source import WavReplaySource
+from modules.speech_recognizer import TRANSITIONS, SpeechRecognizer
+from modules.stt_backends import RecognitionSession, SpeechBackend
+
+RATE = 16000
+SPEED = 20  # Deadlines run on the audio clock, so pacing only gives recognition results time to arrive
+
+
+def voiced(seconds):
+    """A vowel-like harmonic tone with a wobbling pitch, which the VAD takes for speech."""
+    t = np.arange(int(RATE * seconds)) / RATE
+    phase = 2 * np.pi * np.cumsum(120 + 20 * np.sin(2 * np.pi * 2 * t)) / RATE
+    signal = sum(np.sin(k * phase) / k for k in range(1, 20)) * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+    return (0.25 * signal / np.abs(signal).max() * 32767).astype(np.int16).tobytes()
+
+
+def silence(seconds):
+    return np.random.default_rng(0).normal(scale=30, size=int(RATE * seconds)).astype(np.int16).tobytes()
+
+
+class ScriptedSession(RecognitionSession):
+    def __init__(self, sample_rate, text):
+        super().__init__(sample_rate)
+        self.text = text
+
+    def finish(self):
+        if self.text is None:
+            raise sr.UnknownValueError()
+        return self.text
+
+
+class ScriptedBackend(SpeechBackend):
+    """Recognizes the phrases of a session as the given texts, in order."""
+
+    name = "scripted"
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+
+    def start_session(self, sample_rate):
+        return ScriptedSession(sample_rate, self.texts.pop(0) if self.texts else None)
+
+
+@pytest.fixture
+def replay(tmp_path):
+    """Plays a session through a SpeechRecognizer until the audio runs out.
+
+    The result has the transitions as (from, event, to), the callback events as
+    (event, text), the audio clock at the last callback of each event and the recognizer.
+    """
+    def run(pcm, texts, on_event=None, configure=None):
+        path = tmp_path / "session.wav"
+        with wave.open(str(path), "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(RATE)
+            wav.writeframes(pcm)
+        recognizer = SpeechRecognizer(audio_source=WavReplaySource(str(path), speed=SPEED))
+        recognizer.wake_word_engine = None  # Every wake phrase is verified by the backend
+        recognizer.stt_backend = ScriptedBackend(texts)
+        if configure:
+            configure(recognizer)
+        events = []
+        at = {}
+
+        def callback(event, text):
+            events.append((event, text))
+            at[event] = recognizer._audio_clock()
+            if on_event:
+                on_event(recognizer, event)
+
+        recognizer.set_callback(callback)
+        recognizer.listen_in_background()
+        recognizer.listening_thread.join(timeout=30)
+        recognizer.recognition_worker.shutdown()
+        assert not recognizer.listening_thread.is_alive()
+        transitions = [(state, event, target) for _, state, event, target, _ in recognizer.transition_log]
+        return SimpleNamespace(transitions=transitions, events=events, at=at, recognizer=recognizer)
+
+    return run
+
+
+def test_every_transition_leads_to_a_known_state():
+    states = {state for state, _ in TRANSITIONS}
+    assert set(TRANSITIONS.values()) <= states | {'home'}
+
+
+def test_wake_phrase_then_command(replay):
+    result = replay(silence(1) + voiced(0.5) + silence(1.5) + voiced(1.2) + silence(2), ["Ava", "what time is it"])
+
+    assert result.transitions == [
+        ('wake_word', 'phrase_captured', 'verifying_wake_word'),
+        ('verifying_wake_word', 'wake_word_detected', 'command'),
+        ('command', 'phrase_captured', 'wake_word'),
+    ]
+    assert ('wake_word_detected', None) in result.events
+    assert ('command_finished', 'what time is it') in result.events
+    assert result.recognizer.mode == 'wake_word'
+
+
+def test_other_phrases_go_back_to_waiting_for_the_wake_word(replay):
+    result = replay(silence(1) + voiced(0.8) + silence(2), ["hello there"])
+
+    assert result.transitions == [
+        ('wake_word', 'phrase_captured', 'verifying_wake_word'),
+        ('verifying_wake_word', 'wake_word_checked', 'wake_word'),
+    ]
+    assert result.events == []
+
+
+def test_command_times_out_after_command_timeout_seconds_of_audio(replay):
+    result = replay(silence(1) + voiced(0.5) + silence(4), ["Ava"], configure=lambda r: setattr(r, 'command_timeout', 2))
+
+    assert result.transitions[-1] == ('command', 'timeout', 'wake_word')
+    assert ('command_timeout', "No command detected.") in result.events
+    # Audio is not consumed while the wake phrase is verified, so the timeout is exact to the chunk
+    assert result.at['command_timeout'] - result.at['wake_word_detected'] == pytest.approx(2, abs=0.07)
+
+
+def test_answer_times_out_after_answer_timeout_seconds_of_audio(replay):
+    def ask_back(recognizer, event):
+        if event == 'command_finished':
+            recognizer.start_listening_for_answer()
+
+    result = replay(
+        silence(1) + voiced(0.5) + silence(1.5) + voiced(1) + silence(6), ["Ava", "remind me"],
+        on_event=ask_back, configure=lambda r: setattr(r, 'answer_timeout', 3))
+
+    assert ('wake_word', 'answer_requested', 'answer') in result.transitions
+    assert result.transitions[-1] == ('answer', 'timeout', 'wake_word')
+    assert ('answer_timeout', None) in result.events
+    # The request is handled at the next frame after the command's recognition
+    assert result.at['answer_timeout'] - result.at['command_finished'] == pytest.approx(3, abs=0.15)
+
+
+def test_answer_is_recognized_in_the_answer_state(replay):
+    def ask_back(recognizer, event):
+        if event == 'command_finished':
+            recognizer.start_listening_for_answer()
+
+    result = replay(
+        silence(1) + voiced(0.5) + silence(1.5) + voiced(1) + silence(2) + voiced(0.6) + silence(2),
+        ["Ava", "delete the file", "Yes"], on_event=ask_back)
+
+    assert ('answer', 'phrase_captured', 'wake_word') in result.transitions
+    assert ('answer_received', 'yes') in result.events
+
+
+def test_answer_request_is_ignored_in_continuous_mode(replay):
+    def ask_back(recognizer, event):
+        if event == 'command_finished':
+            recognizer.start_listening_for_answer()
+            recognizer.events.put(('transition', 'answer_requested'))  # Even sent straight to the state machine
+
+    def continuous(recognizer):
+        recognizer._use_wake_word = False
+
+    result = replay(silence(1) + voiced(1) + silence(3), ["turn on the lights"], on_event=ask_back, configure=continuous)
+
+    assert result.transitions == [('continuous_command', 'phrase_captured', 'continuous_command')]
+    assert ('command_finished', 'turn on the lights') in result.events
+    assert result.recognizer.mode == 'continuous_command'
@@ -0,0 +1,72 @@
+import itertools
+import queue
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from modules import text_to_speech
+from modules.tts_cache import TTSCache
+
+
+class StubClient:
+    """Google TTS client that fails for sentences containing "fail"."""
+
+    def synthesize_speech(self, input, voice, audio_config):
+        if "fail" in input.text:
+            raise RuntimeError("quota exceeded")
+        return SimpleNamespace(audio_content=input.text.encode())
+
+
+class StubPlayer:
+    sample_rate = text_to_speech.PLAYBACK_RATE
+
+    def __init__(self):
+        self.played = []
+
+    def play(self, pcm):
+        self.played.append(bytes(pcm))
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def google_tts(monkeypatch):
+    """A Google-backed TextToSpeech with a stub client and player, so no credentials or audio device are needed."""
+    monkeypatch.setattr(text_to_speech, "texttospeech", SimpleNamespace(SynthesisInput=SimpleNamespace))
+    tts = text_to_speech.TextToSpeech.__new__(text_to_speech.TextToSpeech)
+    tts.use_google_tts = True
+    tts.client = StubClient()
+    tts.voice = tts.audio_config = None
+    tts.player = StubPlayer()
+    tts.cache = TTSCache(1024 * 1024)
+    tts.cache_settings = "test"
+    tts.playback_queue = queue.PriorityQueue()
+    tts.sequence = itertools.count()
+    tts.current = None
+    tts.interrupted = threading.Event()
+    tts.playback_thread = threading.Thread(target=tts._playback_loop, daemon=True)
+    tts.playback_thread.start()
+    yield tts
+    tts.playback_queue.put((-1, next(tts.sequence), None, None, None))
+    tts.playback_thread.join(timeout=2)
+
+
+def test_failed_sentence_is_skipped_and_the_reply_plays_on(google_tts):
+    stream = google_tts.start_stream()
+    stream.feed("First sentence. This one will fail. ")
+    stream.feed("Last sentence.")
+    stream.close()
+
+    assert stream.future.result(timeout=5) is True
+    assert google_tts.player.played == [b"First sentence.", b"Last sentence."]
+    assert stream.wait(0)
+
+
+def test_stopped_stream_reports_not_completed(google_tts):
+    stream = google_tts.start_stream()
+    stream.stop()
+
+    assert stream.future.result(timeout=5) is False
+    assert google_tts.player.played == []
@@ -0,0 +1,89 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from modules.tool_dispatcher import ToolDispatcher
+
+
+class Tools:
+    """Tool executor that records how many calls of each tool run at once."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+        self.release = {}  # Tools that block until their event is set
+
+    def __call__(self, name, arguments):
+        with self.lock:
+            self.active[name] = self.active.get(name, 0) + 1
+            self.peak[name] = max(self.peak.get(name, 0), self.active[name])
+        try:
+            if name in self.release:
+                self.release[name].wait(5)
+            time.sleep(self.delays.get(name, 0))
+            return f"{name} {arguments}"
+        finally:
+            with self.lock:
+                self.active[name] -= 1
+
+
+@pytest.fixture
+def dispatcher_for():
+    created = []
+
+    def make(tools, **options):
+        dispatcher = ToolDispatcher(tools, **options)
+        created.append(dispatcher)
+        return dispatcher
+
+    yield make
+    for dispatcher in created:
+        dispatcher.shutdown()
+
+
+def test_timed_out_tool_returns_an_error_without_holding_up_the_step(dispatcher_for):
+    dispatcher = dispatcher_for(Tools({"slow": 1.0}), timeouts={"slow": 0.1})
+
+    started = time.perf_counter()
+    outputs = asyncio.run(dispatcher.dispatch([("slow", "{}"), ("fast", "{}")]))
+
+    assert outputs == ["Error: slow did not finish within 0.1 seconds", "fast {}"]
+    assert time.perf_counter() - started < 0.8
+
+
+def test_concurrency_limit_runs_calls_of_a_tool_one_at_a_time(dispatcher_for):
+    tools = Tools({"vision": 0.05, "read_file": 0.05})
+    dispatcher = dispatcher_for(tools, max_workers=4, concurrency={"vision": 1})
+
+    outputs = asyncio.run(dispatcher.dispatch([("vision", "1"), ("vision", "2"), ("vision", "3"),
+                                               ("read_file", "a"), ("read_file", "b")]))
+
+    assert outputs == ["vision 1", "vision 2", "vision 3", "read_file a", "read_file b"]
+    assert tools.peak == {"vision": 1, "read_file": 2}
+
+
+def test_cancelled_step_gives_its_concurrency_slots_back(dispatcher_for):
+    tools = Tools()
+    tools.release["vision"] = threading.Event()
+    dispatcher = dispatcher_for(tools, concurrency={"vision": 1}, default_timeout=2)
+
+    async def scenario():
+        # One call holds the slot in a worker and a second waits for it when the turn is cancelled
+        step = asyncio.ensure_future(dispatcher.dispatch([("vision", "1"), ("vision", "2")]))
+        while not tools.active.get("vision"):
+            await asyncio.sleep(0.01)
+        step.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await step
+        assert dispatcher.limits["vision"].locked()  # Still held while the abandoned call runs
+
+        tools.release["vision"].set()
+        return await dispatcher.dispatch([("vision", "3")])
+
+    assert asyncio.run(scenario()) == ["vision 3"]
+    assert not dispatcher.limits["vision"].locked()
+    assert tools.peak["vision"] == 1
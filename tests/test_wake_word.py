@@ -0,0 +1,41 @@
+import math
+import os
+import struct
+import wave
+
+from modules.audio_source import WavReplaySource
+from modules.audio_utils import read_wav
+from modules.wake_word import ENGINE_RATE, record_templates
+
+RATE = 16000
+
+
+def tone(seconds, frequency=440, amplitude=8000):
+    return b"".join(struct.pack("<h", int(amplitude * math.sin(2 * math.pi * frequency * i / RATE)))
+                    for i in range(int(seconds * RATE)))
+
+
+def silence(seconds):
+    return b"\0\0" * int(seconds * RATE)
+
+
+def test_record_templates_saves_each_utterance(tmp_path):
+    session = tmp_path / "session.wav"
+    with wave.open(str(session), "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(silence(1) + tone(0.5) + silence(1.5) + tone(0.5) + silence(1.5))
+    templates = tmp_path / "wake_word"
+    templates.mkdir()
+    (templates / "template-1.wav").write_bytes(session.read_bytes())  # An earlier take is kept
+    prompts = []
+
+    paths = record_templates(WavReplaySource(str(session), speed=0), str(templates), count=2, on_prompt=prompts.append)
+
+    assert [os.path.basename(path) for path in paths] == ["template-2.wav", "template-3.wav"]
+    assert prompts == ["Say the wake word (1/2)", "Say the wake word (2/2)"]
+    for path in paths:
+        pcm, rate = read_wav(path)
+        assert rate == ENGINE_RATE
+        assert 0.5 <= len(pcm) / 2 / rate < 2.5